@@ -7,6 +7,7 @@ from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
 from .helpers import LOGGER, ConfigEntryType
 from .helpers.component_api import ComponentApi
+from .helpers.device import DeviceStore
 from .helpers.meross_profile import MerossProfile, MerossProfileStore
 from .merossclient import cloudapi
 
@@ -104,6 +105,7 @@ async def async_remove_entry(hass: "HomeAssistant", config_entry: "ConfigEntry")
     match ConfigEntryType.get_type_and_id(config_entry.unique_id):
         case (ConfigEntryType.DEVICE, device_id):
             api.devices.pop(device_id)
+            await DeviceStore(hass, device_id).async_remove()
 
         case (ConfigEntryType.PROFILE, profile_id):
             api.profiles.pop(profile_id)
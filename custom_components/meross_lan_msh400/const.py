@@ -122,6 +122,9 @@ CONF_POLLING_PERIOD_MIN: Final = 5
 CONF_POLLING_PERIOD_DEFAULT: Final = 30
 # enable/disable Appliance.Control.Multiple
 CONF_DISABLE_MULTIPLE: Final = "disable_multiple"
+# coalescing window (msec) to batch commands in Appliance.Control.Multiple (0 disables)
+CONF_COMMAND_BATCH_WINDOW: Final = "command_batch_window"
+CONF_COMMAND_BATCH_WINDOW_MAX: Final = 500
 # this is a 'fake' conf used to force-flush
 CONF_TIMESTAMP: Final = mc.KEY_TIMESTAMP
 
@@ -148,6 +151,10 @@ class DeviceConfigType(DeviceConfigTypeMinimal, total=False):
     """configures the protocol: auto will automatically switch between the available transports"""
     polling_period: NotRequired[int | None]
     """base polling period to query device state"""
+    disable_multiple: NotRequired[bool]
+    """disables Appliance.Control.Multiple packing of polling requests"""
+    command_batch_window: NotRequired[int]
+    """window (msec) used to batch commands (SET) in a single Appliance.Control.Multiple"""
     timezone: NotRequired[str]
     """IANA timezone set in the device"""
     timestamp: NotRequired[float]
@@ -210,6 +217,8 @@ PARAM_UNAVAILABILITY_TIMEOUT = 20
 """number of seconds since last inquiry/response to consider the device unavailable"""
 PARAM_HEARTBEAT_PERIOD = 295
 """whatever the connection state periodically inquire the device is available"""
+PARAM_HEARTBEAT_ALL_PERIOD = 3595
+"""heartbeats use a lightweight query: the full NS_ALL is only used every ... second"""
 PARAM_TIMEZONE_CHECK_OK_PERIOD = 604800
 """period between checks of timezone infos on locally mqtt binded devices"""
 PARAM_TIMEZONE_CHECK_NOTOK_PERIOD = 86400
@@ -254,3 +263,43 @@ PARAM_HEADER_SIZE = 300
 """(rough) estimate of the header part of any response"""
 PARAM_RESPONSE_SIZE_MAX = 3000
 """(rough) estimate of the allowed response size limit before overflow occurs (see #244)"""
+PARAM_POLLING_CONCURRENCY_MAX = 8
+"""maximum number of device polling cycles allowed to run at the same time"""
+PARAM_POLLING_BURST_SPACING = 0.1
+"""minimum spacing between 'immediate' polls (coldstart/onlining) of different devices"""
+PARAM_RESPONSE_SIZE_MODEL_GAIN = 0.2
+"""smoothing factor (EWMA) used when learning the namespaces response sizes"""
+PARAM_RESPONSE_SIZE_MODEL_MARGIN = 3
+"""safety margin (in mean deviations) added to the learned response size estimate"""
+PARAM_DEVICE_DELAYED_SAVE_TIMEOUT = 300
+"""used to delay updated device (learned) data to storage"""
+PARAM_PUSH_CONFIDENCE_MIN = 0.9
+"""confidence needed (see PushTracker) before skipping polls of a PUSHed namespace over MQTT"""
+PARAM_PUSH_VERIFY_PERIOD = 1800
+"""even when PUSHes look reliable, verify them with a poll at least every ... second"""
+PARAM_MQTT_BUDGET = 200
+"""maximum number of (cloud) MQTT messages x device x hour (as requested by Meross)"""
+PARAM_MQTT_BUDGET_COMMAND_RESERVE = 40
+"""share of PARAM_MQTT_BUDGET reserved to user commands (never used by polling)"""
+PARAM_CIRCUIT_BREAKER_THRESHOLD = 3
+"""consecutive failed probes (x transport) before opening the circuit on an offline device"""
+PARAM_CIRCUIT_BREAKER_PERIOD_MIN = 60
+"""first tier of the (exponential) circuit breaker backoff"""
+PARAM_CIRCUIT_BREAKER_PERIOD_MAX = 1800
+"""maximum circuit breaker backoff"""
+PARAM_TCP_PROBE_TIMEOUT = 2
+"""timeout for the TCP connect probe done before NS_ALL when the HTTP circuit is open"""
+PARAM_PROTOCOL_SCORE_HYSTERESIS = 1.5
+"""(AUTO protocol) switch transport only when the other scores better by this factor"""
+PARAM_PROTOCOL_SCORE_SWITCH_PERIOD = 120
+"""(AUTO protocol) minimum time between transport switches driven by scoring"""
+PARAM_POLL_CONCURRENCY = 4
+"""max concurrent polling strategies in a cycle when on local MQTT (1 disables)"""
+PARAM_PAYLOAD_FINGERPRINT_PERIOD = 900
+"""force a full parse of unchanged (polled) payloads at least every ... second"""
+PARAM_CLOUDMQTT_SHARD_DEVICES = 50
+"""devices x (app) MQTT connection on large cloud profiles (see MQTTShardRing)"""
+PARAM_CLOUDMQTT_SHARDS_MAX = 4
+"""maximum number of (app) MQTT connections x broker on large cloud profiles"""
+PARAM_MQTT_PUBLISH_QUEUE_TIMEOUT = 100
+"""commands (SET) exceeding the cloud MQTT rate-limit are queued (at most) this long"""
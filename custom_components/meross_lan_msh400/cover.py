@@ -299,7 +299,8 @@ class MLRollerShutter(MLCover):
 
         # in case the ns_multiple didn't succesfully kick-in we'll
         # fallback to the legacy procedure
-        if await self.manager.async_request_ack(
+        if await self.manager.async_request_ack_coalesced(
+            (mn.Appliance_RollerShutter_Position.name, self.channel),
             mn.Appliance_RollerShutter_Position.name,
             mc.METHOD_SET,
             {
@@ -119,7 +119,8 @@ class MLDiffuserLight(MLLightBase):
 
     # interface: MLLightBase
     async def async_request_light_ack(self, _light: dict):
-        return await self.manager.async_request_ack(
+        return await self.manager.async_request_ack_coalesced(
+            (self.ns.name, self.channel, frozenset(_light)),
             self.ns.name,
             mc.METHOD_SET,
             {self.ns.key: [_light]},
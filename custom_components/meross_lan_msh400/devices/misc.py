@@ -165,10 +165,8 @@ class SensorLatestXNamespaceHandler(NamespaceHandler):
                             break
                     else:
                         polling_request_channels.append({key_channel: channel, mc.KEY_DATA: [data_key]})
-                        self.polling_response_size = (
-                            self.polling_response_base_size
-                            + len(polling_request_channels) * self.polling_response_item_size
-                        )
+                        self.polling_response_size_adj(len(polling_request_channels))
+                    self.device.request_template_invalidate(self.ns.name)
                 entity._parse(data_value[0])
 
 
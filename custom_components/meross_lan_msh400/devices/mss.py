@@ -471,14 +471,11 @@ class ConsumptionHNamespaceHandler(NamespaceHandler):
         # to reply with just 3 channels when queried with an empty list (em06).
         if not self._channels_to_poll:
             return
-        self.polling_response_size = (
-            self.polling_response_base_size + 3 * self.polling_response_item_size
-        )
+        self.polling_response_size_adj(3)
         await self.device.async_request_poll(self)
         self.polling_request_channels.append({})
-        self.polling_response_size = (
-            self.polling_response_base_size + self.polling_response_item_size
-        )
+        self.device.request_template_invalidate(self.ns.name)
+        self.polling_response_size_adj(1)
         self.polling_strategy = ConsumptionHNamespaceHandler.async_poll_smartchunk  # type: ignore
 
     async def async_poll_smartchunk(self):
@@ -487,14 +484,14 @@ class ConsumptionHNamespaceHandler(NamespaceHandler):
         if not self._channels_to_poll:
             return
         _poll_epoch, channel = self._channels_to_poll[0]
-        self.polling_request_channels[0][self.ns.key_channel] = channel
         device = self.device
-        epoch = device._polling_epoch
-        if _poll_epoch > epoch:
-            # Insert into the lazypoll_requests ordering by least recently polled
-            insort_right(
-                device._lazypoll_requests, self, key=lambda h: h.lastrequest - epoch
-            )
+        channel_payload = self.polling_request_channels[0]
+        if channel_payload.get(self.ns.key_channel) != channel:
+            channel_payload[self.ns.key_channel] = channel
+            device.request_template_invalidate(self.ns.name)
+        if _poll_epoch > device._polling_epoch:
+            # Queue into the lazypoll_requests (ordered by staleness)
+            device._lazypoll_requests.push(self)
         else:
             await device.async_request_smartpoll(self)
 
@@ -30,6 +30,7 @@ from ..merossclient.protocol.message import (
 from .device import Device
 from .manager import ConfigEntryManager
 from .mqtt_profile import MQTTConnection, MQTTProfile
+from .polling import PollingScheduler
 
 if typing.TYPE_CHECKING:
 
@@ -120,13 +121,16 @@ class HAMQTTConnection(MQTTConnection):
     def get_rl_safe_delay(self, uuid: str):
         return 0.0
 
+    def get_rl_release_delay(self, uuid: str):
+        return 0.0
+
     async def _async_mqtt_publish(
         self,
         device_id: str,
         request: "MerossMessage",
     ):
         await mqtt_async_publish(
-            self.profile.hass, mc.TOPIC_REQUEST.format(device_id), request.json()
+            self.profile.hass, mc.TOPIC_REQUEST.format(device_id), request.json_bytes()
         )
         self._mqtt_published()
 
@@ -151,7 +155,7 @@ class HAMQTTConnection(MQTTConnection):
             mqtt_async_publish = mqtt.async_publish
 
             self._unsub_mqtt_subscribe = await mqtt.async_subscribe(
-                hass, mc.TOPIC_DISCOVERY, self.async_mqtt_message
+                hass, mc.TOPIC_DISCOVERY, self.async_mqtt_message, encoding=None
             )
 
             @callback
@@ -341,6 +345,7 @@ class ComponentApi(MQTTProfile):
 
         device_registry: Final[dr.DeviceRegistry]
         entity_registry: Final[er.EntityRegistry]
+        polling_scheduler: Final[PollingScheduler]
 
         _mqtt_connection: HAMQTTConnection | None
 
@@ -353,6 +358,7 @@ class ComponentApi(MQTTProfile):
         "managers_transient_state",
         "device_registry",
         "entity_registry",
+        "polling_scheduler",
         "_mqtt_connection",
         "_deviceclasses",
         "_zoneinfo",
@@ -405,6 +411,7 @@ class ComponentApi(MQTTProfile):
         self.managers_transient_state = {}
         self.device_registry = dr.async_get(hass)
         self.entity_registry = er.async_get(hass)
+        self.polling_scheduler = PollingScheduler(self)
         self._mqtt_connection = None
         self._deviceclasses = {}
         self._zoneinfo = {}
@@ -510,7 +517,7 @@ class ComponentApi(MQTTProfile):
                                 key or self.key,
                                 logger=self,
                                 log_level_dump=self.VERBOSE,
-                            ).async_request_raw(request.json())
+                            ).async_request_raw(request.json_bytes())
                             or {}
                         )
                     except Exception as exception:
@@ -547,6 +554,11 @@ class ComponentApi(MQTTProfile):
     def get_logger_name(self) -> str:
         return "api"
 
+    def loggable_diagnostic_state(self):
+        return super().loggable_diagnostic_state() | {
+            "polling_scheduler": self.polling_scheduler.loggable_diagnostic_state(),
+        }
+
     # interface: ApiProfile
     @property
     def allow_mqtt_publish(self):
@@ -569,6 +581,7 @@ class ComponentApi(MQTTProfile):
             await device.async_shutdown()
         for profile in self.active_profiles():
             await profile.async_shutdown()
+        self.polling_scheduler.shutdown()
         await super().async_shutdown()
         await MerossHttpClient.async_shutdown_session()
         self._mqtt_connection = None
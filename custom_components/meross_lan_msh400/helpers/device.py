@@ -2,6 +2,7 @@ import abc
 import asyncio
 import bisect
 from datetime import UTC, tzinfo
+from itertools import repeat
 from json import JSONDecodeError
 from time import time
 from typing import TYPE_CHECKING
@@ -10,7 +11,7 @@ import zoneinfo
 import aiohttp
 from homeassistant.config_entries import ConfigEntryState
 from homeassistant.core import callback
-from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import device_registry as dr, storage
 from homeassistant.util import dt as dt_util, slugify
 import voluptuous as vol
 
@@ -25,7 +26,6 @@ from ..const import (
     CONF_PROTOCOL_AUTO,
     CONF_PROTOCOL_HTTP,
     CONF_PROTOCOL_MQTT,
-    PARAM_HEADER_SIZE,
     PARAM_HEARTBEAT_PERIOD,
     PARAM_TIMESTAMP_TOLERANCE,
 )
@@ -39,13 +39,23 @@ from ..merossclient import (
 from ..merossclient.httpclient import MerossHttpClient, TerminatedException
 from ..merossclient.protocol.message import (
     MerossRequest,
+    MerossRequestTemplate,
     MerossResponse,
     get_message_uuid,
+    salvage_multiple_response,
 )
 from ..sensor import ProtocolSensor
 from ..update import MLUpdate
 from .manager import ConfigEntryManager, EntityManager
 from .namespaces import NamespaceHandler, mc, mn
+from .polling import (
+    CircuitBreaker,
+    LazyPollQueue,
+    MQTTBudget,
+    PushTracker,
+    TransportScore,
+    pack_multiple_requests,
+)
 
 if TYPE_CHECKING:
     from asyncio import Future, Task, TimerHandle
@@ -60,6 +70,7 @@ if TYPE_CHECKING:
         Iterator,
         Mapping,
         NotRequired,
+        TypedDict,
         Unpack,
     )
 
@@ -79,6 +90,7 @@ if TYPE_CHECKING:
     from .entity import MLEntity
     from .mqtt_profile import MQTTConnection, MQTTProfile
     from .namespaces import NamespaceParser
+    from .polling import PollingEntry
 
     type DigestParseFunc = Callable[[dict], None] | Callable[[list], None]
     type DigestInitReturnType = tuple[DigestParseFunc, Iterable[NamespaceHandler]]
@@ -88,10 +100,26 @@ if TYPE_CHECKING:
         [str, str, MerossPayloadType], CoroutineType[Any, Any, MerossResponse | None]
     ]
 
+    class DeviceStoreType(TypedDict):
+        responseSizeMin: int
+        responseSizeMax: int
+        responseSizeModel: dict[str, dict[str, list[float]]]
+
 
 TIMEZONES_SET = None
 
 
+class DeviceStore(storage.Store["DeviceStoreType"]):
+    VERSION = 1
+
+    def __init__(self, hass: "HomeAssistant", device_id: str):
+        super().__init__(
+            hass,
+            DeviceStore.VERSION,
+            f"{mlc.DOMAIN}.device.{device_id}",
+        )
+
+
 class BaseDevice(EntityManager):
     """
     Abstract base class for Device and SubDevice (from hub)
@@ -105,6 +133,11 @@ class BaseDevice(EntityManager):
 
         online: Final[bool]
         device_registry_entry: Final[dr.DeviceEntry]
+        _commands_pending: dict[
+            object, list[tuple[MerossPayloadType, Future[MerossResponse | None]]]
+        ]
+        """Commands queued (see async_request_ack_coalesced) while a previous one with the same key is in flight"""
+        commands_coalesced_count: int
 
         class Args(EntityManager.Args):
             config_entry: ConfigEntry
@@ -118,6 +151,8 @@ class BaseDevice(EntityManager):
     __slots__ = (
         "online",
         "device_registry_entry",
+        "_commands_pending",
+        "commands_coalesced_count",
     )
 
     def __init__(self, id: str, **kwargs: "Unpack[Args]"):
@@ -128,6 +163,8 @@ class BaseDevice(EntityManager):
             **kwargs,
         )
         self.online = False
+        self._commands_pending = {}
+        self.commands_coalesced_count = 0
         self.device_registry_entry = self.api.device_registry.async_get_or_create(
             config_entry_id=self.config_entry.entry_id,
             connections=kwargs.get("connections"),
@@ -176,6 +213,68 @@ class BaseDevice(EntityManager):
             else None
         )
 
+    async def async_request_ack_coalesced(
+        self,
+        key: object,
+        namespace: str,
+        method: str,
+        payload: "MerossPayloadType",
+    ) -> MerossResponse | None:
+        """
+        'latest-wins' version of async_request_ack meant for high-frequency commands
+        (sliders, transitions). While a command with the same key is in flight, newer
+        ones are queued and only the latest is sent after the ack. Superseded callers
+        receive that same (latest) response, in queue order, so that any state update
+        following the ack is applied in the right sequence.
+        """
+        commands_pending = self._commands_pending
+        if (queue := commands_pending.get(key)) is None:
+            commands_pending[key] = queue = []
+            try:
+                return await self.async_request_ack(namespace, method, payload)
+            finally:
+                if queue:
+                    self.async_create_task(
+                        self._async_request_ack_coalesced_drain(
+                            key, namespace, method, queue
+                        ),
+                        ".request_ack_coalesced_drain",
+                    )
+                else:
+                    del commands_pending[key]
+
+        if queue:
+            # the queued one will never be sent
+            self.commands_coalesced_count += 1
+        future = self.hass.loop.create_future()
+        queue.append((payload, future))
+        return await future
+
+    async def _async_request_ack_coalesced_drain(
+        self,
+        key: object,
+        namespace: str,
+        method: str,
+        queue: "list[tuple[MerossPayloadType, Future[MerossResponse | None]]]",
+    ):
+        try:
+            while queue:
+                payload = queue[-1][0]
+                futures = [command[1] for command in queue]
+                queue.clear()
+                response = None
+                try:
+                    response = await self.async_request_ack(namespace, method, payload)
+                finally:
+                    for future in futures:
+                        if not future.done():
+                            future.set_result(response)
+        finally:
+            del self._commands_pending[key]
+            for command in queue:
+                if not command[1].done():
+                    command[1].set_result(None)
+
     def request(self, request_tuple: "MerossRequestType"):
         return self.async_create_task(
             self.async_request(*request_tuple), f".request({request_tuple})"
@@ -262,6 +361,10 @@ class Device(BaseDevice, ConfigEntryManager):
         curr_protocol: str
 
         device_timestamp: int
+        response_size_model: dict[str, dict[int, list[float]]]
+        """Learned response sizes x namespace (see NamespaceHandler.polling_response_size_learn)"""
+        _store: DeviceStore
+        _store_dirty: bool
 
         _profile: MQTTProfile | None
         _mqtt_connection: MQTTConnection | None
@@ -277,14 +380,43 @@ class Device(BaseDevice, ConfigEntryManager):
         namespace_handlers: dict[str, NamespaceHandler]
         digest_handlers: dict[str, DigestParseFunc]
         digest_pollers: set[NamespaceHandler]
-        _lazypoll_requests: list[NamespaceHandler]
+        _lazypoll_requests: LazyPollQueue
         _polling_epoch: float
-        _polling_unsub: TimerHandle | None
+        _polling_unsub: PollingEntry | None
         _polling_task: Task | None
         _queued_cloudpoll_requests: int
+        mqtt_budget: MQTTBudget
+        http_breaker: CircuitBreaker
+        mqtt_breaker: CircuitBreaker
+        http_score: TransportScore
+        mqtt_score: TransportScore
+        """Only accounts for local MQTT (cloud brokers are never preferred over HTTP)."""
+        protocol_scored: bool
+        """True when curr_protocol was selected by _check_protocol_score."""
+        _protocol_score_epoch: float
+        _poll_slots: dict[Task, int]
+        """Parallel polling tasks (see _async_poll_parallel) x handler (order) index."""
+        _poll_messageids: dict[str, int]
+        """Pending poll requests issued during a parallel poll x handler index."""
+        _poll_received: dict[int, list[tuple[float, MerossResponse]]]
+        """Poll responses (x handler index) held back to be processed in handlers order."""
+        _poll_slot_head: int
+        """Lowest handler index of the parallel poll still running: its responses
+        are processed straight away since every earlier slot is done."""
+        _poll_slots_done: set[int]
         multiple_max: int
-        _multiple_requests: list[MerossRequestType]
-        _multiple_response_size: int
+        _multiple_requests: list[tuple[MerossRequestType, int]]
+        """Due polling requests (with their expected response size) to be packed at the end of the cycle."""
+        _request_templates: dict[str, MerossRequestTemplate]
+        """Pre-serialized (polling) requests x namespace (see _build_request)"""
+        _requests_inflight: dict[tuple[str, str], Future[MerossResponse | None]]
+        """Pending GET transactions indexed by (namespace, payload identity) (see async_request)"""
+        requests_coalesced_count: int
+        _command_batch_window: float
+        _command_batch: list[tuple[MerossRequestType, Future[MerossResponse | None]]]
+        """SET requests (and the callers futures) waiting to be packed in a single Appliance.Control.Multiple"""
+        _command_batch_unsub: TimerHandle | None
+        commands_batched_count: int
         _timezone_next_check: float
         _trace_ability_callback_unsub: TimerHandle | None
         _diagnostics_build: bool
@@ -376,6 +508,14 @@ class Device(BaseDevice, ConfigEntryManager):
         mn.Appliance_System_Runtime.name: (".sensor", "MLSignalStrengthSensor"),
     }
 
+    HEARTBEAT_NAMESPACES = (
+        mn.Appliance_System_Firmware,
+        mn.Appliance_System_Online,
+    )
+    """Lightweight namespaces (in order of preference) used as heartbeat
+    instead of NS_ALL. Firmware comes first since it also allows detecting
+    fw updates/ip changes (see _handle_Appliance_System_Firmware)."""
+
     TRACE_ABILITY_EXCLUDE = (
         mn.Appliance_System_Ability.name,
         mn.Appliance_System_All.name,
@@ -419,6 +559,9 @@ class Device(BaseDevice, ConfigEntryManager):
         "device_timedelta_config_epoch",
         "device_response_size_min",
         "device_response_size_max",
+        "response_size_model",
+        "_store",
+        "_store_dirty",
         "lastrequest",
         "lastresponse",
         "_topic_response",  # sets the "from" field in request messages
@@ -441,9 +584,27 @@ class Device(BaseDevice, ConfigEntryManager):
         "_polling_unsub",
         "_polling_task",
         "_queued_cloudpoll_requests",
+        "mqtt_budget",
+        "http_breaker",
+        "mqtt_breaker",
+        "http_score",
+        "mqtt_score",
+        "protocol_scored",
+        "_protocol_score_epoch",
+        "_poll_slots",
+        "_poll_messageids",
+        "_poll_received",
+        "_poll_slot_head",
+        "_poll_slots_done",
         "multiple_max",
         "_multiple_requests",
-        "_multiple_response_size",
+        "_request_templates",
+        "_requests_inflight",
+        "requests_coalesced_count",
+        "_command_batch_window",
+        "_command_batch",
+        "_command_batch_unsub",
+        "commands_batched_count",
         "_timezone_next_check",
         "_trace_ability_callback_unsub",
         "_diagnostics_build",
@@ -477,6 +638,9 @@ class Device(BaseDevice, ConfigEntryManager):
         )
         if self.device_response_size_max < self.device_response_size_min:
             self.device_response_size_max = self.device_response_size_min
+        self.response_size_model = {}
+        self._store = DeviceStore(api.hass, config_entry.data[mlc.CONF_DEVICE_ID])
+        self._store_dirty = False
         self.lastrequest = 0.0
         self.lastresponse = 0.0
         self._topic_response = mc.HEADER_FROM_DEFAULT
@@ -494,15 +658,33 @@ class Device(BaseDevice, ConfigEntryManager):
         self.namespace_handlers = {}
         self.digest_handlers = {}
         self.digest_pollers = set()
-        self._lazypoll_requests = []
+        self._lazypoll_requests = LazyPollQueue()
         NamespaceHandler(self, mn.Appliance_System_All)
         self._polling_epoch = time()
         self._polling_unsub = None
         self._polling_task = None
         self._queued_cloudpoll_requests = 0
+        self.mqtt_budget = MQTTBudget()
+        self.http_breaker = CircuitBreaker()
+        self.mqtt_breaker = CircuitBreaker()
+        self.http_score = TransportScore()
+        self.mqtt_score = TransportScore()
+        self.protocol_scored = False
+        self._protocol_score_epoch = 0.0
+        self._poll_slots = {}
+        self._poll_messageids = {}
+        self._poll_received = {}
+        self._poll_slot_head = 0
+        self._poll_slots_done = set()
         self.multiple_max = 0
         self._multiple_requests = []
-        self._multiple_response_size = PARAM_HEADER_SIZE
+        self._request_templates = {}
+        self._requests_inflight = {}
+        self.requests_coalesced_count = 0
+        self._command_batch_window = 0
+        self._command_batch = []
+        self._command_batch_unsub = None
+        self.commands_batched_count = 0
         self._timezone_next_check = (
             0
             if mn.Appliance_System_Time.name in descriptor.ability
@@ -546,6 +728,7 @@ class Device(BaseDevice, ConfigEntryManager):
 
     async def async_init(self):
 
+        await self._async_load_store()
         await self._async_update_config()
 
         descriptor = self.descriptor
@@ -633,7 +816,7 @@ class Device(BaseDevice, ConfigEntryManager):
         # here we'll register mqtt listening (in case) and start polling after
         # the states have been eventually restored (some entities need this)
         self._check_protocol_ext()
-        self._polling_unsub = self.schedule_callback(0, self._poll, None)
+        self._polling_unsub = self.api.polling_scheduler.schedule(self, 0)
 
     # interface: ConfigEntryManager
     async def entry_update_listener(
@@ -828,14 +1011,26 @@ class Device(BaseDevice, ConfigEntryManager):
         """Return a 'loggable' version of the entry state (for diagnostic/logging purposes)"""
         profile = self._profile
         device_info = profile.get_device_info(self.id) if profile else None
+        polling_entry = self.api.polling_scheduler.entries.get(self.id)
         return {
             "class": type(self).__name__,
             "conf_protocol": self.conf_protocol,
             "pref_protocol": self.pref_protocol,
             "curr_protocol": self.curr_protocol,
             "polling_period": self.polling_period,
+            "polling_phase": polling_entry.phase if polling_entry else None,
             "device_response_size_min": self.device_response_size_min,
             "device_response_size_max": self.device_response_size_max,
+            "requests_inflight": len(self._requests_inflight),
+            "requests_coalesced_count": self.requests_coalesced_count,
+            "commands_batched_count": self.commands_batched_count,
+            "commands_coalesced_count": self.commands_coalesced_count,
+            "mqtt_budget": self.mqtt_budget.loggable_diagnostic_state(time()),
+            "protocol_score": {
+                "scored": self.protocol_scored,
+                CONF_PROTOCOL_HTTP: self.http_score.loggable_diagnostic_state(),
+                CONF_PROTOCOL_MQTT: self.mqtt_score.loggable_diagnostic_state(),
+            },
             "MQTT": {
                 "cloud_profile": (profile.is_cloud_profile if profile else None),
                 "locally_active": bool(self.mqtt_locallyactive),
@@ -843,10 +1038,13 @@ class Device(BaseDevice, ConfigEntryManager):
                 "mqtt_connected": bool(self._mqtt_connected),
                 "mqtt_publish": bool(self._mqtt_publish),
                 "mqtt_active": bool(self._mqtt_active),
+                "circuit_breaker": self.mqtt_breaker.loggable_diagnostic_state(),
             },
             "HTTP": {
                 "http": bool(self._http),
                 "http_active": bool(self._http_active),
+                "rtt": (self._http.loggable_diagnostic_state() if self._http else None),
+                "circuit_breaker": self.http_breaker.loggable_diagnostic_state(),
             },
             "namespace_handlers": {
                 handler.ns.name: {
@@ -858,11 +1056,17 @@ class Device(BaseDevice, ConfigEntryManager):
                         else handler.lastpush
                     ),
                     "polling_epoch_next": handler.polling_epoch_next,
+                    "push_tracker": (
+                        handler.push_tracker.loggable_diagnostic_state()
+                        if handler.push_tracker
+                        else None
+                    ),
                     "polling_strategy": (
                         handler.polling_strategy.__name__
                         if handler.polling_strategy
                         else None
                     ),
+                    "payload_fingerprint": handler.loggable_fingerprint_state(),
                 }
                 for handler in self.namespace_handlers.values()
             },
@@ -889,6 +1093,16 @@ class Device(BaseDevice, ConfigEntryManager):
         if self._profile:
             self._profile.unlink(self)
         await self.async_poll_stop()
+        self.api.polling_scheduler.unregister(self)
+        if self._command_batch_unsub:
+            self._command_batch_unsub.cancel()
+            self._command_batch_unsub = None
+        for _, future in self._command_batch:
+            if not future.done():
+                future.set_result(None)
+        self._command_batch.clear()
+        if self._store_dirty:
+            await self._store.async_save(self._store_data())
         await super().async_shutdown()
         self.namespace_handlers = None  # type: ignore
         self.digest_handlers = None  # type: ignore
@@ -946,8 +1160,144 @@ class Device(BaseDevice, ConfigEntryManager):
         """
         route the request through MQTT or HTTP to the physical device according to
         current protocol. When switching transport the message is recomputed to
-        avoid reusing the same (old) timestamps and messageids
+        avoid reusing the same (old) timestamps and messageids.
+        GET requests are 'single-flighted' i.e. when the same request (namespace and
+        payload object) is already pending the caller will just wait and share its response.
         """
+        if method != mc.METHOD_GET:
+            if (
+                self._command_batch_window
+                and self.multiple_max
+                and (method == mc.METHOD_SET)
+                and (namespace != mn.Appliance_Control_Multiple.name)
+            ):
+                return await self._async_request_batched(namespace, method, payload)
+            return await self._async_request(namespace, method, payload)
+
+        # polling requests reuse the very same payload object so identity is
+        # enough (and way cheaper than encoding it) to match them
+        key = (namespace, id(payload))
+        requests_inflight = self._requests_inflight
+        if future := requests_inflight.get(key):
+            self.requests_coalesced_count += 1
+            # shielding so that cancelling this caller will not
+            # affect the other ones waiting on the same transaction
+            return await asyncio.shield(future)
+
+        requests_inflight[key] = future = self.hass.loop.create_future()
+        response = None
+        try:
+            response = await self._async_request(namespace, method, payload)
+            return response
+        finally:
+            # on errors/cancellation the followers will just receive None
+            del requests_inflight[key]
+            future.set_result(response)
+
+    async def _async_request_batched(
+        self,
+        namespace: str,
+        method: str,
+        payload: "MerossPayloadType",
+    ) -> MerossResponse | None:
+        """Queues the (SET) request so that it could be packed together with
+        other commands issued in the same (short) time window."""
+        future = self.hass.loop.create_future()
+        command_batch = self._command_batch
+        command_batch.append(((namespace, method, payload), future))
+        if len(command_batch) >= self.multiple_max:
+            self._command_batch_flush()
+        elif not self._command_batch_unsub:
+            self._command_batch_unsub = self.schedule_callback(
+                self._command_batch_window, self._command_batch_flush
+            )
+        return await future
+
+    @callback
+    def _command_batch_flush(self):
+        if self._command_batch_unsub:
+            self._command_batch_unsub.cancel()
+            self._command_batch_unsub = None
+        command_batch = self._command_batch
+        self._command_batch = []
+        self.async_create_task(
+            self._async_command_batch_send(command_batch), ".command_batch_send"
+        )
+
+    async def _async_command_batch_send(
+        self,
+        command_batch: "list[tuple[MerossRequestType, Future[MerossResponse | None]]]",
+    ):
+        futures = [command[1] for command in command_batch]
+        try:
+            # callers might have been cancelled in the meantime: don't bother sending
+            command_batch = [
+                command for command in command_batch if not command[1].done()
+            ]
+            if len(command_batch) > 1:
+                commands = {}
+                for request, future in command_batch:
+                    commands[MerossRequest.generate_id()] = (request, future)
+                if response := await self._async_request(
+                    mn.Appliance_Control_Multiple.name,
+                    mc.METHOD_SET,
+                    {
+                        mn.Appliance_Control_Multiple.key: [
+                            {
+                                mc.KEY_HEADER: {
+                                    mc.KEY_MESSAGEID: messageid,
+                                    mc.KEY_METHOD: request[1],
+                                    mc.KEY_NAMESPACE: request[0],
+                                },
+                                mc.KEY_PAYLOAD: request[2],
+                            }
+                            for messageid, (request, future) in commands.items()
+                        ]
+                    },
+                ):
+                    if response[mc.KEY_HEADER][mc.KEY_METHOD] == mc.METHOD_SETACK:
+                        multiple = response[mc.KEY_PAYLOAD][mc.KEY_MULTIPLE]
+                        # raw slices avoid re-serializing each sub-response
+                        multiple_raw = response.json_multiple_raw()
+                        if len(multiple_raw) != len(multiple):
+                            multiple_raw = repeat(None, len(multiple))
+                        for message, message_raw in zip(multiple, multiple_raw):
+                            if command := commands.pop(
+                                message[mc.KEY_HEADER].get(mc.KEY_MESSAGEID), None
+                            ):
+                                self.commands_batched_count += 1
+                                if not command[1].done():
+                                    command[1].set_result(
+                                        MerossResponse.from_message(
+                                            message, message_raw
+                                        )
+                                    )
+                # anything not (properly) acknowledged falls back to single requests
+                command_batch = commands.values()
+
+            for request, future in command_batch:
+                if future.done():
+                    continue
+                try:
+                    response = await self._async_request(*request)
+                except Exception as exception:
+                    if not future.done():
+                        future.set_exception(exception)
+                else:
+                    if not future.done():
+                        future.set_result(response)
+        finally:
+            # on errors/cancellation (shutdown) the callers will just receive None
+            for future in futures:
+                if not future.done():
+                    future.set_result(None)
+
+    async def _async_request(
+        self,
+        namespace: str,
+        method: str,
+        payload: "MerossPayloadType",
+    ) -> MerossResponse | None:
         self.lastrequest = time()
         mqttfailed = False
         if self.curr_protocol is CONF_PROTOCOL_MQTT:
@@ -1000,6 +1350,7 @@ class Device(BaseDevice, ConfigEntryManager):
         self.device_debug = None
         for handler in self.namespace_handlers.values():
             handler.polling_epoch_next = 0.0
+            handler.payload_fingerprints_reset()
 
     def get_type(self) -> mlc.DeviceType:
         return mlc.DeviceType.DEVICE
@@ -1008,6 +1359,17 @@ class Device(BaseDevice, ConfigEntryManager):
         return self.descriptor.productname
 
     # interface: self
+    def _push_trackers_reset(self):
+        """Invalidates the PUSH confidence when (re)starting receiving over MQTT
+        since we could have lost any number of pushes in the meantime."""
+        for handler in self.namespace_handlers.values():
+            if handler.push_tracker:
+                handler.push_tracker.reset()
+
+    def _payload_fingerprints_reset(self):
+        for handler in self.namespace_handlers.values():
+            handler.payload_fingerprints_reset()
+
     @property
     def host(self):
         return self.config.get(CONF_HOST) or self.descriptor.innerIp
@@ -1165,6 +1527,17 @@ class Device(BaseDevice, ConfigEntryManager):
                     },
                 )
             ] = bool
+            config_schema[
+                vol.Optional(
+                    mlc.CONF_COMMAND_BATCH_WINDOW,
+                    default=0,
+                    description={
+                        "suggested_value": self.config.get(
+                            mlc.CONF_COMMAND_BATCH_WINDOW
+                        )
+                    },
+                )
+            ] = vol.All(int, vol.Range(min=0, max=mlc.CONF_COMMAND_BATCH_WINDOW_MAX))
 
         if mn.Appliance_System_Time.name in self.descriptor.ability:
             global TIMEZONES_SET
@@ -1261,7 +1634,6 @@ class Device(BaseDevice, ConfigEntryManager):
             else 0
         )
         self._multiple_requests.clear()
-        self._multiple_response_size = PARAM_HEADER_SIZE
 
     async def async_multiple_requests_ack(
         self, requests: "Collection[MerossRequestType]", auto_handle: bool = True
@@ -1303,60 +1675,85 @@ class Device(BaseDevice, ConfigEntryManager):
             return multiple_response[mc.KEY_PAYLOAD][mc.KEY_MULTIPLE]
 
     async def _async_multiple_requests_flush(self):
+        """Packs the due polling requests (together with the lazy ones) in the fewest
+        Appliance.Control.Multiple batches and sends them."""
         multiple_requests = self._multiple_requests
-        multiple_response_size = self._multiple_response_size
         self._multiple_requests = []
-        self._multiple_response_size = PARAM_HEADER_SIZE
+        if not self.online:
+            return
+        epoch = self._polling_epoch
+        for batch in pack_multiple_requests(
+            multiple_requests,
+            self._lazypoll_requests,
+            self.multiple_max,
+            self.device_response_size_max,
+        ):
+            if not self._mqtt_budget_allow(
+                self.mqtt_budget.get_multiple_priority(batch.requests), epoch
+            ):
+                continue
+            for handler in batch.lazy_handlers:
+                handler.lastrequest = epoch
+                handler.polling_epoch_next = epoch + handler.polling_period
+            await self._async_multiple_requests_send(batch.requests, batch.size)
+            if not self.online:
+                break
 
+    async def _async_multiple_requests_send(
+        self,
+        multiple_requests: "list[MerossRequestType]",
+        multiple_response_size: int,
+    ):
         requests_len = len(multiple_requests)
         while self.online and requests_len:
-            lazypoll_requests = self._lazypoll_requests
-            while (requests_len < self.multiple_max) and lazypoll_requests:
-                # we have space available in current ns_multiple and lazy pollers are waiting
-                for handler in lazypoll_requests:
-                    # lazy pollers are ordered by 'oldest polled first' so
-                    # the first is the one which hasn't been polled since longer
-                    # we then decide to add to the current ns_multiple the first that would fit in
-                    if (
-                        handler.polling_response_size + multiple_response_size
-                    ) < self.device_response_size_max:
-                        handler.lastrequest = self._polling_epoch
-                        handler.polling_epoch_next = (
-                            handler.lastrequest + handler.polling_period
-                        )
-                        multiple_requests.append(handler.polling_request)
-                        lazypoll_requests.remove(handler)
-                        multiple_response_size += handler.polling_response_size
-                        requests_len += 1
-                        # check if we can add more
-                        break  # for
-                else:
-                    # no lazy_poller could match..break out of while
-                    break  # while
-
             if requests_len == 1:
                 await self.async_request(*multiple_requests[0])
                 return
 
-            if not (
-                response := await self.async_request_ack(
+            # build the envelope splicing the pre-serialized (polling) requests
+            # and register it as a (transient) template so that the transport
+            # doesn't need to encode it all again
+            multiple_items = []
+            multiple_items_json = []
+            for request in multiple_requests:
+                messageid = MerossRequest.generate_id()
+                multiple_items.append(
+                    {
+                        mc.KEY_HEADER: {
+                            mc.KEY_MESSAGEID: messageid,
+                            mc.KEY_METHOD: request[1],
+                            mc.KEY_NAMESPACE: request[0],
+                        },
+                        mc.KEY_PAYLOAD: request[2],
+                    }
+                )
+                multiple_items_json.append(
+                    self._get_request_template(request).multiple_item_json(messageid)
+                )
+            multiple_payload = {mn.Appliance_Control_Multiple.key: multiple_items}
+            self._request_templates[mn.Appliance_Control_Multiple.name] = (
+                multiple_template
+            ) = MerossRequestTemplate(
+                mn.Appliance_Control_Multiple.name,
+                mc.METHOD_SET,
+                multiple_payload,
+                self._topic_response,
+                mlc.DOMAIN,
+                f'{{"{mn.Appliance_Control_Multiple.key}":[{",".join(multiple_items_json)}]}}',
+            )
+            try:
+                response = await self.async_request_ack(
                     mn.Appliance_Control_Multiple.name,
                     mc.METHOD_SET,
-                    {
-                        mn.Appliance_Control_Multiple.key: [
-                            {
-                                mc.KEY_HEADER: {
-                                    mc.KEY_MESSAGEID: MerossRequest.generate_id(),
-                                    mc.KEY_METHOD: request[1],
-                                    mc.KEY_NAMESPACE: request[0],
-                                },
-                                mc.KEY_PAYLOAD: request[2],
-                            }
-                            for request in multiple_requests
-                        ]
-                    },
+                    multiple_payload,
                 )
-            ):
+            finally:
+                if (
+                    self._request_templates.get(mn.Appliance_Control_Multiple.name)
+                    is multiple_template
+                ):
+                    del self._request_templates[mn.Appliance_Control_Multiple.name]
+            if not response:
                 # the ns_multiple failed but the reason could be the device
                 # did overflow somehow. I've seen 2 kind of errors so far on the
                 # HTTP client: typically the device returns an incomplete json
@@ -1399,26 +1796,33 @@ class Device(BaseDevice, ConfigEntryManager):
                     requests_len,
                     responses_len,
                     multiple_response_size,
-                    len(response.json()),
+                    response.json_size(),
                 )
             message: "MerossMessageType"
+            # raw sub-messages (used to learn the response size model
+            # and to fingerprint the payloads)
+            multiple_raw = response.json_multiple_raw()
+            if len(multiple_raw) != responses_len:
+                multiple_raw = repeat(None, responses_len)
             if responses_len == requests_len:
                 # faster shortcut
-                for message in multiple_responses:
+                for message, message_raw in zip(multiple_responses, multiple_raw):
                     self._handle(
                         message[mc.KEY_HEADER],
                         message[mc.KEY_PAYLOAD],
+                        message_raw,
                     )
                 return
             elif responses_len:
                 # the requests payload was too big and the response was
                 # truncated. the http client tried to 'recover' by discarding
                 # the incomplete payloads so we'll check what's missing
-                for message in multiple_responses:
+                for message, message_raw in zip(multiple_responses, multiple_raw):
                     m_header = message[mc.KEY_HEADER]
                     self._handle(
                         m_header,
                         message[mc.KEY_PAYLOAD],
+                        message_raw,
                     )
                     namespace = m_header[mc.KEY_NAMESPACE]
                     for request in multiple_requests:
@@ -1458,16 +1862,32 @@ class Device(BaseDevice, ConfigEntryManager):
                 "Attempting to use async_mqtt_request with no publishing profile",
             )
             return None
-        self._mqtt_lastrequest = time()
+        # the local timestamp keeps the RTT sample consistent when
+        # more requests are in flight (_mqtt_lastrequest is device-wide)
+        self._mqtt_lastrequest = request_time = time()
         self._trace_or_log(
-            self._mqtt_lastrequest,
+            request_time,
             request,
             CONF_PROTOCOL_MQTT,
             ConfigEntryManager.TRACE_TX,
         )
         if _mqtt_publish.is_cloud_connection:
             self._queued_cloudpoll_requests += 1
-        return await _mqtt_publish.async_mqtt_publish(self.id, request)
+            mqtt_budget = self.mqtt_budget
+            mqtt_budget.record(mqtt_budget.get_message_priority(request), request_time)
+            return await _mqtt_publish.async_mqtt_publish(self.id, request)
+        if self._poll_slots and (
+            (slot := self._poll_slots.get(asyncio.current_task())) is not None  # type: ignore
+        ):
+            self._poll_messageids[request.messageid] = slot
+        response = await _mqtt_publish.async_mqtt_publish(self.id, request)
+        if response:
+            epoch = time()
+            self.mqtt_score.success(epoch - request_time)
+            self._check_protocol_score(epoch)
+        else:
+            self.mqtt_score.failure()
+        return response
 
     async def async_mqtt_request(
         self,
@@ -1476,9 +1896,7 @@ class Device(BaseDevice, ConfigEntryManager):
         payload: "MerossPayloadType",
     ):
         return await self.async_mqtt_request_raw(
-            MerossRequest(
-                namespace, method, payload, self.key, self._topic_response, mlc.DOMAIN
-            )
+            self._build_request(namespace, method, payload)
         )
 
     def mqtt_request(
@@ -1504,15 +1922,24 @@ class Device(BaseDevice, ConfigEntryManager):
             )
             return None
 
-        self._http_lastrequest = time()
+        # local timestamp for the RTT sample (see async_mqtt_request_raw)
+        self._http_lastrequest = request_time = time()
         self._trace_or_log(
-            self._http_lastrequest,
+            request_time,
             request,
             CONF_PROTOCOL_HTTP,
             ConfigEntryManager.TRACE_TX,
         )
+        # the expected response size helps the http client to not time out
+        # big responses (see MerossHttpClient.get_timeouts)
+        if request.namespace == mn.Appliance_Control_Multiple.name:
+            response_size = int(self.device_response_size_max)
+        elif handler := self.namespace_handlers.get(request.namespace):
+            response_size = handler.polling_response_size
+        else:
+            response_size = 0
         try:
-            response = await http.async_request_raw(request.json())
+            response = await http.async_request_raw(request.json_bytes(), response_size)
         except TerminatedException:
             return None
         except JSONDecodeError as jsonerror:
@@ -1528,29 +1955,29 @@ class Device(BaseDevice, ConfigEntryManager):
                 str(jsonerror),
             )
             response_text = jsonerror.doc
-            response_text_len_safe = int(len(response_text) * 0.9)
-            if jsonerror.pos < response_text_len_safe:
-                # if the error is too early in the payload...
-                return None
-            # the error happened because of truncated json payload
-            self.device_response_size_max = response_text_len_safe
-            if self.device_response_size_min > response_text_len_safe:
-                self.device_response_size_min = response_text_len_safe
-            self.log(
-                self.DEBUG,
-                "Updating device_response_size_min:%d device_response_size_max:%d",
-                self.device_response_size_min,
-                self.device_response_size_max,
-            )
-            if request.namespace is not mn.Appliance_Control_Multiple.name:
-                return None
-            # try to recover NS_MULTIPLE by discarding the incomplete
-            # message at the end
-            trunc_pos = response_text.rfind(',{"header":')
-            if trunc_pos == -1:
+            if request.namespace is mn.Appliance_Control_Multiple.name:
+                # try to recover NS_MULTIPLE by salvaging all of the complete
+                # messages before the truncation point
+                response, overflow_pos = salvage_multiple_response(response_text)
+            else:
+                response = None
+                overflow_pos = len(response_text)
+            if response or (jsonerror.pos >= int(overflow_pos * 0.9)):
+                # the error happened because of truncated json payload and
+                # the device output buffer is (exactly) what we've received
+                self.device_response_size_max = overflow_pos
+                if self.device_response_size_min > overflow_pos:
+                    self.device_response_size_min = overflow_pos
+                self.log(
+                    self.DEBUG,
+                    "Updating device_response_size_min:%d device_response_size_max:%d",
+                    self.device_response_size_min,
+                    self.device_response_size_max,
+                )
+                self._schedule_save_store()
+            if not response:
+                self.http_score.failure()
                 return None
-            response_text = response_text[0:trunc_pos] + "]}}"
-            response = MerossResponse(response_text)
 
         except Exception as exception:
             namespace = request.namespace
@@ -1563,6 +1990,7 @@ class Device(BaseDevice, ConfigEntryManager):
                 exception.__class__.__name__,
                 str(exception),
             )
+            self.http_score.failure()
             if not self.online:
                 return None
 
@@ -1602,12 +2030,14 @@ class Device(BaseDevice, ConfigEntryManager):
             return None
 
         self._http_lastresponse = epoch
+        self.http_score.success(epoch - request_time)
         if not self._http_active:
             self._http_active = http
             self.sensor_protocol.update_attr_active(ProtocolSensor.ATTR_HTTP)
         if self.curr_protocol is not CONF_PROTOCOL_HTTP:
             if (self.pref_protocol is CONF_PROTOCOL_HTTP) or (not self._mqtt_active):
                 self._switch_protocol(CONF_PROTOCOL_HTTP)
+        self._check_protocol_score(epoch)
         self._receive(epoch, response)
         return response
 
@@ -1618,12 +2048,67 @@ class Device(BaseDevice, ConfigEntryManager):
         payload: "MerossPayloadType",
     ):
         return await self.async_http_request_raw(
-            MerossRequest(
-                namespace, method, payload, self.key, self._topic_response, mlc.DOMAIN
-            )
+            self._build_request(namespace, method, payload)
+        )
+
+    def _build_request(
+        self, namespace: str, method: str, payload: "MerossPayloadType", /
+    ):
+        """Builds the request using the pre-serialized template when available
+        (polling requests) or the 'full' MerossRequest encoding otherwise."""
+        if (
+            (template := self._request_templates.get(namespace))
+            and (template.payload is payload)
+            and (template.method == method)
+            and (template.from_ == self._topic_response)
+        ):
+            return template.build(self.key)
+        return MerossRequest(
+            namespace, method, payload, self.key, self._topic_response, mlc.DOMAIN
+        )
+
+    def _get_request_template(self, request: "MerossRequestType", /):
+        """Returns (eventually creating) the template for a polling request.
+        Templates are indexed by namespace (and only match the very same payload
+        object) so that replacing the polling request replaces its template too.
+        They must be invalidated (see request_template_invalidate) whenever the
+        payload is changed in place."""
+        payload = request[2]
+        if (
+            (template := self._request_templates.get(request[0]))
+            and (template.payload is payload)
+            and (template.method == request[1])
+            and (template.from_ == self._topic_response)
+        ):
+            return template
+        self._request_templates[request[0]] = template = MerossRequestTemplate(
+            *request, self._topic_response, mlc.DOMAIN
         )
+        return template
+
+    def request_template_invalidate(self, namespace: str, /):
+        self._request_templates.pop(namespace, None)
+
+    def _mqtt_budget_allow(self, priority: int, epoch: float, /):
+        """Checks the hourly (cloud) MQTT budget when polls would go through it."""
+        if (
+            (self.curr_protocol is CONF_PROTOCOL_MQTT)
+            and (mqtt_publish := self._mqtt_publish)
+            and mqtt_publish.is_cloud_connection
+        ):
+            return self.mqtt_budget.allow(priority, epoch)
+        return True
 
     async def async_request_poll(self, handler: NamespaceHandler):
+        if not self._mqtt_budget_allow(
+            self.mqtt_budget.get_priority(handler.ns.name, mc.METHOD_GET),
+            self._polling_epoch,
+        ):
+            # hourly budget exhausted for this class of polls
+            return False
+        # warms up the template cache: _build_request only looks templates up
+        # (and NS_MULTIPLE packing splices their pre-serialized payloads)
+        self._get_request_template(handler.polling_request)
         handler.lastrequest = self._polling_epoch
         handler.polling_epoch_next = handler.lastrequest + handler.polling_period
         if (not self.multiple_max) or (
@@ -1632,27 +2117,13 @@ class Device(BaseDevice, ConfigEntryManager):
             # multiple requests are disabled
             # or this request alone would overflow the device response size limit
             await self.async_request(*handler.polling_request)
-            return
-        # estimate the size of the multiple response
-        multiple_response_size = (
-            self._multiple_response_size + handler.polling_response_size
+            return True
+        # the request will be packed at the end of the polling cycle
+        # (see _async_multiple_requests_flush) when the whole set is known
+        self._multiple_requests.append(
+            (handler.polling_request, handler.polling_response_size)
         )
-        if multiple_response_size > self.device_response_size_max:
-            # this request (together with already previously packed)
-            # would overflow the device response size limit
-            if not self._multiple_requests:
-                # again this request alone would overflow the device response size limit
-                await self.async_request(*handler.polling_request)
-                return
-            # flush the pending multiple requests
-            await self._async_multiple_requests_flush()
-            multiple_response_size = (
-                self._multiple_response_size + handler.polling_response_size
-            )
-        self._multiple_requests.append(handler.polling_request)
-        self._multiple_response_size = multiple_response_size
-        if len(self._multiple_requests) >= self.multiple_max:
-            await self._async_multiple_requests_flush()
+        return True
 
     async def async_request_smartpoll(
         self,
@@ -1660,28 +2131,34 @@ class Device(BaseDevice, ConfigEntryManager):
         *,
         cloud_queue_max: int = 1,
     ):
-        if (
-            (self.curr_protocol is CONF_PROTOCOL_MQTT)
-            and (self._queued_cloudpoll_requests >= cloud_queue_max)
-            and (
-                (self._polling_epoch - handler.lastrequest)
-                < handler.polling_period_cloud
-            )
-        ):
-            # the request would go over cloud mqtt but we've already queued some
-            # and we could wait up to handler.polling_period_cloud
-            return False
-        await self.async_request_poll(handler)
-        return True
+        if self.curr_protocol is CONF_PROTOCOL_MQTT:
+            epoch = self._polling_epoch
+            deferrable = (epoch - handler.lastrequest) < handler.polling_period_cloud
+            if deferrable and (self._queued_cloudpoll_requests >= cloud_queue_max):
+                # the request would go over cloud mqtt but we've already queued some
+                # and we could wait up to handler.polling_period_cloud
+                return False
+            if (
+                deferrable
+                and (mqtt_publish := self._mqtt_publish)
+                and mqtt_publish.is_cloud_connection
+                and (mqtt_publish.get_rl_safe_delay(self.id) > self.polling_period)
+            ):
+                # the rate limiter window is getting crowded: leave room
+                # for user commands and retry on a later cycle
+                return False
+        # the hourly budget is checked in async_request_poll
+        return await self.async_request_poll(handler)
 
     def _poll(self, namespace: str | None = None):
         self._polling_unsub = None
-        self._polling_task = self.async_create_task(
+        self._polling_task = polling_task = self.async_create_task(
             self._async_poll(namespace),
             f"._async_poll({namespace})",
             False,
         )
-        return self._polling_task
+        self.api.polling_scheduler.track(polling_task)
+        return polling_task
 
     async def _async_poll(self, namespace: str | None):
         self._polling_epoch = epoch = time()
@@ -1703,18 +2180,25 @@ class Device(BaseDevice, ConfigEntryManager):
                 # since we'll just try the switch when mqtt fails
                 if (
                     (self.curr_protocol is CONF_PROTOCOL_MQTT)
-                    and (self.pref_protocol is CONF_PROTOCOL_HTTP)
+                    and (
+                        (self.pref_protocol is CONF_PROTOCOL_HTTP)
+                        or (
+                            # keep HTTP scoring alive when free to switch
+                            (self.conf_protocol is CONF_PROTOCOL_AUTO)
+                            and self._http
+                            and self.mqtt_locallyactive
+                        )
+                    )
                     and ((epoch - self._http_lastrequest) > PARAM_HEARTBEAT_PERIOD)
                 ):
-                    if await self.async_http_request(
-                        *mn.Appliance_System_All.request_get
-                    ):
-                        namespace = mn.Appliance_System_All.name
+                    heartbeat_request = self._get_heartbeat_request(epoch)
+                    if await self.async_http_request(*heartbeat_request):
+                        namespace = heartbeat_request[0]
                     # going on, should the http come online, the next
                     # async_request_updates will be 'smart' again, skipping
                     # state updates coming through mqtt (since we're still
                     # connected) but now requesting over http as preferred.
-                    # Also, we're forcibly passing namespace = NS_ALL to
+                    # Also, we're forcibly passing namespace = heartbeat ns to
                     # tell the self._async_request_updates we've already polled that
 
                 if self.mqtt_locallyactive:
@@ -1722,7 +2206,7 @@ class Device(BaseDevice, ConfigEntryManager):
                     # be unused for quite a bit
                     if (epoch - self._mqtt_lastresponse) > PARAM_HEARTBEAT_PERIOD:
                         if not await self.async_mqtt_request(
-                            *mn.Appliance_System_All.request_get
+                            *self._get_heartbeat_request(epoch)
                         ):
                             self._mqtt_active = None
                             self.device_debug = None
@@ -1754,19 +2238,22 @@ class Device(BaseDevice, ConfigEntryManager):
 
             else:  # offline or 'likely' offline (failed last request)
                 ns_all_handler = self.namespace_handlers[mn.Appliance_System_All.name]
-                coro_func: list["AsyncRequestFunc"] = []
-                if self._http:
-                    coro_func.append(self.async_http_request)
-                if self._mqtt_publish:
-                    coro_func.append(self.async_mqtt_request)
-
-                if len(coro_func) > 1:
+                # each transport is guarded by its own circuit breaker so that
+                # we don't keep sending full NS_ALL requests to devices which are
+                # unreachable for long (unplugged)
+                probes: list[tuple["AsyncRequestFunc", CircuitBreaker]] = []
+                if (http := self._http) and await self._async_http_probe(http, epoch):
+                    probes.append((self.async_http_request, self.http_breaker))
+                if self._mqtt_publish and self.mqtt_breaker.allow(epoch):
+                    probes.append((self.async_mqtt_request, self.mqtt_breaker))
+
+                if len(probes) > 1:
                     tasks = {
                         self.async_create_task(
                             coro(*ns_all_handler.polling_request),
                             f".async_poll_{coro.__name__}_task",
                         )
-                        for coro in coro_func
+                        for coro, _ in probes
                     }
                     # use pre 3.13 compatible syntax/semantics
                     for earliest_connect in asyncio.as_completed(tasks, timeout=5):
@@ -1779,21 +2266,23 @@ class Device(BaseDevice, ConfigEntryManager):
                             break
                     else:  # shouldnt be needed: just silences type-checker
                         ns_all_response = None
-                elif coro_func:
-                    ns_all_response = await coro_func[0](
+                elif probes:
+                    ns_all_response = await probes[0][0](
                         *ns_all_handler.polling_request
                     )
                 else:
                     raise asyncio.TimeoutError("No transport available for polling")
 
                 if not ns_all_response:
+                    for _, breaker in probes:
+                        breaker.failure(epoch)
                     raise asyncio.TimeoutError("No response for NS_ALL polling")
 
                 ns_all_handler.lastrequest = epoch
                 ns_all_handler.polling_epoch_next = (
                     epoch + ns_all_handler.polling_period
                 )
-                ns_all_handler.polling_response_size = len(ns_all_response.json())
+                ns_all_handler.polling_response_size = ns_all_response.json_size()
                 namespace = ns_all_handler.ns.name
 
             """
@@ -1811,15 +2300,23 @@ class Device(BaseDevice, ConfigEntryManager):
             self._queued_cloudpoll_requests = 0
             # self.namespace_handlers could change at any time due to async
             # message parsing (handlers might be dynamically created by then)
-            for handler in [
+            handlers = [
                 handler
                 for handler in self.namespace_handlers.values()
                 if (handler.ns.name != namespace)
-            ]:
-                if handler.polling_strategy:
-                    await handler.polling_strategy(handler)
-                    if not self.online:
-                        break  # do not return: do the flush first!
+            ]
+            if (
+                (mlc.PARAM_POLL_CONCURRENCY > 1)
+                and (self.curr_protocol is CONF_PROTOCOL_MQTT)
+                and self.mqtt_locallyactive
+            ):
+                await self._async_poll_parallel(handlers)
+            else:
+                for handler in handlers:
+                    if handler.polling_strategy:
+                        await handler.polling_strategy(handler)
+                        if not self.online:
+                            break  # do not return: do the flush first!
 
             # needed even if offline: it takes care of resetting the ns_multiple state
             if self._multiple_requests:
@@ -1867,11 +2364,96 @@ class Device(BaseDevice, ConfigEntryManager):
         finally:
             self._polling_task = None
 
-        self._polling_unsub = self.schedule_callback(
-            self._polling_delay, self._poll, None
+        self._polling_unsub = self.api.polling_scheduler.schedule(
+            self, self._polling_delay
         )
         self.log(self.DEBUG, "Polling end")
 
+    def _get_heartbeat_request(self, epoch: float, /) -> "MerossRequestType":
+        """Returns the request used to check the device is alive: this is the
+        smallest GET the device supports (see HEARTBEAT_NAMESPACES) while the full
+        NS_ALL is only requested every PARAM_HEARTBEAT_ALL_PERIOD."""
+        if (
+            epoch - self.namespace_handlers[mn.Appliance_System_All.name].lastresponse
+        ) < mlc.PARAM_HEARTBEAT_ALL_PERIOD:
+            ability = self.descriptor.ability
+            for ns in self.HEARTBEAT_NAMESPACES:
+                if ns.name in ability:
+                    return ns.request_get
+        return mn.Appliance_System_All.request_get
+
+    async def _async_poll_parallel(self, handlers: list[NamespaceHandler], /):
+        """Runs the polling strategies with bounded concurrency. This is only
+        used over local MQTT since our HTTP client serializes requests to the same
+        host anyway (SESSION_MAXIMUM_CONNECTIONS_PER_HOST) and cloud MQTT
+        is rate limited. The replies of a slot are held back in mqtt_receive until
+        every earlier slot is done (see _poll_slot_release) so that they're processed
+        in the same (handlers) order as a sequential poll would."""
+        semaphore = asyncio.Semaphore(mlc.PARAM_POLL_CONCURRENCY)
+
+        async def _async_poll_handler(index: int, handler: NamespaceHandler):
+            try:
+                async with semaphore:
+                    if self.online and handler.polling_strategy:
+                        await handler.polling_strategy(handler)
+            finally:
+                self._poll_slot_release(index)
+
+        poll_slots = self._poll_slots
+        self._poll_slot_head = 0
+        for index, handler in enumerate(handlers):
+            # not eager so that the slot is registered before any request is sent
+            task = self.async_create_task(
+                _async_poll_handler(index, handler),
+                f"._async_poll_parallel({handler.ns.name})",
+                False,
+            )
+            poll_slots[task] = index
+        try:
+            results = await asyncio.gather(*poll_slots, return_exceptions=True)
+        finally:
+            self._poll_slots = {}
+            self._poll_messageids = {}
+            self._poll_slots_done = set()
+            poll_received = self._poll_received
+            self._poll_received = {}
+            # leftovers (if any) when the gather itself was cancelled
+            for slot in sorted(poll_received):
+                for epoch, message in poll_received[slot]:
+                    self._receive(epoch, message)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    def _poll_slot_release(self, slot: int, /):
+        """Marks the parallel poll slot as done and replays the held back replies
+        of the following slots as soon as all of their predecessors are done."""
+        if not self._poll_slots:
+            # the parallel poll has already been cancelled (and flushed)
+            return
+        poll_slots_done = self._poll_slots_done
+        poll_slots_done.add(slot)
+        head = self._poll_slot_head
+        while head in poll_slots_done:
+            head += 1
+            for epoch, message in self._poll_received.pop(head, ()):
+                self._receive(epoch, message)
+        self._poll_slot_head = head
+
+    async def _async_http_probe(self, http: MerossHttpClient, epoch: float, /):
+        """Checks the HTTP circuit breaker allows probing the (offline) device.
+        When the circuit is (half) open a cheap TCP connect is tried before
+        allowing the full NS_ALL request."""
+        http_breaker = self.http_breaker
+        if not http_breaker.allow(epoch):
+            return False
+        if http_breaker.is_open:
+            if not await http.async_tcp_probe(mlc.PARAM_TCP_PROBE_TIMEOUT):
+                self.log(self.DEBUG, "HTTP circuit open: TCP probe failed")
+                http_breaker.failure(epoch)
+                return False
+        return True
+
     async def async_poll_stop(self):
         """Ensure we're not polling nor any schedule is in place."""
         if self._polling_unsub:
@@ -1892,8 +2474,12 @@ class Device(BaseDevice, ConfigEntryManager):
             self.device_debug = None
             for handler in self.namespace_handlers.values():
                 handler.polling_epoch_next = 0.0
-            # this will also restart/schedule the cycle
-            await self._poll()
+            # the cycle is booked on the fleet scheduler (like every other) so that
+            # many concurrent refreshes are spread. This will also restart/schedule the cycle
+            self._polling_unsub = polling_entry = self.api.polling_scheduler.schedule(
+                self, 0
+            )
+            await polling_entry.async_wait()
 
     def mqtt_receive(self, message: "MerossResponse"):
         assert self._mqtt_connected
@@ -1901,11 +2487,28 @@ class Device(BaseDevice, ConfigEntryManager):
         self._trace_or_log(epoch, message, CONF_PROTOCOL_MQTT, self.TRACE_RX)
         if not self._mqtt_active:
             self._mqtt_active = self._mqtt_connected
+            self._push_trackers_reset()
             if self.online:
                 self.sensor_protocol.update_attr_active(ProtocolSensor.ATTR_MQTT)
         if self.curr_protocol is not CONF_PROTOCOL_MQTT:
             if (self.pref_protocol is CONF_PROTOCOL_MQTT) or (not self._http_active):
                 self._switch_protocol(CONF_PROTOCOL_MQTT)
+        if (
+            self._poll_messageids
+            and (
+                (
+                    slot := self._poll_messageids.pop(
+                        message[mc.KEY_HEADER][mc.KEY_MESSAGEID], None
+                    )
+                )
+                is not None
+            )
+            and (slot > self._poll_slot_head)
+        ):
+            # reply to a request issued by a parallel poll while earlier
+            # slots are still running: hold it back
+            self._poll_received.setdefault(slot, []).append((epoch, message))
+            return
         self._receive(epoch, message)
 
     def mqtt_attached(self, mqtt_connection: "MQTTConnection"):
@@ -1946,8 +2549,7 @@ class Device(BaseDevice, ConfigEntryManager):
             self._mqtt_publish = _mqtt_connection
             if not self.online and self._polling_unsub:
                 # reschedule immediately
-                self._polling_unsub.cancel()
-                self._polling_unsub = self.schedule_callback(0, self._poll, None)
+                self._polling_unsub = self.api.polling_scheduler.schedule(self, 0)
         elif self.conf_protocol is CONF_PROTOCOL_MQTT:
             self.log(
                 self.WARNING,
@@ -2024,6 +2626,7 @@ class Device(BaseDevice, ConfigEntryManager):
         """called whenever the configuration or the profile linking changes to fix protocol transports"""
         _profile = self._profile
         conf_protocol = self.conf_protocol
+        self.protocol_scored = False
         if conf_protocol is CONF_PROTOCOL_AUTO:
             # When using CONF_PROTOCOL_AUTO we try to use our 'preferred' (pref_protocol)
             # and eventually fallback (curr_protocol) until some good news allow us
@@ -2061,11 +2664,13 @@ class Device(BaseDevice, ConfigEntryManager):
         default (received) message handling entry point
         """
         self.lastresponse = epoch
-        message_size = len(message.json())
+        message_raw = message.json_raw()
+        message_size = len(message_raw)
         if message_size > self.device_response_size_min:
             self.device_response_size_min = message_size
             if message_size > self.device_response_size_max:
                 self.device_response_size_max = message_size
+            self._schedule_save_store()
 
         header = message[mc.KEY_HEADER]
         # we'll use the device timestamp to 'align' our time to the device one
@@ -2104,20 +2709,22 @@ class Device(BaseDevice, ConfigEntryManager):
         if not self.online:
             self._set_online()
             self._polling_delay = self.polling_period
+            self.http_breaker.success()
+            self.mqtt_breaker.success()
             # retrigger the polling loop in case it is scheduled/pending.
             # This could happen when we receive an MQTT message
             if self._polling_unsub:
-                self._polling_unsub.cancel()
-                self._polling_unsub = self.schedule_callback(
-                    0, self._poll, header[mc.KEY_NAMESPACE]
+                self._polling_unsub = self.api.polling_scheduler.schedule(
+                    self, 0, header[mc.KEY_NAMESPACE]
                 )
 
-        return self._handle(header, message[mc.KEY_PAYLOAD])
+        return self._handle(header, message[mc.KEY_PAYLOAD], message_raw)
 
     def _handle(
         self,
         header: "MerossHeaderType",
         payload: "MerossPayloadType",
+        message_raw: "bytes | str | None" = None,
     ):
         namespace = header[mc.KEY_NAMESPACE]
         method = header[mc.KEY_METHOD]
@@ -2126,7 +2733,10 @@ class Device(BaseDevice, ConfigEntryManager):
         elif method == mc.METHOD_SETACK:
             # SETACK generally doesn't carry any state/info so it is
             # no use parsing..moreover, our callbacks system is full
-            # in place so we have no need to further process
+            # in place so we have no need to further process.
+            # Entities state could have been (optimistically) changed though
+            # so the next polls need to be fully parsed
+            self._payload_fingerprints_reset()
             return
         elif method == mc.METHOD_ERROR:
             if payload.get(mc.KEY_ERROR) == mc.ERROR_INVALIDKEY:
@@ -2169,10 +2779,22 @@ class Device(BaseDevice, ConfigEntryManager):
 
         handler.lastresponse = self.lastresponse
         handler.polling_epoch_next = handler.lastresponse + handler.polling_period
-        if method == mc.METHOD_PUSH:
+        if method == mc.METHOD_GETACK:
+            if message_raw:
+                handler.polling_response_size_learn(payload, len(message_raw))
+                self._schedule_save_store()
+            if handler.push_tracker:
+                handler.push_tracker.verify(payload, handler.lastresponse)
+            if handler.payload_unchanged(payload, message_raw, handler.lastresponse):
+                return
+        elif method == mc.METHOD_PUSH:
             # we're saving for diagnostic purposes so we have knowledge of
             # which data the device pushes asynchronously
             handler.lastpush = payload
+            if not (push_tracker := handler.push_tracker):
+                handler.push_tracker = push_tracker = PushTracker(handler.ns)
+            push_tracker.push(payload, handler.lastresponse)
+            handler.payload_fingerprints_reset()
         try:
             handler.handler(header, payload)  # type: ignore
         except Exception as exception:
@@ -2250,6 +2872,8 @@ class Device(BaseDevice, ConfigEntryManager):
             else:
                 self.device_debug = None
 
+        # digest parsing updates entities bypassing their namespace handlers
+        self._payload_fingerprints_reset()
         for key_digest, _digest in descr.digest.items() or descr.control.items():
             self.digest_handlers[key_digest](_digest)
 
@@ -2272,12 +2896,30 @@ class Device(BaseDevice, ConfigEntryManager):
             if mqtt_connection.broker.host == broker.host:
                 if self._mqtt_connected and not self._mqtt_active:
                     self._mqtt_active = mqtt_connection
+                    self._push_trackers_reset()
                     self.sensor_protocol.update_attr_active(ProtocolSensor.ATTR_MQTT)
                     if self.curr_protocol is not self.pref_protocol:
                         self._switch_protocol(self.pref_protocol)
             elif mqtt_connection.is_cloud_connection:
                 mqtt_connection.detach(self)
 
+    def _handle_Appliance_System_Firmware(self, header: dict, payload: dict):
+        # this is (likely) the reply to our lightweight heartbeat: should it
+        # show a change in the firmware (update or new ip) we'll refresh NS_ALL
+        # which carries the full logic to manage that
+        # Only keys carried by both are compared since some firmwares
+        # don't report them all (e.g. innerIp).
+        p_firmware = payload[mc.KEY_FIRMWARE]
+        firmware = self.descriptor.firmware
+        for key in (mc.KEY_VERSION, mc.KEY_INNERIP):
+            if (
+                ((value := p_firmware.get(key)) is not None)
+                and (key in firmware)
+                and (value != firmware[key])
+            ):
+                self.request(mn.Appliance_System_All.request_get)
+                break
+
     def _handle_Appliance_System_Online(self, header: dict, payload: dict):
         # already processed by the MQTTConnection session manager
         pass
@@ -2287,8 +2929,17 @@ class Device(BaseDevice, ConfigEntryManager):
         pass
 
     def _handle_Appliance_System_Time(self, header: dict, payload: dict):
-        self.descriptor.update_time(payload[mc.KEY_TIME])
-        self.schedule_entry_update(False)
+        p_time = payload[mc.KEY_TIME]
+        descr = self.descriptor
+        # timestamp is always changing: only save when timezone/rules change
+        needsave = any(
+            descr.time.get(key) != value
+            for key, value in p_time.items()
+            if key != mc.KEY_TIMESTAMP
+        )
+        descr.update_time(p_time)
+        if needsave:
+            self.schedule_entry_update(False)
 
     def _config_device_timestamp(self, epoch):
         if self.mqtt_locallyactive and (
@@ -2512,6 +3163,37 @@ class Device(BaseDevice, ConfigEntryManager):
 
         return False
 
+    def _check_protocol_score(self, epoch: float, /):
+        """When configured for CONF_PROTOCOL_AUTO and both HTTP and local MQTT are
+        working, route requests over the transport scoring best (see TransportScore).
+        Switching needs the other transport to be better by a factor
+        (PARAM_PROTOCOL_SCORE_HYSTERESIS) and is rate limited to avoid flapping."""
+        if (
+            (self.conf_protocol is not CONF_PROTOCOL_AUTO)
+            or (not self._http_active)
+            or (not self.mqtt_locallyactive)
+            or (
+                (epoch - self._protocol_score_epoch)
+                < mlc.PARAM_PROTOCOL_SCORE_SWITCH_PERIOD
+            )
+        ):
+            return
+        http_score = self.http_score
+        mqtt_score = self.mqtt_score
+        if not (http_score.is_valid and mqtt_score.is_valid):
+            return
+        if self.curr_protocol is CONF_PROTOCOL_HTTP:
+            protocol = CONF_PROTOCOL_MQTT
+            curr_cost, best_cost = http_score.cost, mqtt_score.cost
+        else:
+            protocol = CONF_PROTOCOL_HTTP
+            curr_cost, best_cost = mqtt_score.cost, http_score.cost
+        if (best_cost * mlc.PARAM_PROTOCOL_SCORE_HYSTERESIS) < curr_cost:
+            self._protocol_score_epoch = epoch
+            self.protocol_scored = True
+            self.pref_protocol = protocol
+            self._switch_protocol(protocol)
+
     def _switch_protocol(self, protocol):
         self.log(
             self.DEBUG,
@@ -2541,6 +3223,9 @@ class Device(BaseDevice, ConfigEntryManager):
         self._polling_delay = self.polling_period
 
         self.enable_multiple(not config.get(mlc.CONF_DISABLE_MULTIPLE))
+        self._command_batch_window = (
+            config.get(mlc.CONF_COMMAND_BATCH_WINDOW) or 0
+        ) / 1000
 
         host = self.host
         if (self.conf_protocol is CONF_PROTOCOL_MQTT) or (not host):
@@ -2563,6 +3248,45 @@ class Device(BaseDevice, ConfigEntryManager):
             else:
                 self._http.disable_encryption()
 
+    async def _async_load_store(self):
+        """Restores the learned response size model(s) and limits so that
+        we don't have to re-discover them (the hard way) after every restart."""
+        with self.exception_warning("loading device store"):
+            if data := await self._store.async_load():
+                self.device_response_size_min = data["responseSizeMin"]
+                self.device_response_size_max = data["responseSizeMax"]
+                for namespace, model in data["responseSizeModel"].items():
+                    # json keys are strings: convert back to the item count
+                    self.response_size_model.setdefault(namespace, {}).update(
+                        {int(item_count): stats for item_count, stats in model.items()}
+                    )
+                for handler in self.namespace_handlers.values():
+                    handler.polling_response_size_adj(
+                        handler.polling_response_item_count
+                    )
+
+    def _store_data(self) -> "DeviceStoreType":
+        self._store_dirty = False
+        return {
+            "responseSizeMin": self.device_response_size_min,
+            "responseSizeMax": int(self.device_response_size_max),
+            "responseSizeModel": {
+                namespace: {
+                    str(item_count): [round(stats[0], 1), round(stats[1], 1)]
+                    for item_count, stats in model.items()
+                }
+                for namespace, model in self.response_size_model.items()
+                if model
+            },
+        }
+
+    def _schedule_save_store(self):
+        if not self._store_dirty:
+            self._store_dirty = True
+            self._store.async_delay_save(
+                self._store_data, mlc.PARAM_DEVICE_DELAYED_SAVE_TIMEOUT
+            )
+
     def _process_uuid_mismatch(
         self, response_uuid: str, payload_all: "MerossPayloadType | None"
     ):
@@ -363,7 +363,8 @@ class MENoChannelMixin(MLEntity if TYPE_CHECKING else object):
     async def async_request_value(self, device_value, /):
         """sends the actual request to the device. this is likely to be overloaded"""
         ns = self.ns
-        return await self.manager.async_request_ack(
+        return await self.manager.async_request_ack_coalesced(
+            (ns.name, self.key_value),
             ns.name,
             mc.METHOD_SET,
             {ns.key: {self.key_value: device_value}},
@@ -383,7 +384,8 @@ class MEDictChannelMixin(MLEntity if TYPE_CHECKING else object):
     async def async_request_value(self, device_value, /):
         """sends the actual request to the device. this is likely to be overloaded"""
         ns = self.ns
-        return await self.manager.async_request_ack(
+        return await self.manager.async_request_ack_coalesced(
+            (ns.name, self.channel, self.key_value),
             ns.name,
             mc.METHOD_SET,
             {
@@ -408,7 +410,8 @@ class MEListChannelMixin(MLEntity if TYPE_CHECKING else object):
     async def async_request_value(self, device_value, /):
         """sends the actual request to the device. this is likely to be overloaded"""
         ns = self.ns
-        return await self.manager.async_request_ack(
+        return await self.manager.async_request_ack_coalesced(
+            (ns.name, self.channel, self.key_value),
             ns.name,
             mc.METHOD_SET,
             {ns.key: [{ns.key_channel: self.channel, self.key_value: device_value}]},
@@ -427,7 +430,8 @@ class MEGroupListChannelMixin(MLEntity if TYPE_CHECKING else object):
     async def async_request_value(self, device_value, /):
         """sends the actual request to the device. this is likely to be overloaded"""
         ns = self.ns
-        return await self.manager.async_request_ack(
+        return await self.manager.async_request_ack_coalesced(
+            (ns.name, self.channel, self.key_group, self.key_value),
             ns.name,
             mc.METHOD_SET,
             {
@@ -3,7 +3,9 @@ meross_lan module interface to access Meross Cloud services
 """
 
 import asyncio
+import bisect
 from contextlib import asynccontextmanager
+from hashlib import md5
 from time import time
 import typing
 from typing import TYPE_CHECKING, override
@@ -57,6 +59,45 @@ if TYPE_CHECKING:
         tokenRequestTime: float
 
 
+class MQTTShardRing:
+    """
+    Consistent hashing of device uuids over the MQTT connections (shards) of a
+    cloud profile broker. Every shard owns VNODES points on the ring so that
+    changing the number of shards only moves ~1/shards of the devices.
+    """
+
+    if TYPE_CHECKING:
+        VNODES: Final
+
+    VNODES = 160
+
+    __slots__ = (
+        "shards",
+        "_keys",
+        "_shards",
+    )
+
+    @staticmethod
+    def hash(key: str, /):
+        return int(md5(key.encode("utf-8"), usedforsecurity=False).hexdigest()[:8], 16)
+
+    def __init__(self, shards: int, /):
+        self.shards = shards
+        points = sorted(
+            (MQTTShardRing.hash(f"{shard}:{vnode}"), shard)
+            for shard in range(shards)
+            for vnode in range(MQTTShardRing.VNODES)
+        )
+        self._keys = [point[0] for point in points]
+        self._shards = [point[1] for point in points]
+
+    def get_shard(self, device_id: str, /) -> int:
+        if self.shards == 1:
+            return 0
+        index = bisect.bisect(self._keys, MQTTShardRing.hash(device_id))
+        return self._shards[index % len(self._shards)]
+
+
 class MerossMQTTConnection(MQTTConnection, MerossMQTTAppClient):
 
     # here we're acrobatically slottizing MerossMQTTAppClient
@@ -65,8 +106,14 @@ class MerossMQTTConnection(MQTTConnection, MerossMQTTAppClient):
 
     if TYPE_CHECKING:
         is_cloud_connection: Final[bool]
+        shard: Final[int]
+        connects: int
+        disconnects: int
 
     __slots__ = (
+        "shard",
+        "connects",
+        "disconnects",
         "_asyncio_loop",
         "_future_connected",
         "_tasks",
@@ -74,22 +121,45 @@ class MerossMQTTConnection(MQTTConnection, MerossMQTTAppClient):
         "_lock_queue",
         "_rl_dropped",
         "_rl2_queues",
+        "_rx_queue",
+        "_rx_scheduled",
+        "_rx_stats",
         "_stateext",
         "_subscribe_topics",
         "_unsub_random_disconnect",
     )
 
-    def __init__(self, profile: "MerossProfile", broker: "HostAddress"):
+    def __init__(self, profile: "MerossProfile", broker: "HostAddress", shard: int = 0):
+        """
+        shard: large profiles spread their devices over more connections to the same
+        broker (see MQTTShardRing). Every shard has its own client id (derived from
+        the profile app_id) and only the first one subscribes to the push topic.
+        """
         MerossMQTTAppClient.__init__(
             self,
             profile.key,
             profile.userid,
-            app_id=profile.app_id,
+            app_id=(
+                md5(
+                    f"{profile.app_id}{shard}".encode("utf-8"), usedforsecurity=False
+                ).hexdigest()
+                if shard
+                else profile.app_id
+            ),
             loop=profile.hass.loop,
             sslcontext=get_default_ssl_context(),
+            subscribe_push=not shard,
         )
         self.is_cloud_connection = True
-        MQTTConnection.__init__(self, profile, broker, self.topic_command)
+        self.shard = shard
+        self.connects = self.disconnects = 0
+        MQTTConnection.__init__(
+            self,
+            profile,
+            broker,
+            self.topic_command,
+            f"{broker}#{shard}" if shard else None,
+        )
         if profile.isEnabledFor(profile.VERBOSE):
             self.enable_logger(self)  # type: ignore (Loggable is duck-compatible with Logger)
 
@@ -133,6 +203,9 @@ class MerossMQTTConnection(MQTTConnection, MerossMQTTAppClient):
     def get_rl_safe_delay(self, uuid: str):
         return MerossMQTTAppClient.get_rl_safe_delay(self, uuid)
 
+    def get_rl_release_delay(self, uuid: str):
+        return MerossMQTTAppClient.get_rl_release_delay(self, uuid)
+
     async def _async_mqtt_publish(
         self,
         device_id: str,
@@ -142,11 +215,35 @@ class MerossMQTTConnection(MQTTConnection, MerossMQTTAppClient):
             self.rl_publish, device_id, request
         )
 
+    def loggable_diagnostic_state(self):
+        return MQTTConnection.loggable_diagnostic_state(self) | {
+            "shard": self.shard,
+            "devices": len(self.mqttdevices),
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "rate_limit_dropped": self.rl_dropped,
+            "rx": self._rx_stats.loggable_diagnostic_state(),
+        }
+
     @callback
     def _mqtt_connected(self):
+        self.connects += 1
         MerossMQTTAppClient._mqtt_connected(self)
         MQTTConnection._mqtt_connected(self)
 
+    @callback
+    def _mqtt_disconnected(self):
+        self.disconnects += 1
+        MQTTConnection._mqtt_disconnected(self)
+
+    @callback
+    def _mqtt_rx_drained(self):
+        if sensor_connection := self.sensor_connection:
+            # state will be flushed when processing the batch (received counter)
+            sensor_connection.extra_state_attributes[sensor_connection.ATTR_QUEUE] = (
+                self._rx_stats.loggable_diagnostic_state()
+            )
+
     @callback
     def _mqtt_published(self):
         if sensor_connection := self.sensor_connection:
@@ -194,6 +291,7 @@ class MerossProfile(MQTTProfile):
         KEY_TOKEN_REQUEST_TIME: Final
 
         _data: MerossProfileStoreType
+        _mqtt_shard_ring: MQTTShardRing
         _unsub_polling_query_device_info: asyncio.TimerHandle | None
 
     KEY_APP_ID = "appId"
@@ -208,6 +306,7 @@ class MerossProfile(MQTTProfile):
         "apiclient",
         "_data",
         "_store",
+        "_mqtt_shard_ring",
         "_unsub_polling_query_device_info",
         "_device_info_time",
     )
@@ -229,6 +328,7 @@ class MerossProfile(MQTTProfile):
         # and opting to keep the credentials where they are embedded in ConfigEntry
         self.apiclient = CloudApiClient(self, self.config)
         self._store = MerossProfileStore(self.hass, profile_id)
+        self._mqtt_shard_ring = MQTTShardRing(1)
         self._unsub_polling_query_device_info = None
 
     async def async_init(self):
@@ -275,6 +375,19 @@ class MerossProfile(MQTTProfile):
                 self.KEY_TOKEN_REQUEST_TIME: 0.0,
             }
 
+        # the number of shards is only computed here so that it stays stable
+        # while the profile is loaded even if the device list changes
+        self._mqtt_shard_ring = MQTTShardRing(
+            min(
+                1
+                + (len(self._data[self.KEY_DEVICE_INFO]) - 1)
+                // mlc.PARAM_CLOUDMQTT_SHARD_DEVICES,
+                mlc.PARAM_CLOUDMQTT_SHARDS_MAX,
+            )
+            if self._data[self.KEY_DEVICE_INFO]
+            else 1
+        )
+
         if mc.KEY_MQTTDOMAIN in self.config:
             broker = HostAddress.build(self.config[mc.KEY_MQTTDOMAIN])  # type: ignore
             mqttconnection = MerossMQTTConnection(self, broker)
@@ -352,9 +465,9 @@ class MerossProfile(MQTTProfile):
                     MerossProfile.KEY_DEVICE_INFO
                 ].items()
             }
-            return {"store": store_data}
         else:
-            return {"store": self._data}
+            store_data = self._data
+        return super().loggable_diagnostic_state() | {"store": store_data}
 
     @override
     def get_device_info(self, uuid: str):
@@ -454,10 +567,17 @@ class MerossProfile(MQTTProfile):
             except:
                 return
 
-        mqttconnection = self._get_mqttconnection(broker)
+        shard = self._mqtt_shard_ring.get_shard(device.id)
+        mqttconnection = self._get_mqttconnection(broker, shard)
         mqttconnection.attach(device)
         if mqttconnection.state_inactive:
             mqttconnection.schedule_connect(broker)
+        if shard:
+            # PUSHes from any device are only received through the first shard
+            # (see MerossMQTTConnection) which might have no devices of its own
+            mqttconnection = self._get_mqttconnection(broker)
+            if mqttconnection.state_inactive:
+                mqttconnection.schedule_connect(broker)
 
     # interface: self
     @property
@@ -499,15 +619,17 @@ class MerossProfile(MQTTProfile):
 
         return mqttconnections
 
-    def _get_mqttconnection(self, broker: HostAddress) -> MerossMQTTConnection:
+    def _get_mqttconnection(
+        self, broker: HostAddress, shard: int = 0
+    ) -> MerossMQTTConnection:
         """
         Returns an existing connection from the managed pool or create one and add
         to the mqttconnections pool. The connection state is not ensured.
         """
-        connection_id = str(broker)
+        connection_id = f"{broker}#{shard}" if shard else str(broker)
         if connection_id in self.mqttconnections:
             return self.mqttconnections[connection_id]  # type: ignore
-        return MerossMQTTConnection(self, broker)
+        return MerossMQTTConnection(self, broker, shard)
 
     async def _async_get_mqttconnection(self, broker: HostAddress):
         """
@@ -1,5 +1,6 @@
 import abc
 import asyncio
+from collections import deque
 from time import time
 from typing import TYPE_CHECKING, final
 
@@ -18,12 +19,15 @@ from ..merossclient import (
     HostAddress,
     json_dumps,
 )
+from ..merossclient.httpclient import RTTHistogram
 from ..merossclient.mqttclient import MerossMQTTRateLimitException
 from ..merossclient.protocol import MerossKeyError, const as mc, namespaces as mn
 from ..merossclient.protocol.message import (
     MerossRequest,
     MerossResponse,
+    get_message_namespace_raw,
     get_message_uuid,
+    get_message_uuid_raw,
     get_replykey,
 )
 from ..sensor import MLDiagnosticSensor
@@ -32,7 +36,16 @@ from .obfuscate import obfuscated_dict
 
 if TYPE_CHECKING:
     import asyncio
-    from typing import Awaitable, Callable, ClassVar, Final, Mapping, TypedDict, Unpack
+    from typing import (
+        Awaitable,
+        Callable,
+        ClassVar,
+        Final,
+        Mapping,
+        NotRequired,
+        TypedDict,
+        Unpack,
+    )
 
     from homeassistant.components import mqtt as ha_mqtt
     from homeassistant.config_entries import ConfigEntry
@@ -59,6 +72,11 @@ class ConnectionSensor(me.MEAlwaysAvailableMixin, MLDiagnosticSensor):
         ATTR_RECEIVED: Final
         ATTR_PUBLISHED: Final
         ATTR_DROPPED: Final
+        ATTR_QUEUE: Final
+        ATTR_DISCARDED: Final
+        ATTR_PUBLISH_QUEUED: Final
+        ATTR_PUBLISH_DELAYED: Final
+        ATTR_PUBLISH_EXPIRED: Final
 
         manager: "MQTTProfile"
 
@@ -68,6 +86,11 @@ class ConnectionSensor(me.MEAlwaysAvailableMixin, MLDiagnosticSensor):
             received: int
             published: int
             dropped: int
+            publish_queued: int
+            publish_delayed: int
+            publish_expired: int
+            queue: NotRequired[dict[str, int | float]]
+            discarded: NotRequired[dict[str, int]]
 
         extra_state_attributes: AttrDictType
         native_value: str
@@ -81,6 +104,11 @@ class ConnectionSensor(me.MEAlwaysAvailableMixin, MLDiagnosticSensor):
     ATTR_RECEIVED = "received"
     ATTR_PUBLISHED = "published"
     ATTR_DROPPED = "dropped"
+    ATTR_QUEUE = "queue"
+    ATTR_DISCARDED = "discarded"
+    ATTR_PUBLISH_QUEUED = "publish_queued"
+    ATTR_PUBLISH_DELAYED = "publish_delayed"
+    ATTR_PUBLISH_EXPIRED = "publish_expired"
 
     # HA core entity attributes:
     _unrecorded_attributes = frozenset(
@@ -89,6 +117,11 @@ class ConnectionSensor(me.MEAlwaysAvailableMixin, MLDiagnosticSensor):
             ATTR_RECEIVED,
             ATTR_PUBLISHED,
             ATTR_DROPPED,
+            ATTR_QUEUE,
+            ATTR_DISCARDED,
+            ATTR_PUBLISH_QUEUED,
+            ATTR_PUBLISH_DELAYED,
+            ATTR_PUBLISH_EXPIRED,
             *MLDiagnosticSensor._unrecorded_attributes,
         }
     )
@@ -110,6 +143,9 @@ class ConnectionSensor(me.MEAlwaysAvailableMixin, MLDiagnosticSensor):
             ConnectionSensor.ATTR_RECEIVED: 0,
             ConnectionSensor.ATTR_PUBLISHED: 0,
             ConnectionSensor.ATTR_DROPPED: 0,
+            ConnectionSensor.ATTR_PUBLISH_QUEUED: 0,
+            ConnectionSensor.ATTR_PUBLISH_DELAYED: 0,
+            ConnectionSensor.ATTR_PUBLISH_EXPIRED: 0,
         }
         super().__init__(
             connection.profile,
@@ -156,7 +192,10 @@ class ConnectionSensor(me.MEAlwaysAvailableMixin, MLDiagnosticSensor):
 
 class _MQTTTransaction:
     """Context for pending MQTT publish(es) waiting for responses.
-    This will allow to synchronize message request-response flow on MQTT
+    This will allow to synchronize message request-response flow on MQTT.
+    Transactions are indexed by messageId for matching responses and queued in
+    (deadline) order in MQTTConnection._mqtt_transactions_expiry so that a single
+    timer is needed to expire them (see MQTTConnection._mqtt_transactions_expire)
     """
 
     __slots__ = (
@@ -166,6 +205,7 @@ class _MQTTTransaction:
         "messageid",
         "method",
         "request_time",
+        "deadline",
         "response_future",
     )
 
@@ -181,13 +221,34 @@ class _MQTTTransaction:
         self.messageid = request.messageid
         self.method = request.method
         self.request_time = time()
-        self.response_future: "asyncio.Future[MerossResponse]" = (
-            asyncio.get_running_loop().create_future()
-        )
+        loop = asyncio.get_running_loop()
+        self.deadline = loop.time() + mqtt_connection.DEFAULT_RESPONSE_TIMEOUT
+        self.response_future: "asyncio.Future[MerossResponse]" = loop.create_future()
         mqtt_connection._mqtt_transactions[request.messageid] = self
+        # since the timeout is the same for every transaction the queue
+        # is naturally sorted by deadline
+        mqtt_connection._mqtt_transactions_expiry.append(self)
+        if not mqtt_connection._mqtt_transactions_timer:
+            mqtt_connection._mqtt_transactions_timer = loop.call_at(
+                self.deadline, mqtt_connection._mqtt_transactions_expire
+            )
+
+    def expire(self):
+        mqtt_connection = self.mqtt_connection
+        del mqtt_connection._mqtt_transactions[self.messageid]
+        expired = mqtt_connection._mqtt_transactions_expired
+        if len(expired) >= MQTTConnection.EXPIRED_TRACKING_MAX:
+            del expired[next(iter(expired))]
+        expired[self.messageid] = self.namespace
+        self.response_future.set_exception(TimeoutError())
 
     def cancel(self):
         mqtt_connection = self.mqtt_connection
+        # the future might already be done (expired, matched or cancelled together
+        # with the awaiting task) but the transaction could still be indexed
+        mqtt_connection._mqtt_transactions.pop(self.messageid, None)
+        if self.response_future.done():
+            return
         mqtt_connection.log(
             mqtt_connection.DEBUG,
             "Cancelling mqtt transaction on %s %s (uuid:%s messageId:%s)",
@@ -196,10 +257,79 @@ class _MQTTTransaction:
             mqtt_connection.profile.loggable_device_id(self.device_id),
             self.messageid,
         )
-        del mqtt_connection._mqtt_transactions[self.messageid]
         self.response_future.cancel()
 
 
+class _MQTTPublishQueue:
+    """Commands (SET) waiting for the MQTT rate-limiter to allow publishing
+    them to a device (see MQTTConnection._async_mqtt_publish_schedule)."""
+
+    __slots__ = (
+        "items",
+        "timer",
+    )
+
+    def __init__(self):
+        self.items: deque[_MQTTQueuedPublish] = deque()
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class _MQTTQueuedPublish:
+
+    __slots__ = (
+        "request",
+        "key",
+        "deadline",
+        "future",
+    )
+
+    @staticmethod
+    def get_key(request: MerossRequest, /):
+        """Requests with the same key supersede each other while queued: the key is
+        the namespace plus the channel(s)/subdevice id(s) set by the payload.
+        Returns None when the payload carries no identity so that the request
+        will never be merged."""
+        key_channel = mn.NAMESPACES[request.namespace].key_channel
+        for p_ns in request.payload.values():
+            if type(p_ns) is dict:
+                if (channel := p_ns.get(key_channel)) is None:
+                    return None
+                return (request.namespace, channel)
+            if type(p_ns) is list and p_ns:
+                channels = []
+                for p_channel in p_ns:
+                    if (type(p_channel) is not dict) or (
+                        (channel := p_channel.get(key_channel)) is None
+                    ):
+                        return None
+                    channels.append(channel)
+                return (request.namespace, tuple(channels))
+            break
+        return None
+
+    def __init__(self, request: MerossRequest, key, deadline: float, /):
+        self.request = request
+        self.key = key
+        self.deadline = deadline
+        self.future: "asyncio.Future[MerossRequest | None]" = (
+            asyncio.get_running_loop().create_future()
+        )
+
+    async def async_wait(self, publish_queue: _MQTTPublishQueue, /):
+        future = self.future
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # the caller is gone: don't leave its command behind unless it
+            # has already been superseded by a newer one
+            if self.future is future:
+                try:
+                    publish_queue.items.remove(self)
+                except ValueError:
+                    pass
+            raise
+
+
 class MQTTConnection(Loggable):
     """
     Base abstract class representing a connection to an MQTT
@@ -234,8 +364,15 @@ class MQTTConnection(Loggable):
         mqttdiscovering: Final[set[str]]
         namespace_handlers: SessionHandlersType
         sensor_connection: ConnectionSensor | None
+        mqtt_discarded: Final[dict[str, int]]
+        mqtt_latency: Final[dict[str, RTTHistogram]]
+        mqtt_orphans: Final[dict[str, int]]
 
         _mqtt_transactions: Final[dict[str, _MQTTTransaction]]
+        _mqtt_transactions_expiry: Final[deque[_MQTTTransaction]]
+        _mqtt_transactions_expired: Final[dict[str, str]]
+        _mqtt_transactions_timer: asyncio.TimerHandle | None
+        _mqtt_publish_queues: Final[dict[str, _MQTTPublishQueue]]
         _mqtt_is_connected: bool
 
     _MQTT_DROP = "DROP"
@@ -243,6 +380,14 @@ class MQTTConnection(Loggable):
     _MQTT_RECV = "RECV"
 
     DEFAULT_RESPONSE_TIMEOUT = 5
+    EXPIRED_TRACKING_MAX = 100
+    """Number of expired transactions remembered in order to detect late responses"""
+
+    # reasons for discarding received messages (see mqtt_discarded)
+    DISCARD_HTTP_ONLY = "http_only"
+    DISCARD_DISCOVERING = "discovering"
+    DISCARD_CONFIGURED = "configured"
+    DISCARD_CONFIG_FLOW = "config_flow"
 
     SESSION_HANDLERS = {}
 
@@ -255,7 +400,14 @@ class MQTTConnection(Loggable):
         "namespace_handlers",
         "is_cloud_connection",
         "sensor_connection",
+        "mqtt_discarded",
+        "mqtt_latency",
+        "mqtt_orphans",
         "_mqtt_transactions",
+        "_mqtt_transactions_expiry",
+        "_mqtt_transactions_expired",
+        "_mqtt_transactions_timer",
+        "_mqtt_publish_queues",
         "_mqtt_is_connected",
     )
 
@@ -264,6 +416,7 @@ class MQTTConnection(Loggable):
         profile: "MQTTProfile",
         broker: "HostAddress",
         topic_response: str,
+        connection_id: str | None = None,
     ):
         self.profile = profile
         self.broker = broker
@@ -272,11 +425,18 @@ class MQTTConnection(Loggable):
         self.mqttdiscovering = set()
         self.namespace_handlers = self.__class__.SESSION_HANDLERS
         self.sensor_connection = None
+        self.mqtt_discarded = {}
         # self.is_cloud_connection = False to be fixed in derived
+        self.mqtt_latency = {}
+        self.mqtt_orphans = {}
         self._mqtt_transactions = {}
+        self._mqtt_transactions_expiry = deque()
+        self._mqtt_transactions_expired = {}
+        self._mqtt_transactions_timer = None
+        self._mqtt_publish_queues = {}
         self._mqtt_is_connected = False
         super().__init__(
-            str(broker),
+            connection_id or str(broker),
             logger=profile,
         )
         profile.mqttconnections[self.id] = self
@@ -286,19 +446,41 @@ class MQTTConnection(Loggable):
     # interface: Loggable
     def configure_logger(self):
         self.logtag = (
-            f"{self.__class__.__name__}({self.profile.loggable_broker(self.broker)})"
+            f"{self.__class__.__name__}({self.profile.loggable_broker(self.id)})"
         )
 
     # interface: self
     async def async_shutdown(self):
+        if self._mqtt_transactions_timer:
+            self._mqtt_transactions_timer.cancel()
+            self._mqtt_transactions_timer = None
         for mqtt_transaction in tuple(self._mqtt_transactions.values()):
             mqtt_transaction.cancel()
+        self._mqtt_transactions_expiry.clear()
+        for publish_queue in self._mqtt_publish_queues.values():
+            if publish_queue.timer:
+                publish_queue.timer.cancel()
+            for queued_publish in publish_queue.items:
+                if not queued_publish.future.done():
+                    queued_publish.future.set_result(None)
+        self._mqtt_publish_queues.clear()
         self.mqttdiscovering.clear()
         for device in self.mqttdevices.values():
             device.mqtt_detached()
         self.mqttdevices.clear()
         self.sensor_connection = None
 
+    def loggable_diagnostic_state(self):
+        return {
+            "transactions": len(self._mqtt_transactions),
+            "discarded": self.mqtt_discarded,
+            "orphans": self.mqtt_orphans,
+            "latency": {
+                namespace: histogram.loggable_diagnostic_state()
+                for namespace, histogram in self.mqtt_latency.items()
+            },
+        }
+
     async def async_create_diagnostic_entities(self):
         if not self.sensor_connection:
             ConnectionSensor(self)
@@ -313,6 +495,10 @@ class MQTTConnection(Loggable):
     def get_rl_safe_delay(self, uuid: str):
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def get_rl_release_delay(self, uuid: str) -> float:
+        raise NotImplementedError()
+
     @property
     def mqtt_is_connected(self):
         return self._mqtt_is_connected
@@ -358,16 +544,21 @@ class MQTTConnection(Loggable):
         request: "MerossMessage",
     ) -> MerossResponse | None:
         self.profile.trace_or_log(self, device_id, request, MQTTProfile.TRACE_TX)
+        transaction = None
         try:
+            _request = await self._async_mqtt_publish_schedule(device_id, request)
+            if not _request:
+                # superseded by a newer command while waiting in the publish queue
+                return None
+            request = _request
             if request.method in mc.METHOD_ACK_MAP.keys():
                 transaction = _MQTTTransaction(self, device_id, request)
                 await self._async_mqtt_publish(device_id, request)
-                async with asyncio.timeout(self.DEFAULT_RESPONSE_TIMEOUT):
-                    response = await transaction.response_future
-                    transaction = None
-                    return response
-            else:
+                # raises TimeoutError when expired (see _mqtt_transactions_expire)
+                response = await transaction.response_future
                 transaction = None
+                return response
+            else:
                 await self._async_mqtt_publish(device_id, request)
                 return None
 
@@ -407,14 +598,23 @@ class MQTTConnection(Loggable):
         mqtt_msg: "ha_mqtt.ReceiveMessage | paho_mqtt.MQTTMessage | MqttServiceInfo",
     ):
         with self.exception_warning("async_mqtt_message"):
+            # payload is handed over as is (bytes from paho/HA subscriptions
+            # with encoding=None) so that the codec can parse it directly
+            payload_raw: bytes | str = mqtt_msg.payload  # type: ignore
             if sensor_connection := self.sensor_connection:
-                sensor_connection.inc_counter(ConnectionSensor.ATTR_RECEIVED)
-            mqtt_payload = mqtt_msg.payload
-            message = MerossResponse(
-                mqtt_payload
-                if type(mqtt_payload) is str
-                else mqtt_payload.decode("utf-8")  # type: ignore
-            )
+                sensor_connection.extra_state_attributes[
+                    ConnectionSensor.ATTR_RECEIVED
+                ] += 1
+            # route on the raw message first so that we don't waste time decoding
+            # messages we're going to discard anyway
+            if (device_id := get_message_uuid_raw(mqtt_msg.topic, payload_raw)) and (
+                reason := self._get_discard_reason(device_id, payload_raw)
+            ):
+                self._mqtt_discard(reason)
+                return
+            if sensor_connection:
+                sensor_connection.flush_state()
+            message = MerossResponse(payload_raw)
             header = message[mc.KEY_HEADER]
             device_id = get_message_uuid(header)
             namespace = header[mc.KEY_NAMESPACE]
@@ -427,10 +627,28 @@ class MQTTConnection(Loggable):
 
             try:
                 if self._mqtt_transactions[messageid].namespace == namespace:
-                    self._mqtt_transactions.pop(messageid).response_future.set_result(
-                        message
-                    )
+                    transaction = self._mqtt_transactions.pop(messageid)
+                    if not transaction.response_future.done():
+                        transaction.response_future.set_result(message)
+                    try:
+                        latency = self.mqtt_latency[namespace]
+                    except KeyError:
+                        self.mqtt_latency[namespace] = latency = RTTHistogram()
+                    latency.add(time() - transaction.request_time)
             except KeyError:
+                if self._mqtt_transactions_expired.pop(messageid, None) == namespace:
+                    # response arrived after the transaction timeout
+                    mqtt_orphans = self.mqtt_orphans
+                    mqtt_orphans[namespace] = mqtt_orphans.get(namespace, 0) + 1
+                    self.log(
+                        self.DEBUG,
+                        "Received late response for %s %s (uuid:%s messageId:%s)",
+                        header[mc.KEY_METHOD],
+                        namespace,
+                        profile.loggable_device_id(device_id),
+                        messageid,
+                        timeout=14400,
+                    )
                 # special session management: cloud connections would
                 # behave differently than the local MQTT. Their behavior
                 # will definitely be set in the dynamic/custom message handlers
@@ -450,14 +668,12 @@ class MQTTConnection(Loggable):
                 if device := api.devices.get(device_id):
                     # check among current loaded devices if they could be re-binded
                     if device.conf_protocol is mlc.CONF_PROTOCOL_HTTP:
-                        self.log(
-                            self.DEBUG,
-                            "Dropping MQTT received message for device uuid:%s since it is configured for HTTP only",
-                            profile.loggable_device_id(device_id),
-                        )
+                        self._log_discard_http_only(device_id)
+                        self._mqtt_discard(MQTTConnection.DISCARD_HTTP_ONLY)
                         return
                     if device._profile == profile:
-                        self.attach(device)
+                        if not self._is_broker_attached(device):
+                            self.attach(device)
                     else:
                         if (device.key != profile.key) or (
                             device.descriptor.userId != profile.id
@@ -475,7 +691,7 @@ class MQTTConnection(Loggable):
                         profile.link(device)
                         # profile.link will attach to the mqtt broker known to the device cfg..
                         # we'll ensure that (in case device cfg is stale) we're correctly binded here
-                        if device._mqtt_connection != self:
+                        if not self._is_broker_attached(device):
                             self.attach(device)
 
                     device.mqtt_receive(message)
@@ -483,6 +699,7 @@ class MQTTConnection(Loggable):
 
             # the device is not configured: proceed to discovery in case
             if device_id in self.mqttdiscovering:
+                self._mqtt_discard(MQTTConnection.DISCARD_DISCOVERING)
                 return
 
             # lookout for any disabled/ignored entry
@@ -499,32 +716,8 @@ class MQTTConnection(Loggable):
                     data=None,
                 )
 
-            if config_entry := (
-                api.get_config_entry(device_id)
-                or api.get_config_entry(device_id[-12:].lower())
-            ):
-                # entry already present...skip discovery
-                self.log(
-                    self.INFO,
-                    "Ignoring MQTT discovery for already configured uuid:%s (ConfigEntry is %s)",
-                    profile.loggable_device_id(device_id),
-                    (
-                        "disabled"
-                        if config_entry.disabled_by
-                        else "ignored" if config_entry.source == "ignore" else "unknown"
-                    ),
-                    timeout=28800,  # type: ignore
-                )
-                return
-
-            # also skip discovered integrations waiting in HA queue
-            if api.get_config_flow(device_id):
-                self.log(
-                    self.DEBUG,
-                    "Ignoring MQTT discovery for uuid:%s (ConfigFlow is in progress)",
-                    profile.loggable_device_id(device_id),
-                    timeout=14400,  # type: ignore
-                )
+            if reason := self._get_discovery_discard_reason(device_id):
+                self._mqtt_discard(reason)
                 return
 
             key = profile.key
@@ -543,6 +736,90 @@ class MQTTConnection(Loggable):
                 f".async_try_discovery({device_id})",
             )
 
+    def _get_discard_reason(self, device_id: str, payload_raw: bytes | str, /):
+        """Applies the discarding rules of async_mqtt_message to a not yet decoded
+        message. Returns None when the message needs to be decoded and processed."""
+        if device_id in self.mqttdevices:
+            return None
+        for mqtt_transaction in self._mqtt_transactions.values():
+            if mqtt_transaction.device_id == device_id:
+                return None
+        namespace = get_message_namespace_raw(payload_raw)
+        if (namespace is None) or (namespace in self.namespace_handlers):
+            # session management could be interested in any device message
+            return None
+        profile = self.profile
+        api = profile.api
+        if device := api.devices.get(device_id):
+            if device.conf_protocol is mlc.CONF_PROTOCOL_HTTP:
+                self._log_discard_http_only(device_id)
+                return MQTTConnection.DISCARD_HTTP_ONLY
+            return None
+        if device_id in self.mqttdiscovering:
+            return MQTTConnection.DISCARD_DISCOVERING
+        if (profile is api) and not (
+            api.get_config_entry(DOMAIN) or api.get_config_flow(DOMAIN)
+        ):
+            # let async_mqtt_message retrigger the MQTT hub entry
+            return None
+        return self._get_discovery_discard_reason(device_id)
+
+    def _get_discovery_discard_reason(self, device_id: str, /):
+        api = self.profile.api
+        if config_entry := (
+            api.get_config_entry(device_id)
+            or api.get_config_entry(device_id[-12:].lower())
+        ):
+            # entry already present...skip discovery
+            self.log(
+                self.INFO,
+                "Ignoring MQTT discovery for already configured uuid:%s (ConfigEntry is %s)",
+                self.profile.loggable_device_id(device_id),
+                (
+                    "disabled"
+                    if config_entry.disabled_by
+                    else "ignored" if config_entry.source == "ignore" else "unknown"
+                ),
+                timeout=28800,  # type: ignore
+            )
+            return MQTTConnection.DISCARD_CONFIGURED
+
+        # also skip discovered integrations waiting in HA queue
+        if api.get_config_flow(device_id):
+            self.log(
+                self.DEBUG,
+                "Ignoring MQTT discovery for uuid:%s (ConfigFlow is in progress)",
+                self.profile.loggable_device_id(device_id),
+                timeout=14400,  # type: ignore
+            )
+            return MQTTConnection.DISCARD_CONFIG_FLOW
+
+        return None
+
+    def _is_broker_attached(self, device: "Device", /):
+        """Checks if the device is attached to this connection or to a sibling one
+        on the same broker (see MerossProfile sharding): PUSHes are only subscribed
+        by the first shard and we don't want to steal the device from its own."""
+        mqtt_connection = device._mqtt_connection
+        return bool(mqtt_connection) and (mqtt_connection.broker == self.broker)
+
+    def _log_discard_http_only(self, device_id: str, /):
+        self.log(
+            self.DEBUG,
+            "Dropping MQTT received message for device uuid:%s since it is configured for HTTP only",
+            self.profile.loggable_device_id(device_id),
+        )
+
+    def _mqtt_discard(self, reason: str, /):
+        mqtt_discarded = self.mqtt_discarded
+        mqtt_discarded[reason] = mqtt_discarded.get(reason, 0) + 1
+        if sensor_connection := self.sensor_connection:
+            # rebuild the (sub)dict else the update would be missed (see update_devices)
+            sensor_connection.extra_state_attributes[
+                ConnectionSensor.ATTR_DISCARDED
+            ] = dict(mqtt_discarded)
+            sensor_connection.flush_state()
+
     async def async_identify_device(
         self, device_id: str, key: str
     ) -> mlc.DeviceConfigType:
@@ -619,13 +896,123 @@ class MQTTConnection(Loggable):
         self.mqttdiscovering.remove(device_id)
         return result
 
-    def _mqtt_transactions_clean(self):
-        if self._mqtt_transactions:
-            # check and cleanup stale transactions
-            epoch = time()
-            for transaction in tuple(self._mqtt_transactions.values()):
-                if (epoch - transaction.request_time) > 15:
-                    transaction.cancel()
+    async def _async_mqtt_publish_schedule(
+        self, device_id: str, request: "MerossMessage", /
+    ):
+        """
+        Rate-limiting front-end for async_mqtt_publish: when the device publish
+        window is full, commands (SET) are queued (for at most
+        PARAM_MQTT_PUBLISH_QUEUE_TIMEOUT) instead of being dropped while any
+        other message is still rejected.
+        Returns the request to be published (re-signed if it has been waiting), None
+        if superseded by a newer queued command for the same namespace/channel or
+        raises MerossMQTTRateLimitException if it cannot be sent.
+        """
+        publish_queue = self._mqtt_publish_queues.get(device_id)
+        if not (publish_queue or self.get_rl_release_delay(device_id)):
+            return request
+        if (
+            (request.method != mc.METHOD_SET)
+            or (request.namespace == mn.Appliance_Control_Multiple.name)
+            or not isinstance(request, MerossRequest)
+        ):
+            # NS_MULTIPLE batches are rejected too since they could pack anything
+            # (polls included) and their content cannot be merged
+            raise MerossMQTTRateLimitException()
+
+        loop = self.profile.hass.loop
+        deadline = loop.time() + mlc.PARAM_MQTT_PUBLISH_QUEUE_TIMEOUT
+        key = _MQTTQueuedPublish.get_key(request)
+        if publish_queue:
+            for queued_publish in publish_queue.items if key else ():
+                if queued_publish.key == key:
+                    # the newer command takes the place of the queued one
+                    self.log(
+                        self.DEBUG,
+                        "Merging queued %s %s (uuid:%s messageId:%s)",
+                        queued_publish.request.method,
+                        queued_publish.request.namespace,
+                        self.profile.loggable_device_id(device_id),
+                        queued_publish.request.messageid,
+                    )
+                    if not queued_publish.future.done():
+                        queued_publish.future.set_result(None)
+                    queued_publish.__init__(request, key, deadline)
+                    # the refreshed deadline moves it to the tail so that the
+                    # queue stays sorted (the release only checks the head)
+                    publish_queue.items.remove(queued_publish)
+                    publish_queue.items.append(queued_publish)
+                    return await queued_publish.async_wait(publish_queue)
+        else:
+            self._mqtt_publish_queues[device_id] = publish_queue = _MQTTPublishQueue()
+
+        queued_publish = _MQTTQueuedPublish(request, key, deadline)
+        publish_queue.items.append(queued_publish)
+        if sensor_connection := self.sensor_connection:
+            sensor_connection.inc_counter(ConnectionSensor.ATTR_PUBLISH_QUEUED)
+        if not publish_queue.timer:
+            publish_queue.timer = loop.call_later(
+                self.get_rl_release_delay(device_id),
+                self._mqtt_publish_queue_release,
+                device_id,
+            )
+        return await queued_publish.async_wait(publish_queue)
+
+    @callback
+    def _mqtt_publish_queue_release(self, device_id: str, /):
+        """Timer callback releasing (at most) one queued command per invocation
+        since the rate-limiter window only gets updated when actually publishing."""
+        publish_queue = self._mqtt_publish_queues[device_id]
+        publish_queue.timer = None
+        items = publish_queue.items
+        loop = self.profile.hass.loop
+        now = loop.time()
+        sensor_connection = self.sensor_connection
+        while items and (items[0].future.done() or (items[0].deadline <= now)):
+            # waiters cancelled in the meantime are just discarded
+            queued_publish = items.popleft()
+            if not queued_publish.future.done():
+                if sensor_connection:
+                    sensor_connection.inc_counter(ConnectionSensor.ATTR_PUBLISH_EXPIRED)
+                queued_publish.future.set_exception(MerossMQTTRateLimitException())
+        if not items:
+            # the queue is only removed on the tick after the last release so that
+            # newer commands cannot overtake it while it is being published
+            self._mqtt_publish_queues.pop(device_id)
+            return
+        if not (delay := self.get_rl_release_delay(device_id)):
+            queued_publish = items.popleft()
+            request = queued_publish.request
+            device = self.mqttdevices.get(device_id)
+            request.resign(device.key if device else self.profile.key)
+            if sensor_connection:
+                sensor_connection.inc_counter(ConnectionSensor.ATTR_PUBLISH_DELAYED)
+            queued_publish.future.set_result(request)
+            delay = 1
+        publish_queue.timer = loop.call_later(
+            min(delay, items[0].deadline - now) if items else delay,
+            self._mqtt_publish_queue_release,
+            device_id,
+        )
+
+    @callback
+    def _mqtt_transactions_expire(self):
+        """Timer callback expiring the transactions at the head of the queue.
+        Matched/cancelled transactions are lazily removed here."""
+        self._mqtt_transactions_timer = None
+        expiry = self._mqtt_transactions_expiry
+        loop = self.profile.hass.loop
+        now = loop.time()
+        while expiry:
+            transaction = expiry[0]
+            if not transaction.response_future.done():
+                if transaction.deadline > now:
+                    self._mqtt_transactions_timer = loop.call_at(
+                        transaction.deadline, self._mqtt_transactions_expire
+                    )
+                    return
+                transaction.expire()
+            expiry.popleft()
 
     @abc.abstractmethod
     async def _async_mqtt_publish(
@@ -747,6 +1134,16 @@ class MQTTProfile(ConfigEntryManager):
         for mqttconnection in self.mqttconnections.values():
             await mqttconnection.async_create_diagnostic_entities()
 
+    def loggable_diagnostic_state(self):
+        return {
+            "mqttconnections": {
+                self.loggable_broker(mqttconnection.id): (
+                    mqttconnection.loggable_diagnostic_state()
+                )
+                for mqttconnection in self.mqttconnections.values()
+            }
+        }
+
     # interface: self
     @property
     def allow_mqtt_publish(self):
@@ -1,8 +1,8 @@
-import bisect
 from typing import TYPE_CHECKING
 
 from .. import const as mlc
 from ..merossclient.protocol import const as mc, namespaces as mn
+from ..merossclient.protocol.message import get_message_payload_raw
 
 if TYPE_CHECKING:
     from typing import Any, Callable, Coroutine
@@ -12,6 +12,7 @@ if TYPE_CHECKING:
     from ..merossclient.protocol.message import MerossResponse
     from .device import AsyncRequestFunc, Device
     from .entity import MLEntity
+    from .polling import PushTracker
 
     type PollingStrategyFunc = Callable[["NamespaceHandler"], Coroutine]
     type NamespaceConfigType = tuple[int, int, int, int, PollingStrategyFunc | None]
@@ -105,14 +106,23 @@ class NamespaceHandler:
     of Merossentity) to be instanced whenever a message for a particular channel
     is received and the channel has no parser associated (see _handle_list)
 
+    - payload_fingerprints: raw (as received) copy of the last GETACK payload
+    (indexed by channel when the payload carries a single one) used to skip
+    dispatching polls which didn't change anything (see payload_unchanged). Only
+    enabled for namespaces whose parsing just reflects the payload state
+    (see PAYLOAD_FINGERPRINT_ENABLED).
+
     """
 
     if TYPE_CHECKING:
         parsers: dict[object, Callable[[dict], None]]
         lastpush: dict | None
+        push_tracker: PushTracker | None
         polling_strategy: PollingStrategyFunc | None
         polling_request: mt.MerossRequestType
         polling_request_channels: list[dict[str, Any]]
+        polling_response_size_model: dict[int, list[float]]
+        payload_fingerprints: dict[object, bytes | str] | None
 
     __slots__ = (
         "device",
@@ -123,6 +133,7 @@ class NamespaceHandler:
         "lastrequest",
         "lastresponse",
         "lastpush",
+        "push_tracker",
         "polling_epoch_next",
         "polling_strategy",
         "polling_period",
@@ -130,8 +141,14 @@ class NamespaceHandler:
         "polling_response_base_size",
         "polling_response_item_size",
         "polling_response_size",
+        "polling_response_item_count",
+        "polling_response_size_model",
         "polling_request",
         "polling_request_channels",
+        "payload_fingerprints",
+        "payload_fingerprint_epoch",
+        "parse_count",
+        "parse_skipped_count",
     )
 
     def __init__(
@@ -159,6 +176,10 @@ class NamespaceHandler:
         self.entity_class = None
         self.lastresponse = self.lastrequest = self.polling_epoch_next = 0.0
         self.lastpush = None
+        self.push_tracker = None
+        self.payload_fingerprints = {} if ns in PAYLOAD_FINGERPRINT_ENABLED else None
+        self.payload_fingerprint_epoch = 0.0
+        self.parse_count = self.parse_skipped_count = 0
 
         if _conf := config or POLLING_STRATEGY_CONF.get(ns):
             self.polling_period = _conf[0]
@@ -175,11 +196,14 @@ class NamespaceHandler:
             self.polling_response_item_size = 0
             self.polling_strategy = None
 
+        # the model is shared with the device so that it could be persisted
+        # and restored across restarts (see Device.response_size_model)
+        self.polling_response_size_model = device.response_size_model.setdefault(
+            namespace, {}
+        )
         # by default we calculate 1 item/channel per payload but we should
         # refine this whenever needed
-        self.polling_response_size = (
-            self.polling_response_base_size + self.polling_response_item_size
-        )
+        self.polling_response_size_adj(1)
         self.polling_request_channels = []
         self.polling_request_configure(None)
         device.namespace_handlers[namespace] = self
@@ -230,10 +254,8 @@ class NamespaceHandler:
         if extra:
             channel_payload.update(extra)
 
-        self.polling_response_size = (
-            self.polling_response_base_size
-            + len(polling_request_channels) * self.polling_response_item_size
-        )
+        self.device.request_template_invalidate(self.ns.name)
+        self.polling_response_size_adj(len(polling_request_channels))
 
     def polling_request_set(self, payload: list | dict, /):
         self.polling_request = (
@@ -241,20 +263,102 @@ class NamespaceHandler:
             mc.METHOD_GET,
             {self.ns.key: payload},
         )
-        self.polling_response_size = (
-            self.polling_response_base_size
-            + self.polling_response_item_size
-            * (len(payload) if type(payload) is list else 1)
-        )
+        self.device.request_template_invalidate(self.ns.name)
+        self.polling_response_size_adj(len(payload) if type(payload) is list else 1)
 
     def polling_response_size_adj(self, item_count: int, /):
-        self.polling_response_size = (
+        self.polling_response_item_count = item_count
+        self.polling_response_size = self.polling_response_size_estimate(item_count)
+
+    def polling_response_size_inc(self):
+        self.polling_response_size_adj(self.polling_response_item_count + 1)
+
+    def polling_response_size_estimate(self, item_count: int, /) -> int:
+        """Returns the expected size of a response carrying item_count items.
+        When we've already seen (enough) responses with that same 'shape' we'll use
+        the learned average plus a safety margin based on its deviation, else we
+        fallback to the static (base + items) estimate from POLLING_STRATEGY_CONF."""
+        if stats := self.polling_response_size_model.get(item_count):
+            return int(stats[0] + mlc.PARAM_RESPONSE_SIZE_MODEL_MARGIN * stats[1])
+        return (
             self.polling_response_base_size
             + item_count * self.polling_response_item_size
         )
 
-    def polling_response_size_inc(self):
-        self.polling_response_size += self.polling_response_item_size
+    def polling_response_size_learn(
+        self, payload: "mt.MerossPayloadType", size: int, /
+    ):
+        """Updates the response size model (EWMA of size and of its absolute deviation)
+        with an actual GETACK response for this namespace. The model is indexed by the
+        number of items in the response so that it works for both fixed and
+        channel-dependent payloads."""
+        p_ns = payload.get(self.ns.key)
+        item_count = len(p_ns) if type(p_ns) is list else 1
+        try:
+            stats = self.polling_response_size_model[item_count]
+            error = size - stats[0]
+            stats[0] += mlc.PARAM_RESPONSE_SIZE_MODEL_GAIN * error
+            stats[1] += mlc.PARAM_RESPONSE_SIZE_MODEL_GAIN * (abs(error) - stats[1])
+        except KeyError:
+            # start with a rather conservative deviation so that the margin
+            # doesn't collapse before we've seen a few samples
+            self.polling_response_size_model[item_count] = [size, size / 8]
+        if self.polling_request[2].get(self.ns.key) == []:
+            # querying with an empty list lets the device decide
+            # how many items it'll return
+            self.polling_response_item_count = item_count
+        if item_count == self.polling_response_item_count:
+            self.polling_response_size = self.polling_response_size_estimate(item_count)
+
+    def payload_unchanged(
+        self,
+        payload: "mt.MerossPayloadType",
+        message_raw: bytes | str | None,
+        epoch: float,
+        /,
+    ):
+        """Checks (and updates) the fingerprint of a polled payload. Returns True when
+        the payload is the same as the last parsed one so that the caller can skip
+        dispatching it to the entities. The fingerprint is the raw payload as received
+        (message_raw) so that this costs no serialization. A full parse is anyway
+        forced every PARAM_PAYLOAD_FINGERPRINT_PERIOD or after
+        payload_fingerprints_reset."""
+        fingerprints = self.payload_fingerprints
+        if (
+            (fingerprints is None)
+            or (not message_raw)
+            or ((fingerprint := get_message_payload_raw(message_raw)) is None)
+        ):
+            self.parse_count += 1
+            return False
+        if (
+            epoch - self.payload_fingerprint_epoch
+            > mlc.PARAM_PAYLOAD_FINGERPRINT_PERIOD
+        ):
+            fingerprints.clear()
+            self.payload_fingerprint_epoch = epoch
+        p_ns = payload.get(self.ns.key)
+        key = p_ns.get(self.ns.key_channel) if type(p_ns) is dict else None
+        if fingerprints.get(key) == fingerprint:
+            self.parse_skipped_count += 1
+            return True
+        fingerprints[key] = fingerprint
+        self.parse_count += 1
+        return False
+
+    def payload_fingerprints_reset(self):
+        """Invalidates the fingerprints whenever the entities state could have been
+        updated by other means (PUSHes, digests, commands) or after a reconnection."""
+        if self.payload_fingerprints:
+            self.payload_fingerprints.clear()
+
+    def loggable_fingerprint_state(self):
+        total = self.parse_count + self.parse_skipped_count
+        return {
+            "parsed": self.parse_count,
+            "skipped": self.parse_skipped_count,
+            "skip_rate": round(self.parse_skipped_count / total, 3) if total else None,
+        }
 
     def register_entity_class(
         self,
@@ -625,29 +729,25 @@ class NamespaceHandler:
         is considered the maximum amount of time after which the poll 'has' to
         be done. If it hasn't elapsed then they're eventually packed
         with the outgoing ns_multiple (lazy polling).
-        This strategy should also avoid polling when MQTT is active if the namespace
-        supports PUSH or we have received at least one PUSH for it (lastpush).
+        This strategy also avoids polling when MQTT is active and the PUSHes for the
+        namespace have proven reliable (see PushTracker). Just relying on ns.has_push
+        or lastpush was not enough and we were skipping needed polls (#607 #609).
         """
         device = self.device
-        """ TODO: re-enable this optimization after testing. It looks like our 'knowledge' of
-        PUSHed namespaces is not perfect yet and we're skipping needed polls (#607 #609).
         if (
             device._mqtt_active
             and self.polling_epoch_next
-            and (self.ns.has_push or self.lastpush)
+            and self.push_tracker
+            and self.push_tracker.is_reliable(device._polling_epoch)
         ):
             # on MQTT no need for updates since they're being PUSHed
             return
-        """
         if device._polling_epoch >= self.polling_epoch_next:
             if await device.async_request_smartpoll(self):
                 return
 
-        # Insert into the lazypoll_requests ordering by least recently polled
-        def _lazypoll_key(_handler: NamespaceHandler):
-            return _handler.lastrequest - device._polling_epoch
-
-        bisect.insort_right(device._lazypoll_requests, self, key=_lazypoll_key)
+        # Queue into the lazypoll_requests (ordered by staleness)
+        device._lazypoll_requests.push(self)
 
     async def async_poll_once(self):
         """
@@ -1141,3 +1241,21 @@ POLLING_STRATEGY_CONF: dict[mn.Namespace, "NamespaceConfigType"] = {
         NamespaceHandler.async_poll_default,
     ),
 }
+
+"""
+Namespaces whose parsing only reflects the payload state so that polls carrying
+the same payload can be skipped (see NamespaceHandler.payload_unchanged).
+Namespaces whose parsing is time dependent (energy integration, cover position
+emulation, garage door transitions, light transitions) or which carry the whole
+device state (NS_ALL) must not be listed here.
+"""
+PAYLOAD_FINGERPRINT_ENABLED: set[mn.Namespace] = {
+    mn.Appliance_Config_OverTemp,
+    mn.Appliance_Control_Diffuser_Spray,
+    mn.Appliance_Control_Mp3,
+    mn.Appliance_Control_Spray,
+    mn.Appliance_Control_Toggle,
+    mn.Appliance_Control_ToggleX,
+    mn.Appliance_System_DNDMode,
+    mn.Appliance_System_Runtime,
+}
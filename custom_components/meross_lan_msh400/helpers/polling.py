@@ -0,0 +1,881 @@
+"""
+Polling infrastructure shared by all of the devices.
+"""
+
+from collections import deque
+import heapq
+from typing import TYPE_CHECKING
+
+from .. import const as mlc
+from ..merossclient.protocol import const as mc, namespaces as mn
+
+if TYPE_CHECKING:
+    from asyncio import AbstractEventLoop, Future, Task, TimerHandle
+    from typing import Final, Iterable
+
+    from ..merossclient.protocol.message import MerossMessage
+    from ..merossclient.protocol.types import MerossRequestType
+    from .component_api import ComponentApi
+    from .device import Device
+    from .namespaces import NamespaceHandler
+
+
+class PollingEntry:
+    """
+    Scheduling slot of a single device inside the PollingScheduler.
+    This is stored in Device._polling_unsub and mimics the (used) TimerHandle interface.
+    """
+
+    if TYPE_CHECKING:
+        scheduler: Final[PollingScheduler]
+        device: Final[Device]
+        phase: Final[float]
+        """Offset (as a fraction of the polling period) assigned to the device."""
+        epoch: float
+        """Loop time of the next (scheduled) polling cycle."""
+        namespace: str | None
+        seq: int
+        """Matches the heap item seq when scheduled. 0 when not scheduled."""
+        waiters: list[Future] | None
+
+    __slots__ = (
+        "scheduler",
+        "device",
+        "phase",
+        "epoch",
+        "namespace",
+        "seq",
+        "waiters",
+    )
+
+    def __init__(self, scheduler: "PollingScheduler", device: "Device", phase: float):
+        self.scheduler = scheduler
+        self.device = device
+        self.phase = phase
+        self.epoch = 0.0
+        self.namespace = None
+        self.seq = 0
+        self.waiters = None
+
+    def when(self):
+        return self.epoch
+
+    async def async_wait(self):
+        """Waits for the (scheduled) polling cycle to complete."""
+        future = self.scheduler.loop.create_future()
+        if self.waiters is None:
+            self.waiters = [future]
+        else:
+            self.waiters.append(future)
+        await future
+
+    def cancel(self):
+        self.seq = 0
+        if self.waiters:
+            for future in self.waiters:
+                if not future.done():
+                    future.set_result(None)
+            self.waiters = None
+
+
+class PollingScheduler:
+    """
+    Fleet-wide coordinator for the devices polling loops. Instead of letting every
+    device schedule its own timer (which leads to many devices polling in lockstep
+    after an HA restart) the devices book their next cycle here.
+    The scheduler:
+    - assigns every device a phase offset inside its polling period and slowly
+    steers the cycles so that devices are spread over time.
+    - spreads 'immediate' polls (coldstart, onlining, full refresh) by PARAM_POLLING_BURST_SPACING.
+    - limits the number of polling cycles running at the same time.
+    Next-fire times are kept in a heap so that a single loop timer serves the whole fleet.
+    """
+
+    PHASE_GAIN = 0.25
+    """Fraction of the phase error recovered at every cycle."""
+
+    if TYPE_CHECKING:
+        loop: Final[AbstractEventLoop]
+        concurrency_max: int
+        burst_spacing: float
+        entries: Final[dict[str, PollingEntry]]
+        running: int
+        _heap: list[tuple[float, int, PollingEntry]]
+        _seq: int
+        _phase_seq: int
+        _burst_epoch: float
+        _timer: TimerHandle | None
+        _timer_epoch: float
+        # stats
+        fired_count: int
+        deferred_count: int
+        running_max: int
+
+    __slots__ = (
+        "loop",
+        "concurrency_max",
+        "burst_spacing",
+        "entries",
+        "running",
+        "_heap",
+        "_seq",
+        "_phase_seq",
+        "_burst_epoch",
+        "_timer",
+        "_timer_epoch",
+        "fired_count",
+        "deferred_count",
+        "running_max",
+    )
+
+    def __init__(self, api: "ComponentApi"):
+        self.loop = api.hass.loop
+        self.concurrency_max = mlc.PARAM_POLLING_CONCURRENCY_MAX
+        self.burst_spacing = mlc.PARAM_POLLING_BURST_SPACING
+        self.entries = {}
+        self.running = 0
+        self._heap = []
+        self._seq = 0
+        self._phase_seq = 0
+        self._burst_epoch = 0.0
+        self._timer = None
+        self._timer_epoch = 0.0
+        self.fired_count = 0
+        self.deferred_count = 0
+        self.running_max = 0
+
+    def shutdown(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        for entry in self.entries.values():
+            entry.cancel()
+        self.entries.clear()
+        self._heap.clear()
+
+    def register(self, device: "Device"):
+        try:
+            return self.entries[device.id]
+        except KeyError:
+            # golden ratio sequence gives a low discrepancy spread of the phases
+            # whatever the number of devices being registered
+            self._phase_seq += 1
+            self.entries[device.id] = entry = PollingEntry(
+                self, device, (self._phase_seq * 0.6180339887498949) % 1.0
+            )
+            return entry
+
+    def unregister(self, device: "Device"):
+        if entry := self.entries.pop(device.id, None):
+            entry.cancel()
+
+    def schedule(self, device: "Device", delay: float, namespace: str | None = None):
+        """Books the next polling cycle for the device. This supersedes any previous
+        (pending) booking. delay == 0 means 'as soon as possible' and is subject
+        to burst spreading."""
+        entry = self.register(device)
+        now = self.loop.time()
+        if delay > 0:
+            epoch = now + delay
+            period = device.polling_period
+            if period and (len(self.entries) > 1):
+                # steer the cycle towards the device phase. The correction is
+                # bounded so that we never shorten/lengthen a cycle too much
+                error = (epoch - entry.phase * period) % period
+                if error > period / 2:
+                    error -= period
+                correction = error * self.PHASE_GAIN
+                limit = delay / 4
+                if correction > limit:
+                    correction = limit
+                elif correction < -limit:
+                    correction = -limit
+                epoch -= correction
+        else:
+            epoch = self._burst_epoch + self.burst_spacing
+            if epoch < now:
+                epoch = now
+            self._burst_epoch = epoch
+        self._seq += 1
+        entry.seq = self._seq
+        entry.epoch = epoch
+        entry.namespace = namespace
+        heap = self._heap
+        heapq.heappush(heap, (epoch, entry.seq, entry))
+        if len(heap) > 4 * len(self.entries) + 16:
+            # too many stale items (from cancel/reschedule)
+            heap[:] = [item for item in heap if item[2].seq == item[1]]
+            heapq.heapify(heap)
+        self._arm()
+        return entry
+
+    def track(self, task: "Task"):
+        """Called by the device whenever a polling task is started so that
+        we account for every running cycle (even those not started by us)."""
+        self.running += 1
+        if self.running > self.running_max:
+            self.running_max = self.running
+        task.add_done_callback(self._task_done)
+
+    def loggable_diagnostic_state(self):
+        return {
+            "devices": len(self.entries),
+            "concurrency_max": self.concurrency_max,
+            "burst_spacing": self.burst_spacing,
+            "running": self.running,
+            "running_max": self.running_max,
+            "scheduled": sum(1 for entry in self.entries.values() if entry.seq),
+            "fired": self.fired_count,
+            "deferred": self.deferred_count,
+        }
+
+    def _task_done(self, task: "Task"):
+        self.running -= 1
+        self._arm()
+
+    def _arm(self):
+        heap = self._heap
+        while heap:
+            epoch, seq, entry = heap[0]
+            if entry.seq != seq:
+                heapq.heappop(heap)
+                continue
+            if self.running >= self.concurrency_max:
+                # wait for a running cycle to complete (see _task_done)
+                if self._timer:
+                    self._timer.cancel()
+                    self._timer = None
+                return
+            if self._timer:
+                if self._timer_epoch <= epoch:
+                    return
+                self._timer.cancel()
+            self._timer_epoch = epoch
+            self._timer = self.loop.call_at(epoch, self._timer_callback)
+            return
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    def _timer_callback(self):
+        self._timer = None
+        now = self.loop.time()
+        heap = self._heap
+        while heap:
+            epoch, seq, entry = heap[0]
+            if entry.seq != seq:
+                heapq.heappop(heap)
+                continue
+            if epoch > now:
+                break
+            if self.running >= self.concurrency_max:
+                self.deferred_count += 1
+                break
+            heapq.heappop(heap)
+            entry.seq = 0
+            self.fired_count += 1
+            task = entry.device._poll(entry.namespace)
+            if waiters := entry.waiters:
+                entry.waiters = None
+
+                def _resolve(_task, _waiters=waiters):
+                    for future in _waiters:
+                        if not future.done():
+                            future.set_result(None)
+
+                task.add_done_callback(_resolve)
+        self._arm()
+
+
+class MultipleBatch:
+    """A group of requests to be sent in a single Appliance.Control.Multiple."""
+
+    if TYPE_CHECKING:
+        requests: list[MerossRequestType]
+        lazy_handlers: list[NamespaceHandler]
+        """Lazy pollers which were packed in this batch."""
+        size: int
+        """Estimated size of the (whole) response."""
+
+    __slots__ = (
+        "requests",
+        "lazy_handlers",
+        "size",
+    )
+
+    def __init__(self):
+        self.requests = []
+        self.lazy_handlers = []
+        self.size = mlc.PARAM_HEADER_SIZE
+
+
+class LazyPollQueue:
+    """
+    Priority queue of the lazy pollers (see NamespaceHandler.async_poll_smart) keyed by
+    staleness (the nearest to their polling_epoch_next comes first).
+    Items are bucketed by their expected response size (SIZE_QUANTUM granularity) and
+    every bucket is a binary heap so that:
+    - push and pop are O(log n)
+    - remove is O(1) (the entry is invalidated and discarded when surfacing)
+    - pop_fit (stalest handler whose response fits in N bytes) only needs to
+    compare the bucket heads (plus a scan of the single 'boundary' bucket).
+    """
+
+    SIZE_QUANTUM = 256
+
+    if TYPE_CHECKING:
+        type Entry = list  # [key, seq, handler | None, size]
+        _buckets: dict[int, list[Entry]]
+        _entries: dict[NamespaceHandler, Entry]
+        _seq: int
+
+    __slots__ = (
+        "_buckets",
+        "_entries",
+        "_seq",
+    )
+
+    def __init__(self):
+        self._buckets = {}
+        self._entries = {}
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __bool__(self):
+        return bool(self._entries)
+
+    def __contains__(self, handler: "NamespaceHandler"):
+        return handler in self._entries
+
+    def clear(self):
+        self._buckets.clear()
+        self._entries.clear()
+
+    def push(self, handler: "NamespaceHandler"):
+        """Inserts (or re-inserts updating its priority) the handler."""
+        if entry := self._entries.pop(handler, None):
+            entry[2] = None
+        self._seq += 1
+        size = handler.polling_response_size
+        self._entries[handler] = entry = [
+            handler.polling_epoch_next,
+            self._seq,
+            handler,
+            size,
+        ]
+        try:
+            heapq.heappush(self._buckets[size // self.SIZE_QUANTUM], entry)
+        except KeyError:
+            self._buckets[size // self.SIZE_QUANTUM] = [entry]
+
+    def remove(self, handler: "NamespaceHandler"):
+        if entry := self._entries.pop(handler, None):
+            entry[2] = None
+            return True
+        return False
+
+    def pop(self):
+        """Extracts the stalest handler."""
+        return self.pop_fit(float("inf"))
+
+    def pop_fit(self, size_max: float):
+        """Extracts the stalest handler whose expected response size is not
+        greater than size_max. Returns None if nothing fits."""
+        best_entry = None
+        best_heap = None
+        quantum = self.SIZE_QUANTUM
+        for index, heap in self._buckets.items():
+            if index * quantum > size_max:
+                continue
+            while heap and heap[0][2] is None:
+                heapq.heappop(heap)
+            if not heap:
+                continue
+            if (index + 1) * quantum - 1 <= size_max:
+                # every item in this bucket fits
+                entry = heap[0]
+            else:
+                # boundary bucket: only some items could fit
+                entry = None
+                for _entry in heap:
+                    if (_entry[2] is not None) and (_entry[3] <= size_max):
+                        if (entry is None) or (_entry < entry):
+                            entry = _entry
+                if entry is None:
+                    continue
+            if (best_entry is None) or (entry < best_entry):
+                best_entry = entry
+                best_heap = heap
+
+        if best_entry is None:
+            return None
+        handler = best_entry[2]
+        del self._entries[handler]
+        if best_heap[0] is best_entry:  # type: ignore
+            heapq.heappop(best_heap)  # type: ignore
+        else:
+            best_entry[2] = None
+        return handler
+
+
+def _request_size_key(item: "tuple[MerossRequestType, int]"):
+    return item[1]
+
+
+def _batch_room_key(batch: MultipleBatch):
+    return -batch.size
+
+
+def pack_multiple_requests(
+    requests: "Iterable[tuple[MerossRequestType, int]]",
+    lazy_queue: LazyPollQueue,
+    multiple_max: int,
+    size_max: float,
+):
+    """
+    Packs the due requests (request, expected response size) in the fewest batches
+    respecting both multiple_max (items per batch) and size_max (expected response size).
+    This is a bin-packing problem so we use the classical 'best fit decreasing' heuristic
+    which is near optimal for our (small) sets. Any room left is then filled with the lazy
+    pollers (those not strictly due) extracting from lazy_queue the stalest one fitting
+    the residual room. The fullest batches are filled first so that bigger rooms are
+    kept for bigger payloads. Lazy pollers never open a new batch.
+    Requests which wouldn't fit alone are returned in their own (single) batch.
+    """
+    batches: list[MultipleBatch] = []
+
+    for request, size in sorted(requests, key=_request_size_key, reverse=True):
+        best_batch = None
+        best_room = size_max
+        for batch in batches:
+            if len(batch.requests) < multiple_max:
+                room = size_max - batch.size - size
+                if 0 <= room < best_room:
+                    best_batch = batch
+                    best_room = room
+        if not best_batch:
+            best_batch = MultipleBatch()
+            batches.append(best_batch)
+        best_batch.requests.append(request)
+        best_batch.size += size
+
+    if lazy_queue:
+        for batch in sorted(batches, key=_batch_room_key):
+            while len(batch.requests) < multiple_max:
+                if not (handler := lazy_queue.pop_fit(size_max - batch.size)):
+                    break
+                batch.requests.append(handler.polling_request)
+                batch.lazy_handlers.append(handler)
+                batch.size += handler.polling_response_size
+
+    return batches
+
+
+class PushTracker:
+    """
+    Statistical tracker of the PUSH 'reliability' of a namespace.
+    Every PUSH updates the (per channel) pushed state while every polled (GETACK)
+    state is compared against it: when a poll reveals a change that no push has
+    reported, confidence is reset and polling resumes at full rate. Confidence
+    grows back only when polls confirm states that were pushed before them so that
+    NamespaceHandler.async_poll_smart can safely skip polling on MQTT. Even then,
+    a verification poll is due when the pushes go silent for much longer than
+    their usual pace.
+    """
+
+    if TYPE_CHECKING:
+        ns: Final[mn.Namespace]
+        states: dict[object, dict]
+        """Last pushed state x channel."""
+        states_polled: dict[object, dict]
+        """Last polled state x channel."""
+        states_pushed: set[object]
+        """Channels pushed since the last verification."""
+        confidence: float
+        push_count: int
+        push_epoch: float
+        push_interval: float
+        """Average interval between PUSHes (EWMA)."""
+        verify_epoch: float
+        """Last time a poll checked the pushed states."""
+        verify_hit_count: int
+        verify_miss_count: int
+
+    CONFIDENCE_GAIN = 0.25
+    PUSH_INTERVAL_GAIN = 0.2
+    PUSH_SILENCE_FACTOR = 4
+    """Silence (in push_interval(s)) after which polls are needed to verify."""
+    PUSH_SILENCE_MIN = 300
+    """Minimum silence (seconds) tolerated regardless of push_interval."""
+
+    __slots__ = (
+        "ns",
+        "states",
+        "states_polled",
+        "states_pushed",
+        "confidence",
+        "push_count",
+        "push_epoch",
+        "push_interval",
+        "verify_epoch",
+        "verify_hit_count",
+        "verify_miss_count",
+    )
+
+    def __init__(self, ns: "mn.Namespace", /):
+        self.ns = ns
+        self.states = {}
+        self.states_polled = {}
+        self.states_pushed = set()
+        self.confidence = 0.0
+        self.push_count = 0
+        self.push_epoch = 0.0
+        self.push_interval = 0.0
+        self.verify_epoch = 0.0
+        self.verify_hit_count = 0
+        self.verify_miss_count = 0
+
+    def reset(self):
+        """Called whenever we might have lost pushes (MQTT/device going offline)."""
+        self.states.clear()
+        self.states_polled.clear()
+        self.states_pushed.clear()
+        self.confidence = 0.0
+
+    def is_reliable(self, epoch: float, /):
+        if (self.confidence < mlc.PARAM_PUSH_CONFIDENCE_MIN) or (
+            (epoch - self.verify_epoch) >= mlc.PARAM_PUSH_VERIFY_PERIOD
+        ):
+            return False
+        # the longer the pushes are silent (compared to their usual pace) the
+        # higher the chance we've lost some
+        return (epoch - max(self.push_epoch, self.verify_epoch)) < max(
+            self.PUSH_SILENCE_FACTOR * self.push_interval, self.PUSH_SILENCE_MIN
+        )
+
+    def push(self, payload: dict, epoch: float, /):
+        if self.push_epoch:
+            self.push_interval += self.PUSH_INTERVAL_GAIN * (
+                epoch - self.push_epoch - self.push_interval
+            )
+        self.push_count += 1
+        self.push_epoch = epoch
+        key_channel = self.ns.key_channel
+        states = self.states
+        states_pushed = self.states_pushed
+        for p_channel in self._items(payload):
+            channel = p_channel.get(key_channel)
+            states[channel] = p_channel
+            states_pushed.add(channel)
+
+    def verify(self, payload: dict, epoch: float, /):
+        key_channel = self.ns.key_channel
+        states = self.states
+        states_polled = self.states_polled
+        states_pushed = self.states_pushed
+        confirmed = missed = False
+        for p_channel in self._items(payload):
+            channel = p_channel.get(key_channel)
+            polled = states_polled.get(channel)
+            states_polled[channel] = p_channel
+            if (state := states.get(channel)) is not None:
+                # pushes might carry only a subset of the polled keys
+                for key, value in state.items():
+                    if p_channel.get(key) != value:
+                        # the pushed state is stale: resync on the polled one
+                        del states[channel]
+                        missed = True
+                        break
+                else:
+                    # only a state pushed before this poll is an evidence
+                    # that the device is pushing its changes
+                    if channel in states_pushed:
+                        confirmed = True
+            elif (polled is not None) and (polled != p_channel):
+                # changed without any push
+                missed = True
+        states_pushed.clear()
+        if missed:
+            self.verify_miss_count += 1
+            self.confidence = 0.0
+        elif confirmed:
+            self.verify_hit_count += 1
+            self.confidence += self.CONFIDENCE_GAIN * (1 - self.confidence)
+        self.verify_epoch = epoch
+
+    def loggable_diagnostic_state(self):
+        return {
+            "confidence": round(self.confidence, 3),
+            "push_count": self.push_count,
+            "push_interval": round(self.push_interval, 1),
+            "verify_epoch": self.verify_epoch,
+            "verify_hit_count": self.verify_hit_count,
+            "verify_miss_count": self.verify_miss_count,
+        }
+
+    def _items(self, payload: dict, /) -> "Iterable[dict]":
+        p_ns = payload.get(self.ns.key)
+        if type(p_ns) is list:
+            return (p_channel for p_channel in p_ns if type(p_channel) is dict)
+        if type(p_ns) is dict:
+            return (p_ns,)
+        return ()
+
+
+class MQTTBudget:
+    """
+    Hourly budget of (cloud) MQTT messages x device. Meross asks to stay below
+    200 messages/hour (see _MQTTRateLimiter) so, instead of just relying on the
+    rate limiter to drop the excess, we plan the smart polls ahead: every poll
+    is classified by priority and lower priorities are denied earlier as the
+    hourly window fills up. A share of the budget is always reserved to user
+    commands (SET) which are never denied by the planner.
+    """
+
+    if TYPE_CHECKING:
+        PRIORITY_STATE: Final
+        PRIORITY_ENERGY: Final
+        PRIORITY_CONFIG: Final
+        PRIORITY_DIAGNOSTIC: Final
+        PRIORITY_COMMAND: Final
+        PRIORITY_NAMES: Final
+        PRIORITY_SHARE: Final
+        """Fraction of the (poll) budget a priority class can use before being denied."""
+        WINDOW: Final
+
+        quota: int
+        command_reserve: int
+        priorities: dict[str, int]
+        t_queue: deque[tuple[float, int]]
+        counts: list[int]
+        """Messages x priority in the current window."""
+        denied: list[int]
+        """Polls denied x priority (since start)."""
+
+    PRIORITY_STATE = 0
+    PRIORITY_ENERGY = 1
+    PRIORITY_CONFIG = 2
+    PRIORITY_DIAGNOSTIC = 3
+    PRIORITY_COMMAND = 4
+    PRIORITY_NAMES = ("state", "energy", "config", "diagnostic", "command")
+    PRIORITY_SHARE = (1.0, 0.85, 0.7, 0.5)
+    WINDOW = 3600
+
+    __slots__ = (
+        "quota",
+        "command_reserve",
+        "priorities",
+        "t_queue",
+        "counts",
+        "denied",
+    )
+
+    def __init__(self):
+        self.quota = mlc.PARAM_MQTT_BUDGET
+        self.command_reserve = mlc.PARAM_MQTT_BUDGET_COMMAND_RESERVE
+        self.priorities = {}
+        self.t_queue = deque()
+        self.counts = [0] * len(self.PRIORITY_NAMES)
+        self.denied = [0] * len(self.PRIORITY_NAMES)
+
+    def get_priority(self, namespace: str, method: str, /):
+        if method == mc.METHOD_SET:
+            return self.PRIORITY_COMMAND
+        try:
+            return self.priorities[namespace]
+        except KeyError:
+            if namespace in (
+                mn.Appliance_System_Debug.name,
+                mn.Appliance_System_Runtime.name,
+            ):
+                priority = self.PRIORITY_DIAGNOSTIC
+            elif ("Electricity" in namespace) or ("Consumption" in namespace):
+                priority = self.PRIORITY_ENERGY
+            elif ".Config" in namespace:
+                priority = self.PRIORITY_CONFIG
+            else:
+                priority = self.PRIORITY_STATE
+            self.priorities[namespace] = priority
+            return priority
+
+    def get_multiple_priority(self, requests: "Iterable[MerossRequestType]", /):
+        """Appliance.Control.Multiple batches are classified by the most important
+        of their packed requests (so that they're not accounted as commands)."""
+        return min(
+            (self.get_priority(request[0], request[1]) for request in requests),
+            default=self.PRIORITY_STATE,
+        )
+
+    def get_message_priority(self, message: "MerossMessage", /):
+        if message.namespace == mn.Appliance_Control_Multiple.name:
+            return self.get_multiple_priority(
+                (m_header[mc.KEY_NAMESPACE], m_header[mc.KEY_METHOD], None)
+                for m_header in (
+                    m[mc.KEY_HEADER]
+                    for m in message[mc.KEY_PAYLOAD][mn.Appliance_Control_Multiple.key]
+                )
+            )
+        return self.get_priority(message.namespace, message.method)
+
+    def used(self, epoch: float, /):
+        """Returns the number of messages sent in the last WINDOW."""
+        t_queue = self.t_queue
+        epoch_expired = epoch - self.WINDOW
+        counts = self.counts
+        while t_queue and (t_queue[0][0] <= epoch_expired):
+            counts[t_queue.popleft()[1]] -= 1
+        return len(t_queue)
+
+    def allow(self, priority: int, epoch: float, /):
+        """Checks if a poll with the given priority fits the budget."""
+        if self.used(epoch) < (
+            (self.quota - self.command_reserve) * self.PRIORITY_SHARE[priority]
+        ):
+            return True
+        self.denied[priority] += 1
+        return False
+
+    def record(self, priority: int, epoch: float, /):
+        self.t_queue.append((epoch, priority))
+        self.counts[priority] += 1
+
+    def loggable_diagnostic_state(self, epoch: float, /):
+        return {
+            "quota": self.quota,
+            "command_reserve": self.command_reserve,
+            "used": self.used(epoch),
+            "used_by_priority": dict(zip(self.PRIORITY_NAMES, self.counts)),
+            "denied_by_priority": dict(zip(self.PRIORITY_NAMES, self.denied)),
+        }
+
+
+class CircuitBreaker:
+    """
+    Per transport circuit breaker used when probing an offline device.
+    After PARAM_CIRCUIT_BREAKER_THRESHOLD consecutive failed probes the circuit
+    'opens' and further probes are denied for an exponentially growing
+    (tiered) period so that unreachable devices don't keep hogging transport
+    resources. Once the period elapses a single probe is allowed ('half-open')
+    and its outcome either closes the circuit or moves it to the next tier.
+    """
+
+    if TYPE_CHECKING:
+        failures: int
+        """Consecutive failed probes."""
+        tier: int
+        retry_epoch: float
+        """When open, the epoch after which a new probe is allowed."""
+        trips: int
+        """Number of times the circuit opened (since start)."""
+
+    __slots__ = (
+        "failures",
+        "tier",
+        "retry_epoch",
+        "trips",
+    )
+
+    def __init__(self):
+        self.failures = 0
+        self.tier = 0
+        self.retry_epoch = 0.0
+        self.trips = 0
+
+    @property
+    def is_open(self):
+        return self.failures >= mlc.PARAM_CIRCUIT_BREAKER_THRESHOLD
+
+    def allow(self, epoch: float, /):
+        return (not self.is_open) or (epoch >= self.retry_epoch)
+
+    def success(self):
+        self.failures = 0
+        self.tier = 0
+        self.retry_epoch = 0.0
+
+    def failure(self, epoch: float, /):
+        self.failures += 1
+        if self.is_open:
+            if self.failures == mlc.PARAM_CIRCUIT_BREAKER_THRESHOLD:
+                self.trips += 1
+            else:
+                self.tier += 1
+            self.retry_epoch = epoch + min(
+                mlc.PARAM_CIRCUIT_BREAKER_PERIOD_MIN * (2**self.tier),
+                mlc.PARAM_CIRCUIT_BREAKER_PERIOD_MAX,
+            )
+
+    def loggable_diagnostic_state(self):
+        return {
+            "open": self.is_open,
+            "failures": self.failures,
+            "tier": self.tier,
+            "retry_epoch": self.retry_epoch,
+            "trips": self.trips,
+        }
+
+
+class TransportScore:
+    """
+    Continuous scoring of a transport (HTTP or local MQTT) used to route requests
+    over the best one when the device is configured for CONF_PROTOCOL_AUTO.
+    Latency and success rate are tracked as exponentially weighted averages and
+    combined in a single 'cost' (the expected time to get a reply where failures
+    weight as FAILURE_COST) so that lower is better.
+    """
+
+    if TYPE_CHECKING:
+        rtt: float
+        """Averaged round trip time (seconds) of successful requests."""
+        success_rate: float
+        samples: int
+
+    RTT_GAIN = 0.2
+    SUCCESS_GAIN = 0.1
+    SAMPLES_MIN = 5
+    """Samples needed before the score is used to select the transport."""
+    FAILURE_COST = 5
+    """Cost (seconds) of a failed request (roughly a timeout)."""
+
+    __slots__ = (
+        "rtt",
+        "success_rate",
+        "samples",
+    )
+
+    def __init__(self):
+        self.rtt = 0.0
+        self.success_rate = 1.0
+        self.samples = 0
+
+    @property
+    def cost(self):
+        success_rate = self.success_rate
+        return (
+            self.rtt * success_rate + (1 - success_rate) * TransportScore.FAILURE_COST
+        )
+
+    @property
+    def is_valid(self):
+        return self.samples >= TransportScore.SAMPLES_MIN
+
+    def success(self, rtt: float, /):
+        if self.samples:
+            self.rtt += TransportScore.RTT_GAIN * (rtt - self.rtt)
+        else:
+            self.rtt = rtt
+        self.success_rate += TransportScore.SUCCESS_GAIN * (1 - self.success_rate)
+        self.samples += 1
+
+    def failure(self):
+        self.success_rate -= TransportScore.SUCCESS_GAIN * self.success_rate
+        self.samples += 1
+
+    def loggable_diagnostic_state(self):
+        return {
+            "rtt": self.rtt,
+            "success_rate": self.success_rate,
+            "samples": self.samples,
+        }
@@ -299,7 +299,9 @@ class MLLightBase(me.MLBinaryEntity, light.LightEntity):
 
     # interface: self
     async def async_request_light_ack(self, payload: dict):
-        return await self.manager.async_request_ack(
+        # newer payloads carrying the same set of keys supersede any pending one
+        return await self.manager.async_request_ack_coalesced(
+            (self.ns.name, self.channel, frozenset(payload)),
             self.ns.name,
             mc.METHOD_SET,
             {self.ns.key: payload},
@@ -638,11 +640,7 @@ class MLLight(MLLightBase):
         if mc.KEY_ONOFF in _light:
             _light[mc.KEY_ONOFF] = 1
 
-        if await self.manager.async_request_ack(
-            mn.Appliance_Control_Light.name,
-            mc.METHOD_SET,
-            {mc.KEY_LIGHT: _light},
-        ):
+        if await self.async_request_light_ack(_light):
             self.is_on = self.is_on or self._togglex_auto
             self._flush_light(_light)
             if not self.is_on:
@@ -70,20 +70,86 @@ except Exception:
 #
 # Optimized JSON encoding/decoding
 #
+# The codec backend is selected at import time: orjson (shipped with HA core anyway)
+# or msgspec are way faster than the stdlib and natively work with bytes so that
+# we can avoid the str <-> bytes transcoding in the whole message pipeline.
+# The stdlib decoder is always kept as a fallback on decoding errors since it
+# raises the 'rich' JSONDecodeError (doc/pos) which is needed to recover
+# truncated responses. It also (raw_decode) tolerates trailing data after the
+# json object (like NUL padding from some devices) which the fast backends reject.
+#
 JSON_ENCODER = json.JSONEncoder(
     ensure_ascii=False, check_circular=False, separators=(",", ":")
 )
 JSON_DECODER = json.JSONDecoder()
 
 
-def json_dumps(obj):
-    """Slightly optimized json.dumps with pre-configured encoder"""
-    return JSON_ENCODER.encode(obj)
+def _json_loads_std(s: str | bytes):
+    if type(s) is not str:
+        s = bytes(s).decode("utf-8")
+    return JSON_DECODER.raw_decode(s)[0]
 
 
-def json_loads(s: str):
-    """Slightly optimized json.loads with pre-configured decoder"""
-    return JSON_DECODER.raw_decode(s)[0]
+try:
+    import orjson
+
+    JSON_BACKEND = "orjson"
+    _orjson_dumps = orjson.dumps
+    _orjson_loads = orjson.loads
+    _orjson_error = orjson.JSONDecodeError
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def json_dumps(obj) -> str:
+        """Optimized json.dumps with pre-configured encoder"""
+        return _orjson_dumps(obj, option=_ORJSON_OPTIONS).decode("utf-8")
+
+    def json_dumps_bytes(obj) -> bytes:
+        """Optimized json.dumps with pre-configured encoder (utf-8 encoded)"""
+        return _orjson_dumps(obj, option=_ORJSON_OPTIONS)
+
+    def json_loads(s: str | bytes):
+        """Optimized json.loads accepting both str and (utf-8) bytes"""
+        try:
+            return _orjson_loads(s)
+        except _orjson_error:
+            return _json_loads_std(s)
+
+except ImportError:
+    try:
+        import msgspec
+
+        JSON_BACKEND = "msgspec"
+        _msgspec_encode = msgspec.json.Encoder().encode
+        _msgspec_decode = msgspec.json.Decoder().decode
+        _msgspec_error = msgspec.DecodeError
+
+        def json_dumps(obj) -> str:
+            """Optimized json.dumps with pre-configured encoder"""
+            return _msgspec_encode(obj).decode("utf-8")
+
+        def json_dumps_bytes(obj) -> bytes:
+            """Optimized json.dumps with pre-configured encoder (utf-8 encoded)"""
+            return _msgspec_encode(obj)
+
+        def json_loads(s: str | bytes):
+            """Optimized json.loads accepting both str and (utf-8) bytes"""
+            try:
+                return _msgspec_decode(s)
+            except _msgspec_error:
+                return _json_loads_std(s)
+
+    except ImportError:
+        JSON_BACKEND = "json"
+
+        def json_dumps(obj) -> str:
+            """Slightly optimized json.dumps with pre-configured encoder"""
+            return JSON_ENCODER.encode(obj)
+
+        def json_dumps_bytes(obj) -> bytes:
+            """Slightly optimized json.dumps with pre-configured encoder (utf-8)"""
+            return JSON_ENCODER.encode(obj).encode("utf-8")
+
+        json_loads = _json_loads_std
 
 
 #
@@ -8,13 +8,14 @@ from base64 import b64decode, b64encode
 import logging
 import socket
 import sys
+from time import monotonic
 from typing import TYPE_CHECKING
 
 import aiohttp
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from yarl import URL
 
-from . import JSON_ENCODER, MEROSSDEBUG
+from . import MEROSSDEBUG, json_dumps_bytes
 from .protocol import MerossKeyError, const as mc
 from .protocol.message import (
     MerossResponse,
@@ -32,10 +33,189 @@ if TYPE_CHECKING:
         def log(self, level: int, msg: str, *args, **kwargs) -> None: ...
 
 
+_ZERO_PADDING = bytes(16)
+
+
 class TerminatedException(Exception):
     pass
 
 
+class RTTHistogram:
+    """
+    Compact (log spaced buckets) histogram of request round trip times
+    used to estimate percentiles of the latency of a single host.
+    Counts are halved when reaching SAMPLES_MAX so that the
+    estimation slowly follows changes in the host behavior.
+    """
+
+    BOUNDS = (0.025, 0.05, 0.1, 0.2, 0.4, 0.8, 1.6, 3.2, 6.4)
+    """Upper bounds (seconds) of the buckets. An implicit overflow bucket follows."""
+    SAMPLES_MIN = 16
+    """Minimum number of samples before percentiles are considered meaningful."""
+    SAMPLES_MAX = 512
+
+    __slots__ = (
+        "counts",
+        "count",
+    )
+
+    def __init__(self):
+        self.counts = [0] * (len(RTTHistogram.BOUNDS) + 1)
+        self.count = 0
+
+    def add(self, rtt: float, /):
+        index = 0
+        for bound in RTTHistogram.BOUNDS:
+            if rtt <= bound:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        if self.count >= RTTHistogram.SAMPLES_MAX:
+            self.counts = [_count // 2 for _count in self.counts]
+            self.count = sum(self.counts)
+
+    def percentile(self, p: float, /):
+        """Returns the upper bound of the bucket containing the p-th percentile
+        or None if not enough samples or when it falls in the overflow bucket."""
+        if self.count < RTTHistogram.SAMPLES_MIN:
+            return None
+        threshold = self.count * p
+        cumulative = 0
+        for bound, count in zip(RTTHistogram.BOUNDS, self.counts):
+            cumulative += count
+            if cumulative >= threshold:
+                return bound
+        return None
+
+    def reset(self):
+        self.counts = [0] * (len(RTTHistogram.BOUNDS) + 1)
+        self.count = 0
+
+    def loggable_diagnostic_state(self):
+        return {
+            "count": self.count,
+            "buckets": {
+                str(bound): count
+                for bound, count in zip((*RTTHistogram.BOUNDS, "inf"), self.counts)
+            },
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+        }
+
+
+class ConnectionPolicy:
+    """
+    Tracks the connection handling of a host and learns if it reliably honours
+    HTTP keep-alive. Some devices close idle sockets without notice so that
+    the next request on the (reused) pooled connection fails with a
+    ServerDisconnectedError: when this happens too often we switch to
+    'Connection: close' so that every request pays the handshake but reliably
+    succeeds. Once in a while keep-alive is tried again in case the device
+    behavior changed (fw update).
+    Connection statistics are collected through the aiohttp tracing hooks
+    and so are only available when using the library dedicated session.
+    """
+
+    if TYPE_CHECKING:
+        disconnects: dict[str, int]
+        """Transport errors x exception type."""
+
+    REUSE_FAILURES_MAX = 3
+    REUSE_FAILURES_RATIO = 0.1
+    CLOSE_REQUESTS_MAX = 200
+    """Number of requests in 'close' mode before trying keep-alive again."""
+
+    __slots__ = (
+        "keepalive",
+        "requests",
+        "handshakes",
+        "reuses",
+        "reuse_successes",
+        "reuse_failures",
+        "close_requests",
+        "disconnects",
+    )
+
+    def __init__(self):
+        self.keepalive = True
+        self.requests = 0
+        self.handshakes = 0
+        self.reuses = 0
+        self.reuse_successes = 0
+        self.reuse_failures = 0
+        self.close_requests = 0
+        self.disconnects = {}
+
+    def success(self, trace: "RequestTrace", /):
+        if trace.reused:
+            self.reuse_successes += 1
+        if not self.keepalive:
+            self.close_requests += 1
+            if self.close_requests >= ConnectionPolicy.CLOSE_REQUESTS_MAX:
+                self.keepalive = True
+                self.reuse_successes = self.reuse_failures = 0
+
+    def failure(self, trace: "RequestTrace", exception: Exception, /):
+        if not isinstance(exception, (aiohttp.ClientError, asyncio.TimeoutError)):
+            return
+        reason = type(exception).__name__
+        self.disconnects[reason] = self.disconnects.get(reason, 0) + 1
+        if trace.reused and isinstance(
+            exception, (aiohttp.ServerDisconnectedError, aiohttp.ClientOSError)
+        ):
+            self.reuse_failures += 1
+            if (
+                self.keepalive
+                and (self.reuse_failures >= ConnectionPolicy.REUSE_FAILURES_MAX)
+                and (
+                    self.reuse_failures
+                    > (self.reuse_failures + self.reuse_successes)
+                    * ConnectionPolicy.REUSE_FAILURES_RATIO
+                )
+            ):
+                self.keepalive = False
+                self.close_requests = 0
+
+    def loggable_diagnostic_state(self):
+        connections = self.handshakes + self.reuses
+        return {
+            "keepalive": self.keepalive,
+            "requests": self.requests,
+            "handshakes": self.handshakes,
+            "reuses": self.reuses,
+            "reuse_ratio": (self.reuses / connections) if connections else None,
+            "reuse_successes": self.reuse_successes,
+            "reuse_failures": self.reuse_failures,
+            "disconnects": self.disconnects,
+        }
+
+
+class RequestTrace:
+    """Per request context passed along the aiohttp tracing hooks."""
+
+    __slots__ = (
+        "policy",
+        "reused",
+    )
+
+    def __init__(self, policy: ConnectionPolicy, /):
+        self.policy = policy
+        self.reused = None
+
+    @staticmethod
+    async def on_connection_create_end(session, trace_config_ctx, params):
+        if trace := trace_config_ctx.trace_request_ctx:
+            trace.reused = False
+            trace.policy.handshakes += 1
+
+    @staticmethod
+    async def on_connection_reuseconn(session, trace_config_ctx, params):
+        if trace := trace_config_ctx.trace_request_ctx:
+            trace.reused = True
+            trace.policy.reuses += 1
+
+
 class MerossHttpClient:
     if TYPE_CHECKING:
         SESSION_MAXIMUM_CONNECTIONS: ClassVar
@@ -44,11 +224,25 @@ class MerossHttpClient:
         _SESSION: ClassVar[aiohttp.ClientSession | None]
 
         _encryption_cipher: Cipher | None
+        _encryption_buffer: bytearray
+        _decryption_buffer: bytearray
         _key_header: MerossHeaderType
 
     SESSION_MAXIMUM_CONNECTIONS = 50
     SESSION_MAXIMUM_CONNECTIONS_PER_HOST = 1
     SESSION_TIMEOUT = aiohttp.ClientTimeout(total=10, connect=5)
+    # Adaptive timeouts: once enough samples are collected the (connect/total)
+    # timeouts are derived from the measured RTT percentiles of the host
+    # (RTT_FACTOR * percentile + RTT_MARGIN) and bounded between RTT_TIMEOUT_MIN
+    # and the values in self.timeout.
+    # Since the RTT samples are dominated by small (polling) responses, the
+    # total timeout floor is raised by RTT_TOTAL_TIMEOUT_SIZE_FACTOR (seconds
+    # x byte) of the expected response size for big ones (NS_ALL, NS_MULTIPLE).
+    RTT_FACTOR = 2
+    RTT_MARGIN = 0.25
+    RTT_TIMEOUT_MIN = 0.5
+    RTT_TOTAL_TIMEOUT_MIN = 2
+    RTT_TOTAL_TIMEOUT_SIZE_FACTOR = 0.001
 
     # Use an 'isolated' and dedicated client session to better manage
     # Meross http specifics following concern from @garysargentpersonal
@@ -61,6 +255,13 @@ class MerossHttpClient:
     @staticmethod
     def _get_or_create_client_session():
         if not MerossHttpClient._SESSION:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_end.append(
+                RequestTrace.on_connection_create_end
+            )
+            trace_config.on_connection_reuseconn.append(
+                RequestTrace.on_connection_reuseconn
+            )
             MerossHttpClient._SESSION = aiohttp.ClientSession(
                 connector=aiohttp.TCPConnector(
                     family=socket.AF_INET,
@@ -74,6 +275,7 @@ class MerossHttpClient:
                     ),
                 },
                 timeout=MerossHttpClient.SESSION_TIMEOUT,
+                trace_configs=[trace_config],
             )
         return MerossHttpClient._SESSION
 
@@ -95,7 +297,12 @@ class MerossHttpClient:
         "_terminate",
         "_terminate_guard",
         "_encryption_cipher",
+        "_encryption_buffer",
+        "_decryption_buffer",
         "_key_header",
+        "rtt_connect",
+        "rtt_total",
+        "connection_policy",
     )
 
     def __init__(
@@ -125,7 +332,11 @@ class MerossHttpClient:
         self._terminate = False
         self._terminate_guard = 0
         self._encryption_cipher = None
+        self._encryption_buffer = self._decryption_buffer = bytearray()
         self._key_header = {}  # type: ignore
+        self.rtt_connect = RTTHistogram()
+        self.rtt_total = RTTHistogram()
+        self.connection_policy = ConnectionPolicy()
 
     @property
     def host(self):
@@ -133,8 +344,12 @@ class MerossHttpClient:
 
     @host.setter
     def host(self, value: str):
-        self._host = value
-        self._requesturl = URL(f"http://{value}/config")
+        if value != self._host:
+            self._host = value
+            self._requesturl = URL(f"http://{value}/config")
+            self.rtt_connect.reset()
+            self.rtt_total.reset()
+            self.connection_policy = ConnectionPolicy()
 
     def enable_encryption(self, uuid: str, key: str, mac: str, /):
         self._encryption_cipher = Cipher(
@@ -144,6 +359,109 @@ class MerossHttpClient:
 
     def disable_encryption(self):
         self._encryption_cipher = None
+        self._encryption_buffer = self._decryption_buffer = bytearray()
+
+    # The encryption (AES-CBC with fixed iv) needs a new encryptor/decryptor
+    # context for every message but we can at least avoid most of the
+    # allocations by working in place on (growing) buffers owned by the client.
+    # These are only used synchronously (no await in between) so it is safe
+    # to share them among concurrent requests.
+    def _encrypt(self, data: bytes, /):
+        """Zero-pads and encrypts data returning its base64 encoding."""
+        data_len = len(data)
+        padded_len = (data_len // 16 + 1) * 16
+        # update_into needs room for an extra (block_size - 1) bytes
+        buffer_len = padded_len * 2 + 15
+        if len(buffer := self._encryption_buffer) < buffer_len:
+            self._encryption_buffer = buffer = bytearray(buffer_len)
+        view = memoryview(buffer)
+        view[:data_len] = data
+        view[data_len:padded_len] = _ZERO_PADDING[: padded_len - data_len]
+        encryptor = self._encryption_cipher.encryptor()  # type: ignore
+        encrypted_len = encryptor.update_into(view[:padded_len], view[padded_len:])
+        encryptor.finalize()
+        return b64encode(view[padded_len : padded_len + encrypted_len])
+
+    def _decrypt(self, data: bytes, /):
+        """Decodes base64 data, decrypts and strips the zero padding."""
+        data = b64decode(data)
+        buffer_len = len(data) + 15
+        if len(buffer := self._decryption_buffer) < buffer_len:
+            self._decryption_buffer = buffer = bytearray(buffer_len)
+        decryptor = self._encryption_cipher.decryptor()  # type: ignore
+        end = decryptor.update_into(data, buffer)
+        decryptor.finalize()
+        while end and not buffer[end - 1]:
+            end -= 1
+        return bytes(memoryview(buffer)[:end])
+
+    def get_timeouts(self, response_size: int = 0, /):
+        """
+        Returns the (connect, connect_max, total) timeouts for the next request
+        (expecting a response of about 'response_size' bytes).
+        'connect' is the timeout for the first connection attempt which is
+        then doubled on retries up to 'connect_max'. When not enough RTT
+        samples are available these default to the 'legacy' (1, timeout.connect,
+        timeout.total) values.
+        The 'connect' histogram actually measures the time to receive the
+        response headers which is always >= the pure connection time so it
+        conservatively bounds the connect timeout.
+        """
+        timeout = self.timeout
+        connect_max = timeout.connect or timeout.total or 5
+        total = timeout.total
+        if (p95 := self.rtt_connect.percentile(0.95)) is not None:
+            connect = min(
+                max(
+                    p95 * self.RTT_FACTOR + self.RTT_MARGIN,
+                    self.RTT_TIMEOUT_MIN,
+                ),
+                connect_max,
+            )
+            if (p99 := self.rtt_connect.percentile(0.99)) is not None:
+                # allow a couple of retries (doubling) before giving up
+                connect_max = min(
+                    max((p99 * self.RTT_FACTOR + self.RTT_MARGIN) * 4, connect),
+                    connect_max,
+                )
+        else:
+            connect = 1
+        if total and ((p99 := self.rtt_total.percentile(0.99)) is not None):
+            total = min(
+                max(
+                    p99 * self.RTT_FACTOR + self.RTT_MARGIN,
+                    self.RTT_TOTAL_TIMEOUT_MIN
+                    + response_size * self.RTT_TOTAL_TIMEOUT_SIZE_FACTOR,
+                    connect_max,
+                ),
+                total,
+            )
+        return connect, connect_max, total
+
+    def loggable_diagnostic_state(self):
+        connect, connect_max, total = self.get_timeouts()
+        return {
+            "timeout_connect": connect,
+            "timeout_connect_max": connect_max,
+            "timeout_total": total,
+            "rtt_connect": self.rtt_connect.loggable_diagnostic_state(),
+            "rtt_total": self.rtt_total.loggable_diagnostic_state(),
+            "connection": self.connection_policy.loggable_diagnostic_state(),
+        }
+
+    async def async_tcp_probe(self, timeout: float, /):
+        """
+        Cheap reachability check: just opens (and closes) a TCP connection
+        to the device http service without issuing any request.
+        """
+        url = self._requesturl
+        try:
+            async with asyncio.timeout(timeout):
+                _, writer = await asyncio.open_connection(url.host, url.port)
+            writer.close()
+            return True
+        except (OSError, asyncio.TimeoutError):
+            return False
 
     def _check_terminated(self):
         if self._terminate:
@@ -157,18 +475,29 @@ class MerossHttpClient:
         while self._terminate_guard:
             await asyncio.sleep(0.5)
 
-    async def async_request_raw(self, request: str, /) -> MerossResponse:
+    async def async_request_raw(
+        self, request: str | bytes, response_size: int = 0, /
+    ) -> MerossResponse:
         self._check_terminated()
         logger = self._logger
         logid = None
         self._terminate_guard += 1
+        _connect_timeout, _connect_timeout_max, _total_timeout = self.get_timeouts(
+            response_size
+        )
+        connection_policy = self.connection_policy
+        connection_policy.requests += 1
+        trace = RequestTrace(connection_policy)
         try:
             if logger and logger.isEnabledFor(self._log_level_dump):
                 # we catch the 'request' id before json dumping so
                 # to reasonably set the context before any exception
                 logid = f"MerossHttpClient({self._host}:{id(request)})"
                 logger.log(
-                    self._log_level_dump, "%s: HTTP Request (%s)", logid, request
+                    self._log_level_dump,
+                    "%s: HTTP Request (%s)",
+                    logid,
+                    request if type(request) is str else request.decode("utf-8"),  # type: ignore
                 )
             else:
                 logger = None
@@ -176,12 +505,9 @@ class MerossHttpClient:
                 MEROSSDEBUG.http_random_timeout()
 
             if _cipher := self._encryption_cipher:
-                request_bytes = request.encode("utf-8")
-                request_bytes += bytes(16 - (len(request_bytes) % 16))
-                encryptor = _cipher.encryptor()
-                request = b64encode(
-                    encryptor.update(request_bytes) + encryptor.finalize()
-                ).decode("utf-8")
+                request = self._encrypt(
+                    request.encode("utf-8") if type(request) is str else request  # type: ignore
+                )
                 headers = {
                     aiohttp.hdrs.CONTENT_TYPE: "application/octet-stream",
                 }
@@ -190,47 +516,61 @@ class MerossHttpClient:
                 headers = {
                     aiohttp.hdrs.CONTENT_TYPE: "application/json",
                 }
+            if not connection_policy.keepalive:
+                headers[aiohttp.hdrs.CONNECTION] = "close"
             # since device HTTP service sometimes timeouts with no apparent
             # reason we're using an increasing timeout loop to try recover
             # when this timeout is transient. This will lead to a total timeout
             # (for the caller) exceeding the value(s) actually set in self.timeout
-            _connect_timeout_max = self.timeout.connect or self.timeout.total or 5
-            _connect_timeout = 1
+            # The starting/max values are adapted to the measured host RTT.
             while True:
+                time_begin = monotonic()
                 try:
                     response = await self._session.post(
                         url=self._requesturl,
                         data=request,
                         headers=headers,
                         timeout=aiohttp.ClientTimeout(
-                            total=self.timeout.total, connect=_connect_timeout
+                            total=_total_timeout, connect=_connect_timeout
                         ),
+                        trace_request_ctx=trace,
                     )
                     break
                 except aiohttp.ServerTimeoutError:
                     self._check_terminated()
+                    # account a 'censored' sample so that timeouts too tight
+                    # for the host get relaxed over time
+                    self.rtt_connect.add(_connect_timeout)
                     if _connect_timeout < _connect_timeout_max:
                         _connect_timeout = _connect_timeout * 2
                     else:
                         raise
+            self.rtt_connect.add(monotonic() - time_begin)
 
             self._check_terminated()
             response.raise_for_status()
-            response = await response.text()
+            # keep the payload as bytes: the json codec parses it directly
+            response = await response.read()
             if _cipher:
-                decryptor = _cipher.decryptor()
-                decrypted_bytes = decryptor.update(b64decode(response))
-                decrypted_bytes += decryptor.finalize()
-                response = decrypted_bytes.decode("utf8").rstrip("\0")
+                response = self._decrypt(response)
 
             if logger:
                 logger.log(
-                    self._log_level_dump, "%s: HTTP Response (%s)", logid, response
+                    self._log_level_dump,
+                    "%s: HTTP Response (%s)",
+                    logid,
+                    response.decode("utf-8"),
                 )
             self._check_terminated()
-            return MerossResponse(response)
+            response = MerossResponse(response)  # type: ignore
+            self.rtt_total.add(monotonic() - time_begin)
+            connection_policy.success(trace)
+            return response
         except Exception as e:
             self._key_header = {}  # type: ignore
+            connection_policy.failure(trace, e)
+            if isinstance(e, asyncio.TimeoutError) and _total_timeout:
+                self.rtt_total.add(_total_timeout)
             if logger:
                 logger.log(  # type: ignore
                     logging.DEBUG,
@@ -252,7 +592,7 @@ class MerossHttpClient:
             if key is None
             else build_message(namespace, method, payload, key)
         )
-        response = await self.async_request_raw(JSON_ENCODER.encode(request))
+        response = await self.async_request_raw(json_dumps_bytes(request))
         if (
             response.get(mc.KEY_PAYLOAD, {}).get(mc.KEY_ERROR, {}).get(mc.KEY_CODE)
             == mc.ERROR_INVALIDKEY
@@ -274,7 +614,7 @@ class MerossHttpClient:
             req_header[mc.KEY_TIMESTAMP] = resp_header[mc.KEY_TIMESTAMP]
             req_header[mc.KEY_SIGN] = resp_header[mc.KEY_SIGN]
             try:
-                response = await self.async_request_raw(JSON_ENCODER.encode(request))
+                response = await self.async_request_raw(json_dumps_bytes(request))
             except (TerminatedException, asyncio.CancelledError):
                 raise
             except Exception:
@@ -61,6 +61,54 @@ class _MQTTRateLimiter:
         self.t_queue: deque[float] = deque()
 
 
+class _MQTTRxStats:
+    """
+    Statistics of the inbound message queue (see _MerossMQTTClient._mqttc_message_loop)
+    - depth_max: maximum number of messages found in the queue when draining
+    - latency: time (EWMA/max) between the first message of a burst being queued in
+    the mqtt thread and the drain starting in the asyncio loop
+    """
+
+    LATENCY_GAIN: typing.Final = 0.1
+
+    __slots__ = (
+        "received",
+        "dropped",
+        "drains",
+        "depth_max",
+        "latency_avg",
+        "latency_max",
+        "wakeup_time",
+    )
+
+    def __init__(self) -> None:
+        self.received: int = 0
+        self.dropped: int = 0
+        self.drains: int = 0
+        self.depth_max: int = 0
+        self.latency_avg: float = 0.0
+        self.latency_max: float = 0.0
+        self.wakeup_time: float = 0.0
+
+    def drain(self, depth: int, latency: float, /):
+        self.drains += 1
+        if depth > self.depth_max:
+            self.depth_max = depth
+        if latency > self.latency_max:
+            self.latency_max = latency
+        self.latency_avg += self.LATENCY_GAIN * (latency - self.latency_avg)
+
+    def loggable_diagnostic_state(self):
+        return {
+            "received": self.received,
+            "dropped": self.dropped,
+            "drains": self.drains,
+            "depth_max": self.depth_max,
+            "latency_avg_ms": round(self.latency_avg * 1000, 2),
+            "latency_max_ms": round(self.latency_max * 1000, 2),
+        }
+
+
 class _MerossMQTTClient(mqtt.Client):
     """
     Implements a rather abstract MQTT client used by both the MerossMQTTAppClient
@@ -75,6 +123,11 @@ class _MerossMQTTClient(mqtt.Client):
     STATE_DISCONNECTING = "disconnecting"
     STATE_DISCONNECTED = "disconnected"
 
+    RX_QUEUE_MAX: typing.Final = 1000
+    """Messages received (and not yet processed) over this limit are dropped"""
+    RX_BATCH_MAX: typing.Final = 50
+    """Max number of messages processed in a single loop callback"""
+
     @staticmethod
     def generate_app_id():
         return md5(uuid4().hex.encode("utf-8")).hexdigest()
@@ -120,7 +173,12 @@ class _MerossMQTTClient(mqtt.Client):
             # a non null value
             self._asyncio_loop = loop
             self._future_connected = None
-            self._tasks: list[asyncio.Task] = []
+            self._tasks: set[asyncio.Task] = set()
+            # inbound messages are queued by the mqtt thread and processed
+            # in batches in the loop (see _mqttc_message_loop)
+            self._rx_queue: deque[mqtt.MQTTMessage] = deque()
+            self._rx_scheduled = False
+            self._rx_stats = _MQTTRxStats()
             self.on_subscribe = self._mqttc_subscribe_loop
             self.on_disconnect = self._mqttc_disconnect_loop
             self.on_publish = self._mqttc_publish_loop
@@ -133,13 +191,18 @@ class _MerossMQTTClient(mqtt.Client):
 
     async def async_shutdown(self):
         await self.async_disconnect()
-        for task in self._tasks:
+        self._rx_queue.clear()
+        for task in tuple(self._tasks):
             await task
 
     @property
     def rl_dropped(self):
         return self._rl_dropped
 
+    @property
+    def rx_stats(self):
+        return self._rx_stats
+
     @property
     def stateext(self):
         return self._stateext
@@ -252,6 +315,24 @@ class _MerossMQTTClient(mqtt.Client):
             # queue empty
             return 0.0
 
+    def get_rl_release_delay(self, uuid: str):
+        """
+        Returns the time to wait before a publish for uuid would pass the
+        rate-limiter (0.0 if it would pass now).
+        """
+        with self._lock_queue:
+            try:
+                t_queue = self._rl2_queues[uuid].t_queue
+            except KeyError:
+                return 0.0
+            t_now = monotonic()
+            t_duration_back = t_now - _MQTTRateLimiter.DURATION
+            while t_queue and (t_queue[0] <= t_duration_back):
+                t_queue.popleft()
+            if len(t_queue) >= _MQTTRateLimiter.MAXQUEUE:
+                return t_queue[0] - t_duration_back
+            return 0.0
+
     def rl_publish(self, uuid: str, request: "MerossMessage"):
         with self._lock_queue:
 
@@ -282,7 +363,7 @@ class _MerossMQTTClient(mqtt.Client):
             return mqtt.Client.publish(
                 self,
                 mc.TOPIC_REQUEST.format(uuid),
-                request.json(),
+                request.json_bytes(),
             )
 
     def _mqtt_connected(self):
@@ -308,15 +389,66 @@ class _MerossMQTTClient(mqtt.Client):
         """
         pass
 
+    def _mqtt_rx_drained(self):
+        """
+        This is a placeholder method called by the asyncio implementation in the
+        main thread when starting to process a batch of received messages
+        (after rx_stats have been updated)
+        """
+        pass
+
+    def _mqtt_rx_drain(self):
+        """
+        Called in the main thread in order to process the messages queued by the
+        mqtt thread. A burst of messages only needs a single loop wakeup and is
+        processed in batches of RX_BATCH_MAX so to not starve the loop.
+        """
+        self._rx_scheduled = False
+        rx_queue = self._rx_queue
+        rx_stats = self._rx_stats
+        rx_stats.drain(len(rx_queue), monotonic() - rx_stats.wakeup_time)
+        self._mqtt_rx_drained()
+        mqtt_message = self.mqtt_message
+        count = 0
+        try:
+            while rx_queue and (count < self.RX_BATCH_MAX):
+                count += 1
+                rx_stats.received += 1
+                try:
+                    mqtt_message(rx_queue.popleft())
+                except Exception as exception:
+                    self._asyncio_loop.call_exception_handler(
+                        {
+                            "message": "Exception processing MQTT message",
+                            "exception": exception,
+                        }
+                    )
+        finally:
+            # whatever happened (batch limit or any BaseException escaping)
+            # the remaining messages must not be stalled
+            if rx_queue and not self._rx_scheduled:
+                self._rx_scheduled = True
+                rx_stats.wakeup_time = monotonic()
+                self._asyncio_loop.call_soon(self._mqtt_rx_drain)
+
     def mqtt_message(self, msg: mqtt.MQTTMessage):
         """
         This is a placeholder method called by the asyncio implementation in the
-        main thread when the mqtt client receives a message. Defaults to creating
-        a task for processing the message in async_mqtt_message
+        main thread when the mqtt client receives a message. Defaults to running
+        async_mqtt_message in an eager task: this starts executing right away
+        (with proper task context) and the task only gets scheduled on the loop
+        when the coroutine actually suspends (which is not the case for the
+        vast majority of messages).
         """
-        task = self._asyncio_loop.create_task(self.async_mqtt_message(msg))
-        self._tasks.append(task)
-        task.add_done_callback(self._tasks.remove)
+        task = asyncio.Task(
+            self.async_mqtt_message(msg), loop=self._asyncio_loop, eager_start=True
+        )
+        if not task.done():
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif not task.cancelled():
+            # re-raise any exception to the caller (see _mqtt_rx_drain)
+            task.result()
 
     async def async_mqtt_message(self, msg: mqtt.MQTTMessage):
         """
@@ -354,7 +486,17 @@ class _MerossMQTTClient(mqtt.Client):
         self._asyncio_loop.call_soon_threadsafe(self._mqtt_published)
 
     def _mqttc_message_loop(self, client, userdata, msg: mqtt.MQTTMessage):
-        self._asyncio_loop.call_soon_threadsafe(self.mqtt_message, msg)
+        """Called in the mqtt thread: queues the message and wakes up the loop
+        only if a drain is not already pending."""
+        rx_queue = self._rx_queue
+        if len(rx_queue) >= self.RX_QUEUE_MAX:
+            self._rx_stats.dropped += 1
+            return
+        rx_queue.append(msg)
+        if not self._rx_scheduled:
+            self._rx_scheduled = True
+            self._rx_stats.wakeup_time = monotonic()
+            self._asyncio_loop.call_soon_threadsafe(self._mqtt_rx_drain)
 
 
 class MerossMQTTAppClient(_MerossMQTTClient):
@@ -375,14 +517,26 @@ class MerossMQTTAppClient(_MerossMQTTClient):
         app_id: str | None = None,
         loop: asyncio.AbstractEventLoop | None = None,
         sslcontext: ssl.SSLContext | None = None,
+        subscribe_push: bool = True,
     ):
+        """
+        subscribe_push: when more clients are connected for the same account
+        (and broker) only one of them should subscribe the (shared) push topic
+        else every PUSH would be received multiple times.
+        """
         if not app_id:
             app_id = _MerossMQTTClient.generate_app_id()
         self.app_id = app_id
         self.topic_command = f"/app/{userid}-{app_id}/subscribe"
         self.topic_push = f"/app/{userid}/subscribe"
         super().__init__(
-            f"app:{app_id}", [(self.topic_push, 1), (self.topic_command, 1)], loop=loop
+            f"app:{app_id}",
+            (
+                [(self.topic_push, 1), (self.topic_command, 1)]
+                if subscribe_push
+                else [(self.topic_command, 1)]
+            ),
+            loop=loop,
         )
         self.username_pw_set(userid, md5(f"{userid}{key}".encode("utf8")).hexdigest())
         if sslcontext:
@@ -4,9 +4,11 @@ from time import time
 from typing import TYPE_CHECKING
 
 from . import MerossKeyError, MerossProtocolError, const as mc
-from .. import JSON_DECODER, JSON_ENCODER
+from .. import JSON_DECODER, json_dumps, json_dumps_bytes, json_loads
 
 if TYPE_CHECKING:
+    from typing import Final
+
     from .types import KeyType, MerossHeaderType, MerossMessageType, MerossPayloadType
 
 
@@ -71,6 +73,62 @@ def get_message_uuid(header: "MerossHeaderType", /):
     return header.get(mc.KEY_UUID) or mc.RE_PATTERN_TOPIC_UUID.match(header[mc.KEY_FROM]).group(1)  # type: ignore
 
 
+_RAW_KEY_FROM_APPLIANCE = b'"from":"/appliance/'
+_RAW_KEY_NAMESPACE = b'"namespace":"'
+
+
+def get_message_uuid_raw(topic: str, payload: bytes | str, /) -> str | None:
+    """
+    Extracts the device uuid before decoding the message. Devices publish
+    on '/appliance/{uuid}/publish' so that's enough when subscribing to their topics
+    (local brokers) while on app topics (cloud) we scan the raw payload for the
+    header 'from' field. Returns None when not found so that the caller can
+    fallback to get_message_uuid after decoding.
+    """
+    if topic.startswith("/appliance/"):
+        end = topic.find("/", 11)
+        return topic[11:end] if end > 11 else None
+    if type(payload) is str:
+        payload = payload.encode("utf-8")
+    start = payload.find(_RAW_KEY_FROM_APPLIANCE)  # type: ignore
+    if start < 0:
+        return None
+    start += len(_RAW_KEY_FROM_APPLIANCE)
+    end = payload.find(b"/", start)  # type: ignore
+    return payload[start:end].decode("utf-8") if end > start else None  # type: ignore
+
+
+def get_message_namespace_raw(payload: bytes | str, /) -> str | None:
+    """Extracts the header namespace before decoding the message (see
+    get_message_uuid_raw)."""
+    if type(payload) is str:
+        payload = payload.encode("utf-8")
+    start = payload.find(_RAW_KEY_NAMESPACE)  # type: ignore
+    if start < 0:
+        return None
+    start += len(_RAW_KEY_NAMESPACE)
+    end = payload.find(b'"', start)  # type: ignore
+    return payload[start:end].decode("utf-8") if end > start else None  # type: ignore
+
+
+def get_message_payload_raw(message_raw: bytes | str, /) -> bytes | str | None:
+    """
+    Extracts the (still serialized) payload from a raw message. This relies on
+    the device layout ({"header":..,"payload":..}) and returns None when the
+    payload is not the last item in the message.
+    """
+    if type(message_raw) is str:
+        payload_key, header_key, end_key = '"payload":', '"header":', "}"
+    else:
+        payload_key, header_key, end_key = b'"payload":', b'"header":', b"}"
+    start = message_raw.find(payload_key)  # type: ignore
+    if start < 0 or message_raw.find(header_key, start) >= 0:  # type: ignore
+        return None
+    end = message_raw.rfind(end_key)  # type: ignore
+    start += len(payload_key)
+    return message_raw[start:end] if end > start else None
+
+
 def get_replykey(header: "MerossHeaderType", key: "KeyType", /) -> "KeyType":
     """
     checks header signature against key:
@@ -111,8 +169,10 @@ class MerossMessage(dict):
         return "%032x" % int.from_bytes(os.urandom(16))
 
     @staticmethod
-    def decode(json_str: str, /):
-        return MerossMessage(JSON_DECODER.decode(json_str), json_str)
+    def decode(json_data: str | bytes, /):
+        if type(json_data) is str:
+            return MerossMessage(json_loads(json_data), json_data)
+        return MerossMessage(json_loads(json_data), None, json_data)  # type: ignore
 
     @staticmethod
     def check_(message: "MerossMessage | None", /):
@@ -142,17 +202,78 @@ class MerossMessage(dict):
         "messageid",
         "payload",
         "_json_str",
+        "_json_bytes",
     )
 
-    def __init__(self, message: dict, json_str: str | None = None, /):
+    def __init__(
+        self,
+        message: dict,
+        json_str: str | None = None,
+        json_bytes: bytes | None = None,
+        /,
+    ):
         self._json_str = json_str
+        self._json_bytes = json_bytes
         super().__init__(message)
 
     def json(self, /):
         if not self._json_str:
-            self._json_str = JSON_ENCODER.encode(self)
+            self._json_str = (
+                self._json_bytes.decode("utf-8")
+                if self._json_bytes
+                else json_dumps(self)
+            )
         return self._json_str
 
+    def json_bytes(self, /):
+        """Serialized (utf-8) message as sent/received on the wire."""
+        if not self._json_bytes:
+            self._json_bytes = (
+                self._json_str.encode("utf-8")
+                if self._json_str
+                else json_dumps_bytes(self)
+            )
+        return self._json_bytes
+
+    def json_raw(self, /) -> bytes | str:
+        """Serialized message using whatever representation is already available."""
+        return self._json_bytes or self.json()
+
+    def json_size(self, /):
+        """Size of the serialized message using whatever representation is
+        already available (avoids transcoding just for size accounting)."""
+        if self._json_bytes:
+            return len(self._json_bytes)
+        return len(self.json())
+
+    def json_multiple_raw(self, /) -> "list[bytes | str]":
+        """
+        Raw (serialized) sub-messages carried in an Appliance.Control.Multiple
+        response as they appear on the wire. These are located by scanning the raw
+        representation for the sub-messages headers so it relies on the device
+        layout ({"header":..,"payload":..}) and returns an empty list when that
+        doesn't hold.
+        """
+        if json_data := self._json_bytes:
+            multiple_key, item_key, end_key = b'"multiple":[', b'{"header":', b"]"
+        else:
+            json_data = self.json()
+            multiple_key, item_key, end_key = '"multiple":[', '{"header":', "]"
+        pos = json_data.find(multiple_key)  # type: ignore
+        if pos < 0:
+            return []
+        end = json_data.rfind(end_key)  # type: ignore
+        items = []
+        pos = json_data.find(item_key, pos)  # type: ignore
+        while 0 <= pos < end:
+            next_pos = json_data.find(item_key, pos + 1)  # type: ignore
+            if next_pos < 0:
+                items.append(json_data[pos:end])
+                break
+            items.append(json_data[pos : next_pos - 1])  # skip the ',' separator
+            pos = next_pos
+        return items
+
     def check(self, /):
         """
         Does a formal check of the message structure also raising a
@@ -182,8 +303,61 @@ class MerossMessage(dict):
 class MerossResponse(MerossMessage):
     """Helper for messages received from a device"""
 
-    def __init__(self, json_str: str, /):
-        super().__init__(JSON_DECODER.decode(json_str), json_str)
+    def __init__(self, json_data: str | bytes, /):
+        if type(json_data) is str:
+            super().__init__(json_loads(json_data), json_data)
+        else:
+            super().__init__(json_loads(json_data), None, json_data)  # type: ignore
+
+    @staticmethod
+    def from_message(message: dict, json_data: str | bytes | None, /):
+        """Wraps an already parsed message (i.e. a sub-message of an
+        Appliance.Control.Multiple response) together with its raw slice (if any)
+        without re-serializing it."""
+        response = MerossResponse.__new__(MerossResponse)
+        if type(json_data) is str:
+            MerossMessage.__init__(response, message, json_data)
+        else:
+            MerossMessage.__init__(response, message, None, json_data)  # type: ignore
+        return response
+
+
+def salvage_multiple_response(json_str: str, /) -> "tuple[MerossResponse | None, int]":
+    """
+    Incrementally scans a (likely truncated) Appliance.Control.Multiple response
+    and rebuilds a formally valid response carrying all of the complete sub-messages
+    wherever the cut happened. Returns the salvaged response (None if nothing could
+    be recovered) together with the offset at which the device output was cut
+    i.e. the size of the device (http) output buffer.
+    """
+    overflow_pos = len(json_str)
+    pos = json_str.find('"multiple":[')
+    if pos == -1:
+        return None, overflow_pos
+    pos = salvage_pos = multiple_pos = pos + 12
+    raw_decode = JSON_DECODER.raw_decode
+    try:
+        while True:
+            message, pos = raw_decode(json_str, pos)
+            if type(message) is not dict:
+                break
+            salvage_pos = pos
+            if json_str[pos] != ",":
+                break
+            pos += 1
+    except (ValueError, IndexError):
+        # ValueError (JSONDecodeError) is expected when the scan hits the
+        # truncated item while IndexError when the cut lands right after a
+        # complete item.
+        pass
+    if salvage_pos == multiple_pos:
+        return None, overflow_pos
+    try:
+        return MerossResponse(json_str[:salvage_pos] + "]}}"), overflow_pos
+    except ValueError:
+        # the outer message structure is not the one expected (payload
+        # before header?) and we're not able to reliably rebuild it
+        return None, overflow_pos
 
 
 class MerossRequest(MerossMessage):
@@ -223,6 +397,130 @@ class MerossRequest(MerossMessage):
             }
         )
 
+    def resign(self, key: str, /):
+        """Refreshes timestamp and signature (keeping the messageId) of a request
+        which has been waiting to be sent since devices reject stale messages."""
+        header = self[mc.KEY_HEADER]
+        header[mc.KEY_TIMESTAMP] = timestamp = int(time())
+        header[mc.KEY_SIGN] = compute_message_signature(self.messageid, key, timestamp)
+        self._json_str = self._json_bytes = None
+
+
+class MerossRequestTemplate:
+    """
+    Pre-serialized skeleton of a request which is sent over and over (polling).
+    Building the actual MerossRequest just needs splicing a new messageId,
+    timestamp and sign into the cached json (and a shallow copy of the header)
+    so we avoid re-encoding the whole message every time.
+    The payload must not be changed (in place) while the template is in use.
+    """
+
+    if TYPE_CHECKING:
+        namespace: Final[str]
+        method: Final[str]
+        payload: Final[MerossPayloadType]
+        payload_json: Final[str]
+        from_: Final[str]
+        _header: Final[MerossHeaderType]
+        _json_header: Final[str]
+        _json_tail: Final[str]
+
+    __slots__ = (
+        "namespace",
+        "method",
+        "payload",
+        "payload_json",
+        "from_",
+        "_header",
+        "_json_header",
+        "_json_tail",
+    )
+
+    def __init__(
+        self,
+        namespace: str,
+        method: str,
+        payload: "MerossPayloadType",
+        from_: str = mc.HEADER_FROM_DEFAULT,
+        triggerSrc: str = mc.HEADER_TRIGGERSRC_DEFAULT,
+        payload_json: str | None = None,
+        /,
+    ):
+        self.namespace = namespace
+        self.method = method
+        self.payload = payload
+        self.payload_json = payload_json = payload_json or json_dumps(payload)
+        self.from_ = from_
+        self._header = {
+            mc.KEY_MESSAGEID: "",
+            mc.KEY_NAMESPACE: namespace,
+            mc.KEY_METHOD: method,
+            mc.KEY_PAYLOADVERSION: 1,
+            mc.KEY_TRIGGERSRC: triggerSrc,
+            mc.KEY_FROM: from_,
+            mc.KEY_TIMESTAMP: 0,
+            mc.KEY_TIMESTAMPMS: 0,
+            mc.KEY_SIGN: "",
+        }  # type: ignore
+        header_json = json_dumps(
+            {
+                mc.KEY_NAMESPACE: namespace,
+                mc.KEY_METHOD: method,
+                mc.KEY_PAYLOADVERSION: 1,
+                mc.KEY_TRIGGERSRC: triggerSrc,
+                mc.KEY_FROM: from_,
+            }
+        )
+        self._json_header = f',{header_json[1:-1]},"{mc.KEY_TIMESTAMP}":'
+        self._json_tail = f'"}},"{mc.KEY_PAYLOAD}":{payload_json}}}'
+
+    def build(self, key: str, /):
+        request = MerossRequest.__new__(MerossRequest)
+        request.namespace = self.namespace
+        request.method = self.method
+        request.payload = self.payload
+        request.messageid = messageid = MerossMessage.generate_id()
+        timestamp = int(time())
+        sign = compute_message_signature(messageid, key, timestamp)
+        header = self._header.copy()
+        header[mc.KEY_MESSAGEID] = messageid
+        header[mc.KEY_TIMESTAMP] = timestamp
+        header[mc.KEY_SIGN] = sign
+        MerossMessage.__init__(
+            request,
+            {mc.KEY_HEADER: header, mc.KEY_PAYLOAD: self.payload},
+            "".join(
+                (
+                    '{"header":{"messageId":"',
+                    messageid,
+                    '"',
+                    self._json_header,
+                    str(timestamp),
+                    ',"timestampMs":0,"sign":"',
+                    sign,
+                    self._json_tail,
+                )
+            ),
+        )
+        return request
+
+    def multiple_item_json(self, messageid: str, /):
+        """Serialized item for an Appliance.Control.Multiple request payload
+        (see Device._async_multiple_requests_send)."""
+        return "".join(
+            (
+                '{"header":{"messageId":"',
+                messageid,
+                '","method":"',
+                self.method,
+                '","namespace":"',
+                self.namespace,
+                '"},"payload":',
+                self.payload_json,
+                "}",
+            )
+        )
+
 
 class MerossPushReply(MerossMessage):
     """
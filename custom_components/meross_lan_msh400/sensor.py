@@ -297,6 +297,11 @@ class ProtocolSensor(me.MEAlwaysAvailableMixin, MLEnumSensor):
     ATTR_HTTP = mlc.CONF_PROTOCOL_HTTP
     ATTR_MQTT = mlc.CONF_PROTOCOL_MQTT
     ATTR_MQTT_BROKER = "mqtt_broker"
+    ATTR_HTTP_RTT = "http_rtt"
+    ATTR_MQTT_RTT = "mqtt_rtt"
+    ATTR_SELECTION = "selection"
+    SELECTION_PREFERRED = "preferred"
+    SELECTION_SCORE = "score"
 
     manager: "Device"
 
@@ -337,6 +342,17 @@ class ProtocolSensor(me.MEAlwaysAvailableMixin, MLEnumSensor):
             attrs[self.ATTR_HTTP] = _get_attr_state(manager._http_active)
             attrs[self.ATTR_MQTT] = _get_attr_state(manager._mqtt_active)
             attrs[self.ATTR_MQTT_BROKER] = _get_attr_state(manager._mqtt_connected)
+            # report the transport scoring (ms) driving the protocol selection
+            for attrname, score in (
+                (self.ATTR_HTTP_RTT, manager.http_score),
+                (self.ATTR_MQTT_RTT, manager.mqtt_score),
+            ):
+                attrs[attrname] = round(score.rtt * 1000) if score.is_valid else None
+            attrs[self.ATTR_SELECTION] = (
+                self.SELECTION_SCORE
+                if manager.protocol_scored
+                else self.SELECTION_PREFERRED
+            )
         self.flush_state()
 
     def set_unavailable(self):
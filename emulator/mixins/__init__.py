@@ -420,7 +420,7 @@ class MerossEmulator:
         """
         self.descriptor.time[mc.KEY_TIMESTAMP] = self.epoch = int(time())
 
-    def handle(self, request: MerossMessage | str, /) -> str | None:
+    def handle(self, request: MerossMessage | str | bytes, /) -> str | None:
         """
         main message handler entry point: this is called either from web.Request
         for request routed from the web.Application or from the mqtt.Client.
@@ -429,7 +429,7 @@ class MerossEmulator:
         This method is thread-safe
         """
         cipher = None
-        if isinstance(request, str):
+        if isinstance(request, (str, bytes)):
             # this is typically the path when processing HTTP requests.
             # we're now 'enforcing' encrypted local traffic if device abilities
             # request so
@@ -0,0 +1,62 @@
+"""
+Micro-benchmark of the encrypted (Appliance.Encrypt.ECDHE) HTTP transport
+comparing the legacy (allocating) implementation against MerossHttpClient
+in-place buffers.
+Run directly: python -m tests.profile_http_encryption
+"""
+
+from base64 import b64decode, b64encode
+import timeit
+
+from cryptography.hazmat.primitives.ciphers import Cipher
+
+from custom_components.meross_lan.merossclient.httpclient import MerossHttpClient
+
+from . import const as tc
+
+
+def _legacy_encrypt(cipher: Cipher, request: str):
+    request_bytes = request.encode("utf-8")
+    request_bytes += bytes(16 - (len(request_bytes) % 16))
+    encryptor = cipher.encryptor()
+    return b64encode(encryptor.update(request_bytes) + encryptor.finalize()).decode(
+        "utf-8"
+    )
+
+
+def _legacy_decrypt(cipher: Cipher, response: str):
+    decryptor = cipher.decryptor()
+    decrypted_bytes = decryptor.update(b64decode(response))
+    decrypted_bytes += decryptor.finalize()
+    return decrypted_bytes.decode("utf8").rstrip("\0")
+
+
+def profile(number: int = 5000):
+    http = MerossHttpClient("127.0.0.1", session=object())  # type: ignore
+    http.enable_encryption(
+        "0123456789abcdef0123456789abcdef", tc.MOCK_KEY, "48:e1:e9:aa:bb:cc"
+    )
+    cipher = http._encryption_cipher
+    assert cipher
+    for size in (512, 1024, 2048, 4096, 8192):
+        request = '{"payload":"' + "x" * (size - 14) + '"}'
+        request_bytes = request.encode("utf-8")
+        encrypted = http._encrypt(request_bytes)
+        assert encrypted.decode("utf-8") == _legacy_encrypt(cipher, request)
+        assert http._decrypt(encrypted) == request_bytes
+        t_legacy = timeit.timeit(
+            lambda: _legacy_decrypt(cipher, _legacy_encrypt(cipher, request)),
+            number=number,
+        )
+        t_buffer = timeit.timeit(
+            lambda: http._decrypt(http._encrypt(request_bytes)),
+            number=number,
+        )
+        print(
+            f"{size:>5} bytes: legacy {t_legacy * 1e6 / number:8.2f} us"
+            f"  buffered {t_buffer * 1e6 / number:8.2f} us"
+        )
+
+
+if __name__ == "__main__":
+    profile()
@@ -0,0 +1,116 @@
+"""
+Compare the available json backends on large (hub/consumption) payloads.
+Run directly: python -m tests.profile_json_codec
+"""
+
+import json
+import timeit
+
+from custom_components.meross_lan.merossclient import (
+    JSON_BACKEND,
+    json_dumps_bytes,
+    json_loads,
+)
+from custom_components.meross_lan.merossclient.protocol import const as mc
+
+
+def _header(namespace: str):
+    return {
+        mc.KEY_MESSAGEID: "0123456789abcdef0123456789abcdef",
+        mc.KEY_NAMESPACE: namespace,
+        mc.KEY_METHOD: mc.METHOD_GETACK,
+        mc.KEY_PAYLOADVERSION: 1,
+        mc.KEY_FROM: "/appliance/0123456789abcdef0123456789abcdef/publish",
+        mc.KEY_TIMESTAMP: 1700000000,
+        mc.KEY_TIMESTAMPMS: 123,
+        mc.KEY_SIGN: "0123456789abcdef0123456789abcdef",
+    }
+
+
+def build_hub_all(subdevices: int = 16):
+    return {
+        mc.KEY_HEADER: _header("Appliance.System.All"),
+        mc.KEY_PAYLOAD: {
+            mc.KEY_ALL: {
+                mc.KEY_DIGEST: {
+                    mc.KEY_HUB: {
+                        mc.KEY_HUBID: 123456,
+                        mc.KEY_MODE: 0,
+                        mc.KEY_SUBDEVICE: [
+                            {
+                                mc.KEY_ID: f"{index:08X}",
+                                mc.KEY_STATUS: 1,
+                                mc.KEY_SCHEDULEBMODE: 6,
+                                mc.KEY_ONOFF: 1,
+                                mc.KEY_LASTACTIVETIME: 1700000000 - index,
+                                "mts100v3": {
+                                    mc.KEY_MODE: {mc.KEY_STATE: 3},
+                                    mc.KEY_TEMPERATURE: {
+                                        mc.KEY_ROOM: 215,
+                                        mc.KEY_CURRENTSET: 200,
+                                        mc.KEY_CUSTOM: 210,
+                                        mc.KEY_COMFORT: 240,
+                                        mc.KEY_ECONOMY: 170,
+                                        mc.KEY_AWAY: 120,
+                                        mc.KEY_MAX: 350,
+                                        mc.KEY_MIN: 50,
+                                        mc.KEY_HEATING: 1,
+                                        mc.KEY_OPENWINDOW: 0,
+                                    },
+                                },
+                            }
+                            for index in range(subdevices)
+                        ],
+                    }
+                }
+            }
+        },
+    }
+
+
+def build_consumptionx(days: int = 30):
+    return {
+        mc.KEY_HEADER: _header("Appliance.Control.ConsumptionX"),
+        mc.KEY_PAYLOAD: {
+            mc.KEY_CONSUMPTIONX: [
+                {
+                    mc.KEY_DATE: f"2024-01-{day + 1:02d}",
+                    mc.KEY_TIME: 1704067200 + day * 86400,
+                    mc.KEY_VALUE: 1234 + day,
+                }
+                for day in range(days)
+            ]
+        },
+    }
+
+
+def _stdlib_loads(data: bytes):
+    return json.loads(data)
+
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def profile(number: int = 2000):
+    print(f"active json backend: {JSON_BACKEND}")
+    for name, message in (
+        ("hub (16 subdevices)", build_hub_all()),
+        ("ConsumptionX (30 days)", build_consumptionx()),
+    ):
+        data = _stdlib_dumps(message)
+        print(f"{name}: {len(data)} bytes")
+        for label, loads, dumps in (
+            ("stdlib", _stdlib_loads, _stdlib_dumps),
+            (JSON_BACKEND, json_loads, json_dumps_bytes),
+        ):
+            t_loads = timeit.timeit(lambda: loads(data), number=number)
+            t_dumps = timeit.timeit(lambda: dumps(message), number=number)
+            print(
+                f"  {label:>8}: loads {t_loads * 1e6 / number:8.2f} us"
+                f"  dumps {t_dumps * 1e6 / number:8.2f} us"
+            )
+
+
+if __name__ == "__main__":
+    profile()
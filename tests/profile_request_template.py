@@ -0,0 +1,131 @@
+"""
+Compare building/serializing polling requests from scratch against the
+pre-serialized MerossRequestTemplate for a typical 10 namespaces poll
+(both as single requests and packed in an Appliance.Control.Multiple).
+Run directly: python -m tests.profile_request_template
+"""
+
+import timeit
+
+from custom_components.meross_lan.merossclient import json_dumps_bytes
+from custom_components.meross_lan.merossclient.protocol import (
+    const as mc,
+    namespaces as mn,
+)
+from custom_components.meross_lan.merossclient.protocol.message import (
+    MerossRequest,
+    MerossRequestTemplate,
+)
+
+from . import const as tc
+
+NAMESPACES = (
+    mn.Appliance_System_All,
+    mn.Appliance_Control_ToggleX,
+    mn.Appliance_Control_Electricity,
+    mn.Appliance_Control_ConsumptionX,
+    mn.Appliance_Control_Light,
+    mn.Appliance_System_Runtime,
+    mn.Appliance_System_DNDMode,
+    mn.Appliance_Config_OverTemp,
+    mn.Appliance_Control_TimerX,
+    mn.Appliance_Control_TriggerX,
+)
+FROM = "/appliance/0123456789abcdef0123456789abcdef/subscribe"
+TRIGGERSRC = "meross_lan"
+
+
+def _poll_legacy(requests):
+    for request in requests:
+        MerossRequest(*request, tc.MOCK_KEY, FROM, TRIGGERSRC).json_bytes()
+
+
+def _poll_template(templates):
+    for template in templates:
+        template.build(tc.MOCK_KEY).json_bytes()
+
+
+def _multiple_legacy(requests):
+    MerossRequest(
+        mn.Appliance_Control_Multiple.name,
+        mc.METHOD_SET,
+        {
+            mn.Appliance_Control_Multiple.key: [
+                {
+                    mc.KEY_HEADER: {
+                        mc.KEY_MESSAGEID: MerossRequest.generate_id(),
+                        mc.KEY_METHOD: request[1],
+                        mc.KEY_NAMESPACE: request[0],
+                    },
+                    mc.KEY_PAYLOAD: request[2],
+                }
+                for request in requests
+            ]
+        },
+        tc.MOCK_KEY,
+        FROM,
+        TRIGGERSRC,
+    ).json_bytes()
+
+
+def _multiple_template(requests, templates):
+    items = []
+    items_json = []
+    for request, template in zip(requests, templates):
+        messageid = MerossRequest.generate_id()
+        items.append(
+            {
+                mc.KEY_HEADER: {
+                    mc.KEY_MESSAGEID: messageid,
+                    mc.KEY_METHOD: request[1],
+                    mc.KEY_NAMESPACE: request[0],
+                },
+                mc.KEY_PAYLOAD: request[2],
+            }
+        )
+        items_json.append(template.multiple_item_json(messageid))
+    payload = {mn.Appliance_Control_Multiple.key: items}
+    MerossRequestTemplate(
+        mn.Appliance_Control_Multiple.name,
+        mc.METHOD_SET,
+        payload,
+        FROM,
+        TRIGGERSRC,
+        f'{{"{mn.Appliance_Control_Multiple.key}":[{",".join(items_json)}]}}',
+    ).build(tc.MOCK_KEY).json_bytes()
+
+
+def profile(number: int = 5000):
+    requests = [ns.request_get for ns in NAMESPACES]
+    templates = [
+        MerossRequestTemplate(*request, FROM, TRIGGERSRC) for request in requests
+    ]
+    # sanity check: templates must produce the same json structure
+    for request, template in zip(requests, templates):
+        legacy = MerossRequest(*request, tc.MOCK_KEY, FROM, TRIGGERSRC)
+        built = template.build(tc.MOCK_KEY)
+        assert built.json_bytes() == json_dumps_bytes(built)
+        assert list(built[mc.KEY_HEADER]) == list(legacy[mc.KEY_HEADER])
+
+    for label, legacy, optimized in (
+        (
+            "10 single requests",
+            lambda: _poll_legacy(requests),
+            lambda: _poll_template(templates),
+        ),
+        (
+            "1 multiple (10 requests)",
+            lambda: _multiple_legacy(requests),
+            lambda: _multiple_template(requests, templates),
+        ),
+    ):
+        t_legacy = timeit.timeit(legacy, number=number)
+        t_template = timeit.timeit(optimized, number=number)
+        print(
+            f"{label}: legacy {number / t_legacy:9.0f} polls/s"
+            f"  template {number / t_template:9.0f} polls/s"
+        )
+
+
+if __name__ == "__main__":
+    profile()
@@ -0,0 +1,368 @@
+"""Test for Device request/response flows"""
+
+import asyncio
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+from unittest import mock
+
+from custom_components.meross_lan import const as mlc
+from custom_components.meross_lan.helpers.device import Device
+from custom_components.meross_lan.merossclient import json_dumps, json_loads
+from custom_components.meross_lan.merossclient.protocol import (
+    const as mc,
+    namespaces as mn,
+)
+from custom_components.meross_lan.merossclient.protocol.message import (
+    MerossResponse,
+    build_message,
+)
+
+from tests import helpers
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+
+async def test_command_batch(request, hass: "HomeAssistant"):
+    """
+    Tests SET commands issued in the same time window are packed in a single
+    Appliance.Control.Multiple and that the SETACK(s) are dispatched to the
+    respective callers by messageId (falling back to single requests when not acked).
+    """
+    async with helpers.DeviceContext(
+        request, hass, mc.TYPE_MSS310, data={mlc.CONF_COMMAND_BATCH_WINDOW: 100}
+    ) as context:
+        device = await context.perform_coldstart()
+        assert device.multiple_max and device._command_batch_window
+
+        _async_request = Device._async_request
+        multiple_messageids: list[str] = []
+        multiple_patch = None
+
+        async def _async_request_patched(
+            _self: Device, namespace: str, method: str, payload
+        ):
+            if namespace == mn.Appliance_Control_Multiple.name:
+                multiple_messageids[:] = [
+                    message[mc.KEY_HEADER][mc.KEY_MESSAGEID]
+                    for message in payload[mc.KEY_MULTIPLE]
+                ]
+                response = await _async_request(_self, namespace, method, payload)
+                if response and multiple_patch:
+                    multiple_patch(response[mc.KEY_PAYLOAD][mc.KEY_MULTIPLE])
+                return response
+            return await _async_request(_self, namespace, method, payload)
+
+        ns = mn.Appliance_Control_ToggleX
+
+        async def _async_send_commands(count: int):
+            tasks = [
+                hass.async_create_task(
+                    device.async_request(
+                        ns.name,
+                        mc.METHOD_SET,
+                        {ns.key: {mc.KEY_CHANNEL: 0, mc.KEY_ONOFF: i % 2}},
+                    )
+                )
+                for i in range(count)
+            ]
+            await context.time_mock.async_tick(device._command_batch_window)
+            return [task.result() for task in tasks]
+
+        def _get_messageid(response):
+            assert response[mc.KEY_HEADER][mc.KEY_METHOD] == mc.METHOD_SETACK
+            return response[mc.KEY_HEADER][mc.KEY_MESSAGEID]
+
+        with mock.patch.object(
+            Device,
+            "_async_request",
+            autospec=True,
+            side_effect=_async_request_patched,
+        ) as _async_request_mock:
+
+            def _pop_requested_namespaces():
+                namespaces = [
+                    call.args[1] for call in _async_request_mock.call_args_list
+                ]
+                _async_request_mock.reset_mock()
+                return namespaces
+
+            # plain batching
+            commands_batched_count = device.commands_batched_count
+            responses = await _async_send_commands(2)
+            assert _pop_requested_namespaces() == [mn.Appliance_Control_Multiple.name]
+            assert [_get_messageid(r) for r in responses] == multiple_messageids
+            assert device.commands_batched_count == commands_batched_count + 2
+
+            # acks are matched by messageId whatever their order
+            multiple_patch = list.reverse
+            responses = await _async_send_commands(3)
+            assert _pop_requested_namespaces() == [mn.Appliance_Control_Multiple.name]
+            assert [_get_messageid(r) for r in responses] == multiple_messageids
+
+            # missing acks fall back to single requests
+            multiple_patch = list.pop
+            responses = await _async_send_commands(2)
+            assert _pop_requested_namespaces() == [
+                mn.Appliance_Control_Multiple.name,
+                ns.name,
+            ]
+            assert _get_messageid(responses[0]) == multiple_messageids[0]
+            assert _get_messageid(responses[1]) != multiple_messageids[1]
+
+            # cancelling the batch (i.e. at shutdown) releases every caller
+            def _cancel(multiple):
+                raise asyncio.CancelledError()
+
+            multiple_patch = _cancel
+            responses = await _async_send_commands(2)
+            assert responses == [None, None]
+
+
+async def test_request_single_flight(request, hass: "HomeAssistant"):
+    """
+    Tests concurrent GET(s) for the same (polling) request share a single
+    transaction and that cancelling any of the callers doesn't affect the others.
+    """
+    async with helpers.DeviceContext(request, hass, mc.TYPE_MSS310) as context:
+        device = await context.perform_coldstart()
+
+        _async_request = Device._async_request
+        release = hass.loop.create_future()
+
+        async def _async_request_patched(
+            _self: Device, namespace: str, method: str, payload
+        ):
+            await release
+            return await _async_request(_self, namespace, method, payload)
+
+        request_get = mn.Appliance_System_All.request_get
+
+        async def _async_start_requests(*requests):
+            tasks = [
+                hass.async_create_task(device.async_request(*request))
+                for request in requests
+            ]
+            await asyncio.sleep(0)
+            return tasks
+
+        with mock.patch.object(
+            Device,
+            "_async_request",
+            autospec=True,
+            side_effect=_async_request_patched,
+        ) as _async_request_mock:
+            requests_coalesced_count = device.requests_coalesced_count
+            tasks = await _async_start_requests(
+                request_get,
+                request_get,
+                # an equal payload (but not the same object) is not coalesced
+                (request_get[0], request_get[1], dict(request_get[2])),
+            )
+            assert _async_request_mock.call_count == 2
+            assert device.requests_coalesced_count == requests_coalesced_count + 1
+            release.set_result(None)
+            await hass.async_block_till_done()
+            assert tasks[0].result() and (tasks[1].result() is tasks[0].result())
+            assert tasks[2].result() and (tasks[2].result() is not tasks[0].result())
+            assert not device._requests_inflight
+
+            # cancelling a follower doesn't affect the leader
+            release = hass.loop.create_future()
+            tasks = await _async_start_requests(request_get, request_get)
+            tasks[1].cancel()
+            await asyncio.sleep(0)
+            release.set_result(None)
+            await hass.async_block_till_done()
+            assert tasks[1].cancelled()
+            assert tasks[0].result()
+
+            # cancelling the leader releases the followers (with no response)
+            release = hass.loop.create_future()
+            tasks = await _async_start_requests(request_get, request_get)
+            tasks[0].cancel()
+            await hass.async_block_till_done()
+            assert tasks[0].cancelled()
+            assert tasks[1].result() is None
+            assert not device._requests_inflight
+            release.cancel()
+
+
+async def test_poll_parallel(request, hass: "HomeAssistant"):
+    """
+    Tests the replies to a parallel poll are processed in the handlers order:
+    replies of a slot are held back only until all of the earlier slots are done.
+    """
+    async with helpers.DeviceContext(request, hass, mc.TYPE_MSS310) as context:
+        device = await context.perform_coldstart()
+
+        slots = 3
+        futures = [hass.loop.create_future() for _ in range(slots)]
+        replies = [
+            MerossResponse(
+                json_dumps(
+                    build_message(
+                        mn.Appliance_System_All.name,
+                        mc.METHOD_GETACK,
+                        {},
+                        device.key,
+                        messageid=f"{index:032x}",
+                    )
+                )
+            )
+            for index in range(slots)
+        ]
+        for reply in replies:
+            reply.messageid = reply[mc.KEY_HEADER][mc.KEY_MESSAGEID]
+
+        async def _polling_strategy(handler):
+            # register the request like async_mqtt_request_raw does
+            device._poll_messageids[replies[handler.index].messageid] = (
+                device._poll_slots[asyncio.current_task()]  # type: ignore
+            )
+            await futures[handler.index]
+
+        handlers = [
+            SimpleNamespace(
+                index=index,
+                ns=SimpleNamespace(name=f"handler_{index}"),
+                polling_strategy=_polling_strategy,
+            )
+            for index in range(slots)
+        ]
+
+        async def _async_spin():
+            for _ in range(5):
+                await asyncio.sleep(0)
+
+        # fake an MQTT (local) link so that mqtt_receive can be fed
+        device._mqtt_connected = device._mqtt_active = mock.MagicMock()
+        try:
+            with mock.patch.object(Device, "_receive", autospec=True) as _receive_mock:
+
+                def _received():
+                    return [
+                        call.args[2].messageid for call in _receive_mock.call_args_list
+                    ]
+
+                poll_task = hass.async_create_task(
+                    device._async_poll_parallel(handlers)  # type: ignore
+                )
+                await _async_spin()
+                device.mqtt_receive(replies[2])
+                assert _received() == []
+                # replies to the first running slot are processed straight away
+                device.mqtt_receive(replies[0])
+                assert _received() == [replies[0].messageid]
+                device.mqtt_receive(replies[1])
+                futures[2].set_result(None)
+                await _async_spin()
+                assert _received() == [replies[0].messageid]
+                # slot 0 done: slot 1 replies are replayed (slot 2 still waits for 1)
+                futures[0].set_result(None)
+                await _async_spin()
+                assert _received() == [replies[0].messageid, replies[1].messageid]
+                futures[1].set_result(None)
+                await poll_task
+                assert _received() == [reply.messageid for reply in replies]
+                assert not (device._poll_slots or device._poll_received)
+        finally:
+            device._mqtt_connected = device._mqtt_active = None
+
+
+async def test_request_template_invalidate(request, hass: "HomeAssistant"):
+    """
+    Tests polling requests are built from the (cached) template and that changing
+    the polling payload in place (polling_request_add_channel) invalidates it.
+    """
+    async with helpers.DeviceContext(request, hass, mc.TYPE_MSS310) as context:
+        device = await context.perform_coldstart()
+        ns = mn.Appliance_Control_Fan
+        handler = device.get_handler(ns)
+
+        def _build_polling_request():
+            device._get_request_template(handler.polling_request)
+            return device._build_request(*handler.polling_request)
+
+        def _get_payload(request):
+            return json_loads(request.json())[mc.KEY_PAYLOAD]
+
+        polling_request = _build_polling_request()
+        assert polling_request._json_str and _get_payload(polling_request) == {
+            ns.key: []
+        }
+        handler.polling_request_add_channel(1)
+        assert _get_payload(_build_polling_request()) == {ns.key: [{mc.KEY_CHANNEL: 1}]}
+        handler.polling_request_add_channel(2)
+        assert _get_payload(_build_polling_request()) == {
+            ns.key: [{mc.KEY_CHANNEL: 1}, {mc.KEY_CHANNEL: 2}]
+        }
+
+
+async def test_payload_fingerprint(request, hass: "HomeAssistant"):
+    """
+    Tests GETACK(s) carrying the same (raw) payload as the last parsed one are
+    not dispatched and that anything which could alter the entities state
+    out of band forces a full parse.
+    """
+    async with helpers.DeviceContext(request, hass, mc.TYPE_MSS310) as context:
+        device = await context.perform_coldstart()
+        ns = mn.Appliance_Control_ToggleX
+        handler = device.namespace_handlers[ns.name]
+        assert handler.payload_fingerprints is not None
+        handler.payload_fingerprints_reset()
+        handler_saved = handler.handler
+        handler.handler = handler_mock = mock.MagicMock()
+
+        def _is_dispatched(method: str, onoff: int = 0, raw: bool = True):
+            message = build_message(
+                ns.name,
+                method,
+                {ns.key: {mc.KEY_CHANNEL: 0, mc.KEY_ONOFF: onoff}},
+                device.key,
+                from_=mc.TOPIC_RESPONSE.format(device.id),
+            )
+            call_count = handler_mock.call_count
+            device._handle(
+                message[mc.KEY_HEADER],
+                message[mc.KEY_PAYLOAD],
+                json_dumps(message) if raw else None,
+            )
+            return handler_mock.call_count > call_count
+
+        try:
+            parse_skipped_count = handler.parse_skipped_count
+            assert _is_dispatched(mc.METHOD_GETACK)
+            assert not _is_dispatched(mc.METHOD_GETACK)
+            assert handler.parse_skipped_count == parse_skipped_count + 1
+            assert _is_dispatched(mc.METHOD_GETACK, 1)
+            assert not _is_dispatched(mc.METHOD_GETACK, 1)
+            # no raw message: no fingerprint
+            assert _is_dispatched(mc.METHOD_GETACK, 1, False)
+            # a PUSH is always parsed and invalidates the fingerprint
+            assert _is_dispatched(mc.METHOD_PUSH, 1)
+            assert _is_dispatched(mc.METHOD_GETACK, 1)
+            assert not _is_dispatched(mc.METHOD_GETACK, 1)
+            # a SETACK could mean entities optimistic updates
+            device._handle(
+                {
+                    mc.KEY_NAMESPACE: ns.name,
+                    mc.KEY_METHOD: mc.METHOD_SETACK,
+                    mc.KEY_MESSAGEID: "",
+                },
+                {},
+            )
+            assert _is_dispatched(mc.METHOD_GETACK, 1)
+            assert not _is_dispatched(mc.METHOD_GETACK, 1)
+            # a full parse is anyway due every PARAM_PAYLOAD_FINGERPRINT_PERIOD
+            handler.payload_fingerprint_epoch -= (
+                mlc.PARAM_PAYLOAD_FINGERPRINT_PERIOD + 1
+            )
+            assert _is_dispatched(mc.METHOD_GETACK, 1)
+            assert not _is_dispatched(mc.METHOD_GETACK, 1)
+            # going offline (we might have lost anything)
+            device._set_offline()
+            assert not handler.payload_fingerprints
+            assert _is_dispatched(mc.METHOD_GETACK, 1)
+        finally:
+            handler.handler = handler_saved
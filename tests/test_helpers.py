@@ -1,7 +1,13 @@
 """Test the .helpers module"""
 
-from custom_components.meross_lan.helpers import obfuscate
-from custom_components.meross_lan.merossclient.protocol import const as mc
+from custom_components.meross_lan import const as mlc
+from custom_components.meross_lan.helpers import obfuscate, polling
+from custom_components.meross_lan.helpers.meross_profile import MQTTShardRing
+from custom_components.meross_lan.merossclient.protocol import (
+    const as mc,
+    namespaces as mn,
+)
+from custom_components.meross_lan.merossclient.protocol.message import MerossRequest
 
 
 def test_obfuscated_key():
@@ -27,3 +33,230 @@ def test_obfuscated_key():
             assert (
                 obfuscate.obfuscated_dict({key: src})[key] == result
             ), f"{key}: {src}"
+
+
+def test_pack_multiple_requests():
+    """
+    Verify the packing of ns_multiple batches
+    """
+
+    class _Handler:
+        def __init__(self, namespace: str, size: int, epoch_next: float):
+            self.polling_request = (namespace, mc.METHOD_GET, {})
+            self.polling_response_size = size
+            self.polling_epoch_next = epoch_next
+
+    requests = [
+        (("A", mc.METHOD_GET, {}), 800),
+        (("B", mc.METHOD_GET, {}), 700),
+        (("C", mc.METHOD_GET, {}), 1500),
+        (("D", mc.METHOD_GET, {}), 300),
+        (("E", mc.METHOD_GET, {}), 200),
+        (("F", mc.METHOD_GET, {}), 5000),  # too big: goes alone
+    ]
+    lazy_queue = polling.LazyPollQueue()
+    lazy_queue.push(_Handler("L1", 500, 10))
+    lazy_queue.push(_Handler("L2", 100, 5))
+    lazy_queue.push(_Handler("L3", 2000, 1))  # stalest but never fits
+    batches = polling.pack_multiple_requests(requests, lazy_queue, 4, 2400)
+    assert len(batches) == 3
+    packed = [request[0] for batch in batches for request in batch.requests]
+    assert sorted(packed) == ["A", "B", "C", "D", "E", "F", "L1", "L2"]
+    for batch in batches:
+        assert len(batch.requests) <= 4
+        assert (batch.size <= 2400) or (len(batch.requests) == 1)
+        for handler in batch.lazy_handlers:
+            assert handler.polling_request in batch.requests
+    assert len(lazy_queue) == 1
+
+
+def test_lazypoll_queue():
+    """
+    Verify the LazyPollQueue ordering and size querying
+    """
+
+    class _Handler:
+        def __init__(self, size: int, epoch_next: float):
+            self.polling_response_size = size
+            self.polling_epoch_next = epoch_next
+
+    handlers = [_Handler(100 * i + 50, (i * 7) % 11) for i in range(1, 30)]
+    queue = polling.LazyPollQueue()
+    for handler in handlers:
+        queue.push(handler)
+    assert len(queue) == len(handlers)
+    removed = handlers[5]
+    assert queue.remove(removed)
+    assert not queue.remove(removed)
+    # oldest fitting in 1000 bytes
+    handler = queue.pop_fit(1000)
+    assert handler is min(
+        (h for h in handlers if h.polling_response_size <= 1000 and h is not removed),
+        key=lambda h: h.polling_epoch_next,
+    )
+    assert handler not in queue
+    assert queue.pop_fit(100) is None
+    # re-pushing updates the priority
+    handlers[-1].polling_epoch_next = -1
+    queue.push(handlers[-1])
+    assert queue.pop() is handlers[-1]
+    result = []
+    while handler := queue.pop():
+        result.append(handler.polling_epoch_next)
+    assert result == sorted(result)
+    assert not queue
+
+
+def test_push_tracker():
+    ns = mn.Appliance_Control_ToggleX
+    push_tracker = polling.PushTracker(ns)
+
+    def _payload(onoff_0: int, onoff_1: int):
+        return {
+            ns.key: [
+                {mc.KEY_CHANNEL: 0, mc.KEY_ONOFF: onoff_0, mc.KEY_LMTIME: 0},
+                {mc.KEY_CHANNEL: 1, mc.KEY_ONOFF: onoff_1, mc.KEY_LMTIME: 0},
+            ]
+        }
+
+    # polls without any push don't build confidence
+    push_tracker.verify(_payload(0, 0), 1)
+    assert push_tracker.confidence == 0
+    # neither do polls repeating an 'old' push
+    push_tracker.push({ns.key: {mc.KEY_CHANNEL: 1, mc.KEY_ONOFF: 0}}, 1)
+    for epoch in range(1, 20):
+        push_tracker.verify(_payload(0, 0), epoch)
+    assert push_tracker.verify_hit_count == 1
+    # pushes (even partial) confirmed by the following polls
+    epoch = 20
+    while not push_tracker.is_reliable(epoch):
+        push_tracker.push({ns.key: {mc.KEY_CHANNEL: 1, mc.KEY_ONOFF: epoch % 2}}, epoch)
+        push_tracker.verify(_payload(0, epoch % 2), epoch)
+        epoch += 1
+        assert epoch < 40
+    assert push_tracker.verify_miss_count == 0
+    # forced verification
+    assert not push_tracker.is_reliable(epoch + mlc.PARAM_PUSH_VERIFY_PERIOD)
+    assert not push_tracker.is_reliable(epoch + push_tracker.PUSH_SILENCE_MIN)
+    # a poll revealing a missed push resets confidence
+    push_tracker.verify(_payload(1, epoch % 2), epoch)
+    assert push_tracker.verify_miss_count == 1
+    assert not push_tracker.is_reliable(epoch)
+
+
+def test_circuit_breaker():
+    circuit_breaker = polling.CircuitBreaker()
+    epoch = 0
+    for _ in range(mlc.PARAM_CIRCUIT_BREAKER_THRESHOLD - 1):
+        circuit_breaker.failure(epoch)
+        assert circuit_breaker.allow(epoch)
+    circuit_breaker.failure(epoch)
+    assert circuit_breaker.is_open and (circuit_breaker.trips == 1)
+    assert not circuit_breaker.allow(epoch + mlc.PARAM_CIRCUIT_BREAKER_PERIOD_MIN - 1)
+    # backoff grows exponentially (bounded) on subsequent failed probes
+    period = mlc.PARAM_CIRCUIT_BREAKER_PERIOD_MIN
+    while period < mlc.PARAM_CIRCUIT_BREAKER_PERIOD_MAX:
+        epoch = circuit_breaker.retry_epoch
+        assert circuit_breaker.allow(epoch)
+        circuit_breaker.failure(epoch)
+        period = min(period * 2, mlc.PARAM_CIRCUIT_BREAKER_PERIOD_MAX)
+        assert circuit_breaker.retry_epoch == epoch + period
+    circuit_breaker.success()
+    assert not circuit_breaker.is_open and circuit_breaker.allow(epoch)
+
+
+def test_mqtt_budget():
+    mqtt_budget = polling.MQTTBudget()
+    state = mqtt_budget.get_priority(mn.Appliance_Control_ToggleX.name, mc.METHOD_GET)
+    diagnostic = mqtt_budget.get_priority(
+        mn.Appliance_System_Runtime.name, mc.METHOD_GET
+    )
+    assert state == polling.MQTTBudget.PRIORITY_STATE
+    assert diagnostic == polling.MQTTBudget.PRIORITY_DIAGNOSTIC
+    assert (
+        mqtt_budget.get_priority(mn.Appliance_Control_ToggleX.name, mc.METHOD_SET)
+        == polling.MQTTBudget.PRIORITY_COMMAND
+    )
+    # NS_MULTIPLE batches are classified by their packed requests
+    assert (
+        mqtt_budget.get_multiple_priority(
+            (
+                mn.Appliance_System_Runtime.request_get,
+                mn.Appliance_Control_ToggleX.request_get,
+            )
+        )
+        == state
+    )
+    multiple_request = MerossRequest(
+        mn.Appliance_Control_Multiple.name,
+        mc.METHOD_SET,
+        {
+            mn.Appliance_Control_Multiple.key: [
+                {
+                    mc.KEY_HEADER: {
+                        mc.KEY_MESSAGEID: "",
+                        mc.KEY_METHOD: mc.METHOD_GET,
+                        mc.KEY_NAMESPACE: mn.Appliance_System_Runtime.name,
+                    },
+                    mc.KEY_PAYLOAD: {},
+                }
+            ]
+        },
+        "",
+    )
+    assert mqtt_budget.get_message_priority(multiple_request) == diagnostic
+
+    poll_quota = mqtt_budget.quota - mqtt_budget.command_reserve
+    epoch = 0
+    # lower priorities are denied earlier
+    while mqtt_budget.allow(diagnostic, epoch):
+        mqtt_budget.record(diagnostic, epoch)
+    assert mqtt_budget.denied[diagnostic] == 1
+    diagnostic_count = mqtt_budget.counts[diagnostic]
+    assert mqtt_budget.used(epoch) == diagnostic_count
+    assert (
+        mqtt_budget.used(epoch) >= poll_quota * mqtt_budget.PRIORITY_SHARE[diagnostic]
+    )
+    assert mqtt_budget.allow(state, epoch)
+    epoch += 10
+    while mqtt_budget.allow(state, epoch):
+        mqtt_budget.record(state, epoch)
+    assert mqtt_budget.used(epoch) == poll_quota
+    # commands are never checked but still accounted
+    mqtt_budget.record(polling.MQTTBudget.PRIORITY_COMMAND, epoch)
+    assert mqtt_budget.used(epoch) == poll_quota + 1
+    # the window slides (expiring the polls recorded at epoch 0)
+    assert mqtt_budget.used(mqtt_budget.WINDOW) == poll_quota + 1 - diagnostic_count
+    assert mqtt_budget.counts[diagnostic] == 0
+    assert mqtt_budget.allow(diagnostic, mqtt_budget.WINDOW + 10)
+    assert mqtt_budget.used(mqtt_budget.WINDOW + 10) == 0
+
+
+def test_transport_score():
+    fast = polling.TransportScore()
+    slow = polling.TransportScore()
+    for _ in range(polling.TransportScore.SAMPLES_MIN):
+        fast.success(0.02)
+        slow.success(0.4)
+    assert fast.is_valid and slow.is_valid
+    assert fast.cost < slow.cost
+    # an unreliable transport loses its advantage
+    for _ in range(3):
+        fast.failure()
+    assert fast.cost > slow.cost
+
+
+def test_mqtt_shard_ring():
+    device_ids = [f"{index:032x}" for index in range(400)]
+    assert {MQTTShardRing(1).get_shard(device_id) for device_id in device_ids} == {0}
+    ring_3 = MQTTShardRing(3)
+    ring_4 = MQTTShardRing(4)
+    shards_3 = [ring_3.get_shard(device_id) for device_id in device_ids]
+    shards_4 = [ring_4.get_shard(device_id) for device_id in device_ids]
+    # every shard gets a fair share of the devices
+    for shard in range(4):
+        assert shards_4.count(shard) > len(device_ids) / 8
+    # adding a shard only moves devices to the new one
+    moved = [(s3, s4) for s3, s4 in zip(shards_3, shards_4) if s3 != s4]
+    assert all(s4 == 3 for _, s4 in moved)
+    assert len(moved) < len(device_ids) / 2
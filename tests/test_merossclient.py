@@ -1,8 +1,37 @@
 """Test the merossclient module (low level device/cloud api)"""
 
+import asyncio
+from unittest import mock
+
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
-from custom_components.meross_lan.merossclient import cloudapi
+from custom_components.meross_lan.merossclient import (
+    cloudapi,
+    json_dumps,
+    json_dumps_bytes,
+    json_loads,
+)
+from custom_components.meross_lan.merossclient.httpclient import (
+    MerossHttpClient,
+    RTTHistogram,
+)
+from custom_components.meross_lan.merossclient.mqttclient import _MerossMQTTClient
+from custom_components.meross_lan.merossclient.protocol import (
+    const as mc,
+    namespaces as mn,
+)
+from custom_components.meross_lan.merossclient.protocol.message import (
+    MerossRequest,
+    MerossRequestTemplate,
+    MerossResponse,
+    build_message,
+    compute_message_signature,
+    get_message_namespace_raw,
+    get_message_payload_raw,
+    get_message_uuid,
+    get_message_uuid_raw,
+    salvage_multiple_response,
+)
 
 from . import const as tc, helpers
 
@@ -11,7 +40,253 @@ def test_merossclient_module():
     """
     Test utilities defined in merossclient package/module
     """
-    pass
+    # trailing data (padding/garbage) after the json object is tolerated
+    assert json_loads('{"a":1}\x00\x00') == {"a": 1}
+    assert json_loads(b'{"a":1}\x00\x00') == {"a": 1}
+    assert json_loads(b'{"a":1}') == {"a": 1}
+
+
+def test_request_template():
+    """
+    Requests built from a MerossRequestTemplate must match the ones fully
+    built/encoded by MerossRequest (but for the per-message header fields)
+    """
+    from_ = mc.TOPIC_RESPONSE.format(tc.MOCK_DEVICE_UUID)
+    header_volatile = (mc.KEY_MESSAGEID, mc.KEY_TIMESTAMP, mc.KEY_SIGN)
+    for request in (
+        mn.Appliance_System_All.request_get,
+        mn.Appliance_Control_ToggleX.request_default,
+        (
+            mn.Appliance_Control_Fan.name,
+            mc.METHOD_GET,
+            {mn.Appliance_Control_Fan.key: [{mc.KEY_CHANNEL: 1}]},
+        ),
+    ):
+        template = MerossRequestTemplate(*request, from_, "meross_lan")
+        built_request = template.build(tc.MOCK_KEY)
+        reference_request = MerossRequest(*request, tc.MOCK_KEY, from_, "meross_lan")
+        assert built_request.namespace == request[0]
+        assert built_request.method == request[1]
+        assert built_request.payload is request[2]
+        built_message = json_loads(built_request.json())
+        reference_message = json_loads(reference_request.json())
+        # the serialized form must match the dict
+        assert built_message == built_request
+        header = built_message[mc.KEY_HEADER]
+        assert header[mc.KEY_MESSAGEID] == built_request.messageid
+        assert header[mc.KEY_SIGN] == compute_message_signature(
+            header[mc.KEY_MESSAGEID], tc.MOCK_KEY, header[mc.KEY_TIMESTAMP]
+        )
+        for message in (built_message, reference_message):
+            for key in header_volatile:
+                message[mc.KEY_HEADER].pop(key)
+        assert built_message == reference_message
+        assert json_loads(template.multiple_item_json("0" * 32)) == {
+            mc.KEY_HEADER: {
+                mc.KEY_MESSAGEID: "0" * 32,
+                mc.KEY_METHOD: request[1],
+                mc.KEY_NAMESPACE: request[0],
+            },
+            mc.KEY_PAYLOAD: request[2],
+        }
+
+
+def test_salvage_multiple_response():
+    """
+    Test recovering a truncated Appliance.Control.Multiple response
+    """
+    messages = [
+        {
+            mc.KEY_HEADER: {mc.KEY_NAMESPACE: f"Appliance.Test.{i}"},
+            # include some json 'syntax' in strings to trick the scanner
+            mc.KEY_PAYLOAD: {"test": '{"header":[,]}' * i},
+        }
+        for i in range(4)
+    ]
+    response_text = json_dumps(
+        {
+            mc.KEY_HEADER: {
+                mc.KEY_NAMESPACE: mn.Appliance_Control_Multiple.name,
+                mc.KEY_METHOD: mc.METHOD_SETACK,
+            },
+            mc.KEY_PAYLOAD: {mc.KEY_MULTIPLE: messages},
+        }
+    )
+    messages_end = len(response_text) - 3  # strip "]}}"
+    first_message = json_dumps(messages[0])
+    first_message_end = response_text.find(first_message) + len(first_message)
+    for truncate_pos in range(messages_end, 0, -1):
+        truncated_text = response_text[:truncate_pos]
+        response, overflow_pos = salvage_multiple_response(truncated_text)
+        assert overflow_pos == truncate_pos
+        if response:
+            multiple = response[mc.KEY_PAYLOAD][mc.KEY_MULTIPLE]
+            assert multiple
+            # every salvaged message must be complete
+            assert multiple == messages[: len(multiple)]
+        else:
+            # nothing salvageable only when the first message is truncated
+            assert truncate_pos < first_message_end
+
+    response, _ = salvage_multiple_response(response_text[:messages_end])
+    assert response and len(response[mc.KEY_PAYLOAD][mc.KEY_MULTIPLE]) == 4
+
+
+def test_multiple_response_raw():
+    """
+    Test splitting the raw sub-messages of an Appliance.Control.Multiple response
+    """
+    messages = [
+        {
+            mc.KEY_HEADER: {mc.KEY_NAMESPACE: f"Appliance.Test.{i}"},
+            mc.KEY_PAYLOAD: {"test": [{"value": "]" * i}] * i},
+        }
+        for i in range(4)
+    ]
+    response_text = json_dumps(
+        {
+            mc.KEY_HEADER: {
+                mc.KEY_NAMESPACE: mn.Appliance_Control_Multiple.name,
+                mc.KEY_METHOD: mc.METHOD_GETACK,
+            },
+            mc.KEY_PAYLOAD: {mc.KEY_MULTIPLE: messages},
+        }
+    )
+    messages_raw = [json_dumps(message) for message in messages]
+    assert MerossResponse(response_text).json_multiple_raw() == messages_raw
+    response_bytes = response_text.encode("utf-8")
+    assert MerossResponse(response_bytes).json_multiple_raw() == [
+        message_raw.encode("utf-8") for message_raw in messages_raw
+    ]
+    for message, message_raw in zip(messages, messages_raw):
+        assert get_message_payload_raw(message_raw) == json_dumps(
+            message[mc.KEY_PAYLOAD]
+        )
+    # payload first: not supported
+    assert get_message_payload_raw('{"payload":{},"header":{}}') is None
+
+
+def test_message_raw_routing():
+    """
+    Test extracting uuid/namespace from not yet decoded messages
+    """
+    uuid = "0123456789abcdef0123456789abcdef"
+    message = build_message(
+        mn.Appliance_Control_ToggleX.name,
+        mc.METHOD_PUSH,
+        {mc.KEY_TOGGLEX: {mc.KEY_CHANNEL: 0, mc.KEY_ONOFF: 1}},
+        tc.MOCK_KEY,
+        from_=mc.TOPIC_RESPONSE.format(uuid),
+    )
+    payload_raw = json_dumps_bytes(message)
+    assert get_message_uuid(message[mc.KEY_HEADER]) == uuid
+    # local brokers: uuid from the topic
+    assert get_message_uuid_raw(mc.TOPIC_RESPONSE.format(uuid), b"") == uuid
+    # cloud brokers: uuid from the raw header
+    assert get_message_uuid_raw("/app/12345/subscribe", payload_raw) == uuid
+    assert get_message_uuid_raw("/app/12345/subscribe", payload_raw.decode()) == uuid
+    assert get_message_namespace_raw(payload_raw) == mn.Appliance_Control_ToggleX.name
+    # not a device message: fallback to decoding
+    message = build_message(
+        mn.Appliance_System_Online.name, mc.METHOD_PUSH, {}, tc.MOCK_KEY
+    )
+    assert get_message_uuid_raw("/app/12345/subscribe", json_dumps(message)) is None
+
+
+def test_httpclient_adaptive_timeouts():
+    """
+    Test the RTT histogram driving MerossHttpClient timeouts
+    """
+    histogram = RTTHistogram()
+    histogram.add(0.01)
+    assert histogram.percentile(0.95) is None  # not enough samples
+    for _ in range(RTTHistogram.SAMPLES_MIN):
+        histogram.add(0.03)
+    assert histogram.percentile(0.5) == 0.05
+    histogram.add(100)
+    assert histogram.percentile(1) is None  # overflow bucket
+
+    http = MerossHttpClient("127.0.0.1", session=object())  # type: ignore
+    timeout = http.timeout
+    assert http.get_timeouts() == (1, timeout.connect, timeout.total)
+    for _ in range(RTTHistogram.SAMPLES_MIN):
+        http.rtt_connect.add(0.02)
+        http.rtt_total.add(0.04)
+    connect, connect_max, total = http.get_timeouts()
+    assert connect == MerossHttpClient.RTT_TIMEOUT_MIN
+    assert connect <= connect_max < timeout.connect  # type: ignore
+    assert connect_max <= total < timeout.total  # type: ignore
+    # big responses get more time than the (small) polls dominating the stats
+    assert total < http.get_timeouts(4096)[2] <= timeout.total  # type: ignore
+    # slow hosts are always bounded by the configured timeouts
+    for _ in range(RTTHistogram.SAMPLES_MAX):
+        http.rtt_connect.add(6)
+        http.rtt_total.add(6)
+    assert http.get_timeouts() == (timeout.connect, timeout.connect, timeout.total)
+    # changing host resets the statistics
+    http.host = "127.0.0.2"
+    assert http.get_timeouts() == (1, timeout.connect, timeout.total)
+
+
+async def test_mqttclient_rx_drain():
+    """
+    Tests the inbound queue of the MQTT client: messages are processed in
+    batches (one loop wakeup x burst), overflow is dropped and failures
+    (exceptions or cancellations) in a message don't stall the others.
+    """
+    loop = asyncio.get_running_loop()
+    received = []
+
+    class _MQTTClient(_MerossMQTTClient):
+        async def async_mqtt_message(self, msg):
+            if msg == "raise":
+                raise Exception("raise")
+            if msg == "cancel":
+                raise asyncio.CancelledError()
+            if msg == "suspend":
+                await asyncio.sleep(0)
+            received.append(msg)
+
+    mqtt_client = _MQTTClient("test", [], loop=loop)
+    rx_stats = mqtt_client.rx_stats
+
+    async def _async_drain():
+        while mqtt_client._rx_queue or mqtt_client._rx_scheduled:
+            await asyncio.sleep(0)
+
+    # a burst is drained in batches
+    burst = mqtt_client.RX_BATCH_MAX + 10
+    for index in range(burst):
+        mqtt_client._mqttc_message_loop(None, None, index)
+    await asyncio.sleep(0)
+    assert received == list(range(mqtt_client.RX_BATCH_MAX))
+    assert rx_stats.drains == 1 and rx_stats.depth_max == burst
+    await _async_drain()
+    assert received == list(range(burst))
+    assert rx_stats.drains == 2 and rx_stats.received == burst
+
+    # overflow
+    received.clear()
+    with mock.patch.object(_MQTTClient, "RX_QUEUE_MAX", 10):
+        for index in range(15):
+            mqtt_client._mqttc_message_loop(None, None, index)
+        await _async_drain()
+    assert received == list(range(10))
+    assert rx_stats.dropped == 5
+
+    # failures are confined to their own message
+    received.clear()
+    with mock.patch.object(loop, "call_exception_handler") as exception_handler_mock:
+        for msg in ("a", "raise", "cancel", "suspend", "b"):
+            mqtt_client._mqttc_message_loop(None, None, msg)
+        await _async_drain()
+        assert received == ["a", "b"]
+        assert exception_handler_mock.call_count == 1
+        assert mqtt_client._tasks
+        await asyncio.gather(*mqtt_client._tasks)
+    assert received == ["a", "b", "suspend"]
+    assert not mqtt_client._tasks
+    assert rx_stats.loggable_diagnostic_state()["received"] == burst + 10 + 5
 
 
 async def test_cloudapi(hass, cloudapi_mock: helpers.CloudApiMocker):
@@ -0,0 +1,272 @@
+"""Test for MQTTConnection message flows (publish queue and transactions)"""
+
+import asyncio
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+from unittest import mock
+
+import pytest
+
+from custom_components.meross_lan import const as mlc
+from custom_components.meross_lan.helpers.component_api import HAMQTTConnection
+from custom_components.meross_lan.helpers.mqtt_profile import _MQTTQueuedPublish
+from custom_components.meross_lan.merossclient import json_dumps
+from custom_components.meross_lan.merossclient.mqttclient import (
+    MerossMQTTRateLimitException,
+)
+from custom_components.meross_lan.merossclient.protocol import (
+    const as mc,
+    namespaces as mn,
+)
+from custom_components.meross_lan.merossclient.protocol.message import (
+    MerossRequest,
+    build_message,
+)
+from custom_components.meross_lan.merossclient.protocol.namespaces import hub as mn_h
+
+from . import const as tc, helpers
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+    from custom_components.meross_lan.merossclient.protocol.namespaces import (
+        Namespace,
+    )
+
+
+def _build_request_set(ns: "Namespace", payload):
+    return MerossRequest(ns.name, mc.METHOD_SET, {ns.key: payload}, tc.MOCK_KEY)
+
+
+def test_mqtt_queued_publish_key():
+    get_key = _MQTTQueuedPublish.get_key
+
+    ns = mn.Appliance_Control_ToggleX
+    assert get_key(_build_request_set(ns, {mc.KEY_CHANNEL: 1, mc.KEY_ONOFF: 1})) == (
+        ns.name,
+        1,
+    )
+    assert get_key(
+        _build_request_set(
+            ns,
+            [
+                {mc.KEY_CHANNEL: 1, mc.KEY_ONOFF: 1},
+                {mc.KEY_CHANNEL: 2, mc.KEY_ONOFF: 0},
+            ],
+        )
+    ) == (ns.name, (1, 2))
+    # subdevices are identified by 'id' in hub namespaces
+    ns = mn_h.Appliance_Hub_ToggleX
+    assert get_key(_build_request_set(ns, [{mc.KEY_ID: "sub1", mc.KEY_ONOFF: 1}])) == (
+        ns.name,
+        ("sub1",),
+    )
+    assert (
+        get_key(_build_request_set(ns, [{mc.KEY_CHANNEL: 0, mc.KEY_ONOFF: 1}])) is None
+    )
+    # payloads without identity must never be merged
+    ns = mn.Appliance_Control_ToggleX
+    assert get_key(_build_request_set(ns, {mc.KEY_ONOFF: 1})) is None
+    assert get_key(_build_request_set(ns, [])) is None
+    assert (
+        get_key(
+            _build_request_set(
+                ns,
+                [{mc.KEY_CHANNEL: 1, mc.KEY_ONOFF: 1}, {mc.KEY_ONOFF: 0}],
+            )
+        )
+        is None
+    )
+
+
+async def test_mqtt_publish_queue(
+    request,
+    hass: "HomeAssistant",
+    hamqtt_mock: helpers.HAMQTTMocker,
+    time_mock: helpers.TimeMocker,
+):
+    """
+    Tests the rate-limiting publish queue:
+    - rejection of non-queueable messages
+    - merging of commands for the same channel
+    - cancellation of a waiting command
+    - paced release
+    - expiry
+    """
+    async with helpers.MQTTHubEntryMocker(request, hass) as context:
+        mqtt_connection = context.api.mqtt_connection
+        device_id = tc.MOCK_DEVICE_UUID
+        publish_queues = mqtt_connection._mqtt_publish_queues
+
+        def _schedule(request: MerossRequest):
+            return asyncio.create_task(
+                mqtt_connection._async_mqtt_publish_schedule(device_id, request)
+            )
+
+        def _queued_messageids():
+            return [
+                queued_publish.request.messageid
+                for queued_publish in publish_queues[device_id].items
+            ]
+
+        with mock.patch.object(
+            HAMQTTConnection, "get_rl_release_delay", return_value=1
+        ) as get_rl_release_delay_mock:
+            # only plain commands are allowed to wait
+            with pytest.raises(MerossMQTTRateLimitException):
+                await mqtt_connection._async_mqtt_publish_schedule(
+                    device_id,
+                    MerossRequest(
+                        *mn.Appliance_Control_ToggleX.request_get, tc.MOCK_KEY
+                    ),
+                )
+            with pytest.raises(MerossMQTTRateLimitException):
+                await mqtt_connection._async_mqtt_publish_schedule(
+                    device_id,
+                    _build_request_set(mn.Appliance_Control_Multiple, []),
+                )
+            assert device_id not in publish_queues
+
+            ns = mn.Appliance_Control_ToggleX
+            task_1 = _schedule(
+                _build_request_set(ns, {mc.KEY_CHANNEL: 0, mc.KEY_ONOFF: 1})
+            )
+            task_2 = _schedule(
+                request_2 := _build_request_set(
+                    ns, {mc.KEY_CHANNEL: 1, mc.KEY_ONOFF: 1}
+                )
+            )
+            await asyncio.sleep(0)
+            task_3 = _schedule(
+                request_3 := _build_request_set(
+                    ns, {mc.KEY_CHANNEL: 0, mc.KEY_ONOFF: 0}
+                )
+            )
+            await asyncio.sleep(0)
+            # the newer command supersedes the queued one and (since its deadline
+            # is refreshed) moves to the tail of the queue
+            assert (await task_1) is None
+            assert _queued_messageids() == [request_2.messageid, request_3.messageid]
+
+            task_4 = _schedule(
+                _build_request_set(ns, {mc.KEY_CHANNEL: 2, mc.KEY_ONOFF: 1})
+            )
+            await asyncio.sleep(0)
+            assert len(publish_queues[device_id].items) == 3
+            task_4.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task_4
+            assert _queued_messageids() == [request_2.messageid, request_3.messageid]
+
+            # the rate-limiter window opens: one command per tick
+            get_rl_release_delay_mock.return_value = 0
+            await time_mock.async_tick(1)
+            assert (await task_2) is request_2
+            assert _queued_messageids() == [request_3.messageid]
+            await time_mock.async_tick(1)
+            assert (await task_3) is request_3
+            await time_mock.async_tick(1)
+            assert device_id not in publish_queues
+
+            # the window never opens again: the command expires
+            get_rl_release_delay_mock.return_value = 1
+            task_5 = _schedule(
+                _build_request_set(ns, {mc.KEY_CHANNEL: 0, mc.KEY_ONOFF: 1})
+            )
+            await asyncio.sleep(0)
+            await time_mock.async_warp(mlc.PARAM_MQTT_PUBLISH_QUEUE_TIMEOUT + 2)
+            with pytest.raises(MerossMQTTRateLimitException):
+                await task_5
+            assert device_id not in publish_queues
+
+
+async def test_mqtt_transaction(
+    request,
+    hass: "HomeAssistant",
+    hamqtt_mock: helpers.HAMQTTMocker,
+    time_mock: helpers.TimeMocker,
+):
+    """
+    Tests the MQTT request/response matching:
+    - response dispatching
+    - expiry of unanswered requests
+    - late responses accounting (orphans)
+    - cancellation of the awaiting task
+    """
+    async with helpers.MQTTHubEntryMocker(request, hass) as context:
+        mqtt_connection = context.api.mqtt_connection
+        device_id = tc.MOCK_DEVICE_UUID
+        ns = mn.Appliance_Control_ToggleX
+        timeout = mqtt_connection.DEFAULT_RESPONSE_TIMEOUT
+
+        def _publish():
+            _request = MerossRequest(*ns.request_get, tc.MOCK_KEY)
+            return _request, asyncio.create_task(
+                mqtt_connection.async_mqtt_publish(device_id, _request)
+            )
+
+        async def _reply(_request: MerossRequest):
+            message = build_message(
+                ns.name,
+                mc.METHOD_GETACK,
+                {ns.key: [{mc.KEY_CHANNEL: 0, mc.KEY_ONOFF: 1}]},
+                tc.MOCK_KEY,
+                messageid=_request.messageid,
+                from_=mc.TOPIC_RESPONSE.format(device_id),
+            )
+            await mqtt_connection.async_mqtt_message(
+                SimpleNamespace(
+                    topic=mc.TOPIC_RESPONSE.format(device_id),
+                    payload=json_dumps(message).encode("utf-8"),
+                )
+            )
+
+        # a binded device ensures late responses are not discarded upfront
+        device_mock = mock.MagicMock()
+        with (
+            mock.patch.object(HAMQTTConnection, "_async_mqtt_publish", autospec=True),
+            mock.patch.object(HAMQTTConnection, "get_rl_release_delay", return_value=0),
+            mock.patch.dict(mqtt_connection.mqttdevices, {device_id: device_mock}),
+        ):
+            request_1, task_1 = _publish()
+            await asyncio.sleep(0)
+            assert request_1.messageid in mqtt_connection._mqtt_transactions
+            await _reply(request_1)
+            response = await task_1
+            assert response and response.messageid == request_1.messageid
+            assert request_1.messageid not in mqtt_connection._mqtt_transactions
+            assert ns.name in mqtt_connection.mqtt_latency
+
+            request_2, task_2 = _publish()
+            await asyncio.sleep(0)
+            await time_mock.async_warp(timeout + 1)
+            # the TimeoutError is logged and swallowed by async_mqtt_publish
+            assert (await task_2) is None
+            assert request_2.messageid not in mqtt_connection._mqtt_transactions
+            assert (
+                mqtt_connection._mqtt_transactions_expired[request_2.messageid]
+                == ns.name
+            )
+            device_mock.reset_mock()
+            await _reply(request_2)
+            assert mqtt_connection.mqtt_orphans == {ns.name: 1}
+            assert request_2.messageid not in mqtt_connection._mqtt_transactions_expired
+            device_mock.mqtt_receive.assert_called_once()
+            # a duplicated late response is not accounted again
+            await _reply(request_2)
+            assert mqtt_connection.mqtt_orphans == {ns.name: 1}
+
+            request_3, task_3 = _publish()
+            await asyncio.sleep(0)
+            transaction_3 = mqtt_connection._mqtt_transactions[request_3.messageid]
+            task_3.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task_3
+            assert transaction_3.response_future.cancelled()
+            assert request_3.messageid not in mqtt_connection._mqtt_transactions
+            # cancelled transactions are lazily dropped from the expiry queue
+            # but never accounted as expired
+            await time_mock.async_warp(timeout + 1)
+            assert request_3.messageid not in mqtt_connection._mqtt_transactions_expired
+            assert not mqtt_connection._mqtt_transactions_expiry
+            assert mqtt_connection._mqtt_transactions_timer is None